@@ -0,0 +1,278 @@
+import numpy as np
+from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem, QGraphicsPixmapItem
+from PyQt5.QtGui import QPainter, QPen, QColor, QBrush
+from PyQt5.QtCore import Qt, QRectF, QPointF, pyqtSignal
+
+BOX_COLOR = QColor(10, 255, 0)
+ROI_COLOR = QColor(255, 0, 0)
+
+
+def _cosmetic_pen(color, width, style=Qt.SolidLine):
+    # A cosmetic pen keeps its width in screen pixels at any zoom
+    pen = QPen(color, width, style)
+    pen.setCosmetic(True)
+    return pen
+
+
+class DetectionOverlay(QGraphicsItem):
+    """
+    The boxes of one class, painted as a single vector item over the image.
+
+    One item per class rather than per box keeps the scene small with
+    thousands of detections, and hiding a class is one setVisible() call.
+    Only the boxes in the exposed rectangle are painted, and labels only
+    once a box is tall enough on screen to carry one.
+
+    Args:
+        boxes (np.ndarray): (n, 4) boxes in scene (full-resolution image) coordinates.
+        labels (List[str]): The label of every box.
+    """
+
+    # Labels are drawn on boxes at least this many pixels tall on screen
+    LABEL_MIN_HEIGHT = 24
+
+    def __init__(self, boxes, labels, parent=None) -> None:
+        super().__init__(parent)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.labels = list(labels)
+        self.__rects = [QRectF(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in self.boxes.tolist()]
+        x0, y0 = self.boxes[:, :2].min(axis=0) if len(self.boxes) else (0, 0)
+        x1, y1 = self.boxes[:, 2:].max(axis=0) if len(self.boxes) else (0, 0)
+        # Cosmetic pens reach a pixel or two past the boxes
+        self.__bounds = QRectF(float(x0), float(y0), float(x1 - x0), float(y1 - y0)).adjusted(-2, -2, 2, 2)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        return self.__bounds
+
+    def paint(self, painter, option, widget=None):
+        exposed = option.exposedRect
+        boxes = self.boxes
+        visible = np.flatnonzero((boxes[:, 2] >= exposed.left()) & (boxes[:, 0] <= exposed.right()) &
+                                 (boxes[:, 3] >= exposed.top()) & (boxes[:, 1] <= exposed.bottom()))
+        if not len(visible):
+            return
+
+        painter.setPen(_cosmetic_pen(BOX_COLOR, 2))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRects([self.__rects[i] for i in visible])
+
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        labelled = visible[(boxes[visible, 3] - boxes[visible, 1]) * lod >= self.LABEL_MIN_HEIGHT]
+        if not len(labelled):
+            return
+
+        # Draw the text in screen coordinates so it isn't scaled
+        transform = painter.worldTransform()
+        painter.save()
+        painter.resetTransform()
+        metrics = painter.fontMetrics()
+        for i in labelled:
+            corner = transform.map(QPointF(float(boxes[i, 0]), float(boxes[i, 1])))
+            text = self.labels[i]
+            rect = QRectF(metrics.boundingRect(text)).adjusted(-2, -1, 2, 1)
+            rect.moveBottomLeft(QPointF(corner.x(), max(corner.y(), rect.height())))
+            painter.fillRect(rect, Qt.white)
+            painter.setPen(Qt.black)
+            painter.drawText(rect, Qt.AlignCenter, text)
+        painter.restore()
+
+
+class DetectionView(QGraphicsView):
+    """
+    Shows an image with detections and regions of interest as overlays.
+
+    The image is one cached preview pixmap, scaled up to the full-resolution
+    size, so the scene is in full-resolution image coordinates and detections
+    are placed without converting them or copying pixels. Boxes are vector
+    items, one per class, which can be hidden per class and redrawn
+    instantly. The wheel zooms around the cursor, dragging pans, and a
+    double click fits the image to the window again.
+
+    Regions of interest are kept as (x0, y0, x1, y1) fractions of the image;
+    while drawing is on, mouse drags add new ones instead of panning.
+
+    Attributes:
+        rois (List[tuple]): The current regions of interest.
+        drawing (bool): Whether mouse drags add new regions.
+        hidden_classes (Set[int]): Class ids whose boxes are hidden.
+    """
+
+    # Emitted with the new list of regions after one is added or they're cleared
+    rois_changed = pyqtSignal(list)
+
+    # Regions smaller than this many pixels on screen are treated as stray clicks
+    MIN_DRAG = 5
+    # The deepest zoom, in screen pixels per image pixel
+    MAX_ZOOM = 16.0
+
+    def __init__(self, text="", parent=None) -> None:
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setRenderHint(QPainter.SmoothPixmapTransform)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setBackgroundBrush(QBrush(Qt.lightGray))
+        self.rois = []
+        self.drawing = False
+        self.hidden_classes = set()
+        self.__text = text
+        self.__image = None
+        self.__bounds = QRectF()
+        self.__overlays = {}
+        self.__roi_items = []
+        self.__band = None
+        self.__start = None
+        self.__fitted = True
+
+    def setImage(self, pixmap, scale=1.0):
+        """
+        Shows a new image, keeping the zoom if the image size didn't change.
+
+        Args:
+            pixmap (QPixmap): The image, possibly a reduced preview.
+            scale (float, optional): The reduction factor of the pixmap, so the
+                scene stays in full-resolution coordinates. Defaults to 1.0.
+        """
+        if self.__image is None:
+            self.__image = QGraphicsPixmapItem()
+            self.__image.setTransformationMode(Qt.SmoothTransformation)
+            self.scene().addItem(self.__image)
+        self.__image.setPixmap(pixmap)
+        self.__image.setScale(scale)
+
+        bounds = QRectF(0, 0, pixmap.width() * scale, pixmap.height() * scale)
+        if bounds != self.__bounds:
+            self.__bounds = bounds
+            self.setSceneRect(bounds)
+            self.__updateRois()
+            self.fitToWindow()
+
+    def setDetections(self, detections, class_name):
+        """Replaces the boxes with new detections in full-resolution image coordinates."""
+        self.clearDetections()
+        names = np.array(detections.names(class_name), dtype=object)
+        labels = np.array([f"{name}: {score * 100:.2f}%" for name, score in zip(names, detections.scores)],
+                          dtype=object)
+        for class_id in np.unique(detections.class_ids).tolist():
+            mask = detections.class_ids == class_id
+            overlay = DetectionOverlay(detections.boxes[mask], labels[mask].tolist())
+            overlay.setZValue(1)
+            overlay.setVisible(class_id not in self.hidden_classes)
+            self.scene().addItem(overlay)
+            self.__overlays[class_id] = (names[mask][0], overlay)
+
+    def clearDetections(self):
+        for _, overlay in self.__overlays.values():
+            self.scene().removeItem(overlay)
+        self.__overlays = {}
+
+    def classes(self):
+        """Returns (class id, name, visible) for every class with detections shown."""
+        return [(class_id, name, class_id not in self.hidden_classes)
+                for class_id, (name, _) in sorted(self.__overlays.items())]
+
+    def setClassVisible(self, class_id, visible):
+        if visible:
+            self.hidden_classes.discard(class_id)
+        else:
+            self.hidden_classes.add(class_id)
+        if class_id in self.__overlays:
+            self.__overlays[class_id][1].setVisible(visible)
+
+    def fitToWindow(self):
+        if self.__image is not None:
+            self.fitInView(self.sceneRect(), Qt.KeepAspectRatio)
+        self.__fitted = True
+
+    def setRois(self, rois):
+        self.rois = [tuple(roi) for roi in rois or []]
+        self.__updateRois()
+
+    def setDrawing(self, drawing):
+        self.drawing = drawing
+        self.setDragMode(QGraphicsView.NoDrag if drawing else QGraphicsView.ScrollHandDrag)
+        self.viewport().setCursor(Qt.CrossCursor if drawing else Qt.OpenHandCursor)
+
+    def clearRois(self):
+        self.rois = []
+        self.__updateRois()
+        self.rois_changed.emit(list(self.rois))
+
+    def wheelEvent(self, event):
+        if self.__image is None:
+            return
+        factor = 1.25 ** (event.angleDelta().y() / 120)
+        zoom = self.transform().m11()
+        fit = min(self.viewport().width() / self.sceneRect().width(),
+                  self.viewport().height() / self.sceneRect().height())
+        # Don't zoom out past the window size or zoom in without limit
+        factor = min(max(factor, fit / zoom), self.MAX_ZOOM / zoom)
+        self.scale(factor, factor)
+        self.__fitted = zoom * factor <= fit
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.__fitted:
+            self.fitToWindow()
+
+    def mouseDoubleClickEvent(self, event):
+        if not self.drawing:
+            self.fitToWindow()
+            return
+        super().mouseDoubleClickEvent(event)
+
+    def mousePressEvent(self, event):
+        if self.drawing and event.button() == Qt.LeftButton and self.__image is not None:
+            self.__start = event.pos()
+            self.__band = self.scene().addRect(QRectF(), _cosmetic_pen(ROI_COLOR, 1, Qt.DashLine))
+            self.__band.setZValue(3)
+            return
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self.__start is not None:
+            self.__band.setRect(self.__sceneRect(self.__start, event.pos()))
+            return
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if self.__start is None:
+            super().mouseReleaseEvent(event)
+            return
+        start, self.__start = self.__start, None
+        self.scene().removeItem(self.__band)
+        self.__band = None
+        if abs(event.pos().x() - start.x()) >= self.MIN_DRAG and abs(event.pos().y() - start.y()) >= self.MIN_DRAG:
+            rect = self.__sceneRect(start, event.pos())
+            bounds = self.sceneRect()
+            self.rois.append((rect.left() / bounds.width(), rect.top() / bounds.height(),
+                              rect.right() / bounds.width(), rect.bottom() / bounds.height()))
+            self.__updateRois()
+            self.rois_changed.emit(list(self.rois))
+
+    def drawForeground(self, painter, rect):
+        if self.__image is None and self.__text:
+            painter.save()
+            painter.resetTransform()
+            painter.drawText(self.viewport().rect(), Qt.AlignCenter, self.__text)
+            painter.restore()
+
+    def __sceneRect(self, start, end):
+        # The drag in image coordinates, clipped to the image
+        rect = QRectF(self.mapToScene(start), self.mapToScene(end)).normalized()
+        return rect.intersected(self.sceneRect())
+
+    def __updateRois(self):
+        for item in self.__roi_items:
+            self.scene().removeItem(item)
+        self.__roi_items = []
+        bounds = self.sceneRect()
+        if self.__image is None:
+            return
+        for x0, y0, x1, y1 in self.rois:
+            item = self.scene().addRect(QRectF(x0 * bounds.width(), y0 * bounds.height(),
+                                               (x1 - x0) * bounds.width(), (y1 - y0) * bounds.height()),
+                                        _cosmetic_pen(ROI_COLOR, 2))
+            item.setZValue(2)
+            self.__roi_items.append(item)
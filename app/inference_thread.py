@@ -1,23 +1,77 @@
+import time
+
 from PyQt5.QtCore import QThread, pyqtSignal
 
-from model.model_tflite import TFLiteModel
+from model.model_registry import registry
+from model.detection_cache import detect_candidates_cached
+from model.detections import candidate_floor
+from model.image_source import ImageSource
+from model.profiler import Profiler, NULL_PROFILER, profiling
 
 class DetectionThread(QThread):
-    # Signals to indicate completion and pass the resulting image or an error message
+    # Signals to indicate completion and pass (detections, seconds) or an error message
     finished_signal = pyqtSignal(tuple)
     error_signal = pyqtSignal(str)
+    # (ImageSource, raw candidates, score floor) for re-thresholding without a re-run
+    candidates_signal = pyqtSignal(tuple)
+    # Per-stage timings and counters, only emitted when profiling is on
+    stats_signal = pyqtSignal(dict)
 
-    def __init__(self, model_path, image_path, cutoff, class_name, parent=None):
+    def __init__(self, model_path, image_path, cutoff, class_name, batch_size=8,
+                 num_workers=1, num_threads=None, rgb_input=False, inference_options=None,
+                 cache=None, class_names_path="", profile=False,
+                 profile_json_file="", profile_trace_file="", image_source=None, parent=None):
         super().__init__(parent)
         self.image_path = image_path
+        # Shared with the GUI preview, so decoded pixels are reused
+        self.image_source = image_source or ImageSource(image_path)
         self.cutoff = cutoff
         self.class_name = class_name
-        self.model = TFLiteModel(model_path)
+        self.model_args = (model_path, batch_size, num_workers, num_threads, rgb_input)
+        # Extra keyword arguments for the engine (NMS, tiling, ...)
+        self.inference_options = inference_options or {}
+        self.cache = cache
+        self.class_names_path = class_names_path
+        self.profile = profile
+        self.profile_json_file = profile_json_file
+        self.profile_trace_file = profile_trace_file
 
     def run(self):
+        prof = Profiler() if self.profile else NULL_PROFILER
+        start = time.perf_counter()
         try:
-            image, detections = self.model.do_sliding_window_inference(self.image_path, self.cutoff, self.class_name)
-            self.finished_signal.emit((image, detections))
+            with profiling(prof):
+                detections = self.__detect(prof)
+            self.finished_signal.emit((detections, time.perf_counter() - start))
         except Exception as e:
             self.error_signal.emit(str(e))
             print("Error in detection thread: ", e)
+            return
+
+        if prof.enabled:
+            self.stats_signal.emit(prof.report())
+            if self.profile_json_file:
+                prof.to_json(self.profile_json_file)
+            if self.profile_trace_file:
+                prof.to_chrome_trace(self.profile_trace_file)
+
+    def __detect(self, prof):
+        tiling = dict(self.inference_options)
+        iou_threshold = tiling.pop("iou_threshold", 0.5)
+        soft_nms = tiling.pop("soft_nms", False)
+        box_fusion = tiling.pop("box_fusion", False)
+
+        # Cached models are already loaded and warmed up
+        with prof.stage("model load"):
+            model = registry.acquire(*self.model_args)
+        try:
+            candidates, _, _ = detect_candidates_cached(self.cache, model, self.image_path, self.cutoff,
+                                                        self.class_names_path, image=self.image_source, **tiling)
+        finally:
+            registry.release(model)
+        detections = model.postprocess(candidates, self.cutoff, iou_threshold, soft_nms, box_fusion)
+
+        self.candidates_signal.emit((self.image_source, candidates,
+                                     candidate_floor(self.cutoff, tiling.get("candidate_cutoff"))))
+        # The window draws the boxes over its preview, so no image is returned
+        return detections
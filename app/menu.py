@@ -13,6 +13,43 @@ class MenuBar(QMenuBar):
         open_action.triggered.connect(self.openFile)
         self.file_menu.addAction(open_action)
 
+        open_video_action = QAction("Open Video", self)
+        open_video_action.triggered.connect(self.openVideo)
+        self.file_menu.addAction(open_video_action)
+
+        open_camera_action = QAction("Open Camera", self)
+        open_camera_action.triggered.connect(self.openCamera)
+        self.file_menu.addAction(open_camera_action)
+
+        stop_stream_action = QAction("Stop Stream", self)
+        stop_stream_action.triggered.connect(self.stopStream)
+        self.file_menu.addAction(stop_stream_action)
+
+        # Regions of interest menu
+        self.roi_menu = self.addMenu("ROI")
+
+        self.draw_roi_action = QAction("Draw ROIs", self)
+        self.draw_roi_action.setCheckable(True)
+        self.draw_roi_action.toggled.connect(self.drawRois)
+        self.roi_menu.addAction(self.draw_roi_action)
+
+        clear_roi_action = QAction("Clear ROIs", self)
+        clear_roi_action.triggered.connect(self.clearRois)
+        self.roi_menu.addAction(clear_roi_action)
+
+        save_roi_action = QAction("Save ROIs as Template...", self)
+        save_roi_action.triggered.connect(self.saveRoiTemplate)
+        self.roi_menu.addAction(save_roi_action)
+
+        # View menu, with a visibility toggle for every detected class
+        self.view_menu = self.addMenu("View")
+
+        fit_action = QAction("Fit to Window", self)
+        fit_action.triggered.connect(self.fitToWindow)
+        self.view_menu.addAction(fit_action)
+        self.view_menu.addSeparator()
+        self.class_actions = []
+
         # Settings Menu
         self.settings_menu = self.addMenu("Settings")
 
@@ -28,5 +65,47 @@ class MenuBar(QMenuBar):
         if imgPath:
             self.parent._loadImage(imgPath)
 
+    def openVideo(self):
+        options = QFileDialog.Options()
+        videoPath, _ = QFileDialog.getOpenFileName(self.parent, "Open Video", "",
+                                                   "Video Files (*.mp4 *.avi *.mov *.mkv *.MP4)",
+                                                   options=options)
+        if videoPath:
+            self.parent._startStream(videoPath)
+
+    def openCamera(self):
+        self.parent._startStream(self.parent.settings.get_setting("camera_index"))
+
+    def stopStream(self):
+        self.parent._stopStream()
+
+    def drawRois(self, checked):
+        self.parent._setRoiDrawing(checked)
+
+    def clearRois(self):
+        self.parent._clearRois()
+
+    def saveRoiTemplate(self):
+        self.parent._saveRoiTemplate()
+
+    def fitToWindow(self):
+        self.parent._fitToWindow()
+
+    def setClasses(self, classes):
+        """Lists (class id, name, visible) classes in the View menu, unless they're already listed."""
+        if [(a.data(), a.text()) for a in self.class_actions] == [(c, name) for c, name, _ in classes]:
+            return
+        for action in self.class_actions:
+            self.view_menu.removeAction(action)
+        self.class_actions = []
+        for class_id, name, visible in classes:
+            action = QAction(name, self)
+            action.setData(class_id)
+            action.setCheckable(True)
+            action.setChecked(visible)
+            action.toggled.connect(lambda checked, class_id=class_id: self.parent._setClassVisible(class_id, checked))
+            self.view_menu.addAction(action)
+            self.class_actions.append(action)
+
     def openSettings(self):
         self.parent._showSettings()
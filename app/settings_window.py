@@ -1,7 +1,10 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QCheckBox, QPushButton,
                              QToolTip, QApplication, QLabel, QDoubleSpinBox,
-                             QLineEdit, QHBoxLayout, QFileDialog, QSlider)
-from PyQt5.QtCore import QTimer, QPoint, Qt
+                             QLineEdit, QHBoxLayout, QFileDialog, QSlider,
+                             QSpinBox, QComboBox)
+from PyQt5.QtCore import QTimer, QPoint, Qt, pyqtSignal
+from model.presets import PRESET_NAMES, load_presets
+from model.exporter import EXPORT_FORMATS, parquet_available
 
 
 class PopupHint(QWidget):
@@ -30,6 +33,11 @@ class PopupHint(QWidget):
 
 
 class SettingsWindow(QWidget):
+    # Emitted with the saved values after the user presses "Save"
+    settings_saved = pyqtSignal(dict)
+    # Emitted while the cutoff slider moves, before the settings are saved
+    cutoff_changed = pyqtSignal(float)
+
     def __init__(self, settings) -> None:
         super(SettingsWindow, self).__init__()
         self.settings = settings
@@ -59,6 +67,9 @@ class SettingsWindow(QWidget):
         self.cutoff_slider.valueChanged.connect(
             lambda value: self.cutoff_label.setText(str(value / 100))
         )
+        self.cutoff_slider.valueChanged.connect(
+            lambda value: self.cutoff_changed.emit(value / 100)
+        )
 
         cutoff_layout = QHBoxLayout()
         cutoff_layout.addWidget(self.cutoff_slider)
@@ -91,6 +102,170 @@ class SettingsWindow(QWidget):
         model_file_layout.addWidget(model_file_button)
         layout.addLayout(model_file_layout)
 
+        # Low-threshold candidates kept for re-thresholding and caching
+        layout.addWidget(QLabel("Candidate cutoff:"))
+        self.candidate_cutoff_spin = QDoubleSpinBox()
+        self.candidate_cutoff_spin.setRange(0.01, 1.0)
+        self.candidate_cutoff_spin.setSingleStep(0.05)
+        self.candidate_cutoff_spin.setValue(self.settings.get_setting("candidate_cutoff"))
+        layout.addWidget(self.candidate_cutoff_spin)
+
+        self.chk_use_cache = QCheckBox("Cache detection results")
+        self.chk_use_cache.setChecked(self.settings.get_setting("use_cache"))
+        layout.addWidget(self.chk_use_cache)
+
+        # NMS inputs
+        layout.addWidget(QLabel("NMS IoU threshold:"))
+        self.iou_threshold_spin = QDoubleSpinBox()
+        self.iou_threshold_spin.setRange(0.05, 0.95)
+        self.iou_threshold_spin.setSingleStep(0.05)
+        self.iou_threshold_spin.setValue(self.settings.get_setting("iou_threshold"))
+        layout.addWidget(self.iou_threshold_spin)
+
+        self.chk_soft_nms = QCheckBox("Use soft-NMS")
+        self.chk_soft_nms.setChecked(self.settings.get_setting("soft_nms"))
+        layout.addWidget(self.chk_soft_nms)
+
+        self.chk_box_fusion = QCheckBox("Fuse overlapping boxes (WBF)")
+        self.chk_box_fusion.setChecked(self.settings.get_setting("box_fusion"))
+        layout.addWidget(self.chk_box_fusion)
+
+        # Tiling mode inputs
+        layout.addWidget(QLabel("Tiling mode:"))
+        self.tiling_mode_combo = QComboBox()
+        self.tiling_mode_combo.addItems(["window", "pyramid"])
+        self.tiling_mode_combo.setCurrentText(self.settings.get_setting("tiling_mode"))
+        layout.addWidget(self.tiling_mode_combo)
+
+        layout.addWidget(QLabel("Pyramid levels:"))
+        self.pyramid_levels_spin = QSpinBox()
+        self.pyramid_levels_spin.setRange(1, 8)
+        self.pyramid_levels_spin.setValue(self.settings.get_setting("pyramid_levels"))
+        self.pyramid_levels_spin.setEnabled(self.tiling_mode_combo.currentText() == "pyramid")
+        self.tiling_mode_combo.currentTextChanged.connect(
+            lambda mode: self.pyramid_levels_spin.setEnabled(mode == "pyramid")
+        )
+        layout.addWidget(self.pyramid_levels_spin)
+
+        # Profiles saved by tools/autotune.py, applied over the options here
+        layout.addWidget(QLabel("Tiling preset:"))
+        self.tiling_preset_combo = QComboBox()
+        self.refreshPresets()
+        layout.addWidget(self.tiling_preset_combo)
+
+        # Adaptive tiling inputs
+        self.chk_adaptive_tiling = QCheckBox("Adaptive tiling (skip empty regions)")
+        self.chk_adaptive_tiling.setChecked(self.settings.get_setting("adaptive_tiling"))
+        layout.addWidget(self.chk_adaptive_tiling)
+
+        layout.addWidget(QLabel("Objectness cutoff:"))
+        self.objectness_cutoff_spin = QDoubleSpinBox()
+        self.objectness_cutoff_spin.setRange(0.01, 1.0)
+        self.objectness_cutoff_spin.setSingleStep(0.05)
+        self.objectness_cutoff_spin.setValue(self.settings.get_setting("objectness_cutoff"))
+        layout.addWidget(self.objectness_cutoff_spin)
+
+        layout.addWidget(QLabel("Max tiles per image:"))
+        self.max_tiles_spin = QSpinBox()
+        self.max_tiles_spin.setRange(0, 100000)
+        self.max_tiles_spin.setSpecialValueText("Unlimited")
+        self.max_tiles_spin.setValue(self.settings.get_setting("max_tiles"))
+        layout.addWidget(self.max_tiles_spin)
+
+        # Tile batch size input
+        layout.addWidget(QLabel("Tile batch size:"))
+        self.batch_size_spin = QSpinBox()
+        self.batch_size_spin.setRange(1, 128)
+        self.batch_size_spin.setValue(self.settings.get_setting("batch_size"))
+        layout.addWidget(self.batch_size_spin)
+
+        # Interpreter backend selection
+        layout.addWidget(QLabel("Interpreter backend:"))
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItems(["auto", "tflite_runtime", "tensorflow"])
+        self.backend_combo.setCurrentText(self.settings.get_setting("interpreter_backend"))
+        layout.addWidget(self.backend_combo)
+
+        # Parallel execution inputs
+        layout.addWidget(QLabel("Interpreter workers:"))
+        self.num_workers_spin = QSpinBox()
+        self.num_workers_spin.setRange(1, 64)
+        self.num_workers_spin.setValue(self.settings.get_setting("num_workers"))
+        layout.addWidget(self.num_workers_spin)
+
+        layout.addWidget(QLabel("Threads per interpreter:"))
+        self.num_threads_spin = QSpinBox()
+        self.num_threads_spin.setRange(0, 64)
+        self.num_threads_spin.setSpecialValueText("Auto")
+        self.num_threads_spin.setValue(self.settings.get_setting("num_threads"))
+        layout.addWidget(self.num_threads_spin)
+
+        layout.addWidget(QLabel("Loaded model cache (MB):"))
+        self.model_cache_spin = QSpinBox()
+        self.model_cache_spin.setRange(16, 65536)
+        self.model_cache_spin.setValue(self.settings.get_setting("model_cache_mb"))
+        layout.addWidget(self.model_cache_spin)
+
+        self.chk_rgb_input = QCheckBox("Model takes RGB input")
+        self.chk_rgb_input.setChecked(self.settings.get_setting("rgb_input"))
+        layout.addWidget(self.chk_rgb_input)
+
+        layout.addWidget(QLabel("Image memory budget (MB):"))
+        self.memory_budget_spin = QSpinBox()
+        self.memory_budget_spin.setRange(0, 65536)
+        self.memory_budget_spin.setSpecialValueText("Unlimited")
+        self.memory_budget_spin.setValue(int(self.settings.get_setting("memory_budget_mb")))
+        layout.addWidget(self.memory_budget_spin)
+
+        # Video stream inputs
+        layout.addWidget(QLabel("Detect every N video frames:"))
+        self.detect_every_spin = QSpinBox()
+        self.detect_every_spin.setRange(1, 120)
+        self.detect_every_spin.setValue(self.settings.get_setting("detect_every_n_frames"))
+        layout.addWidget(self.detect_every_spin)
+
+        layout.addWidget(QLabel("Camera index:"))
+        self.camera_index_spin = QSpinBox()
+        self.camera_index_spin.setRange(0, 16)
+        self.camera_index_spin.setValue(self.settings.get_setting("camera_index"))
+        layout.addWidget(self.camera_index_spin)
+
+        # Regions of interest drawn on the image and saved as templates
+        layout.addWidget(QLabel("ROI template:"))
+        self.roi_template_combo = QComboBox()
+        self.refreshRoiTemplates()
+        layout.addWidget(self.roi_template_combo)
+
+        # Result export
+        layout.addWidget(QLabel("Export results to:"))
+        self.export_file = QLineEdit()
+        self.export_file.setText(self.settings.get_setting("export_file"))
+        export_file_button = QPushButton("Choose File")
+        export_file_button.clicked.connect(self.__chooseExportFile)
+
+        export_file_layout = QHBoxLayout()
+        export_file_layout.addWidget(self.export_file)
+        export_file_layout.addWidget(export_file_button)
+        layout.addLayout(export_file_layout)
+
+        export_formats_layout = QHBoxLayout()
+        self.export_format_checks = {}
+        for name in EXPORT_FORMATS:
+            check = QCheckBox(name.upper() if name != "coco" else "COCO JSON")
+            check.setChecked(name in self.settings.get_setting("export_formats"))
+            export_formats_layout.addWidget(check)
+            self.export_format_checks[name] = check
+        if not parquet_available():
+            self.export_format_checks["parquet"].setChecked(False)
+            self.export_format_checks["parquet"].setEnabled(False)
+            self.export_format_checks["parquet"].setToolTip("Requires pyarrow")
+        layout.addLayout(export_formats_layout)
+
+        # Profiling
+        self.chk_profiling = QCheckBox("Collect timing statistics")
+        self.chk_profiling.setChecked(self.settings.get_setting("profiling"))
+        layout.addWidget(self.chk_profiling)
+
         # Save button
         self.button_save = QPushButton("Save")
         self.button_save.clicked.connect(self.__save_settings)
@@ -100,9 +275,54 @@ class SettingsWindow(QWidget):
             'show_dialog_on_start': (self.chk_show_dialog, lambda x: x.isChecked()),
             'cutoff': (self.cutoff_slider, lambda x: x.value() / 100),
             "class_names_file": (self.class_names_file, lambda x: x.text()),
-            "model_file": (self.model_file, lambda x: x.text())
+            "model_file": (self.model_file, lambda x: x.text()),
+            "candidate_cutoff": (self.candidate_cutoff_spin, lambda x: x.value()),
+            "use_cache": (self.chk_use_cache, lambda x: x.isChecked()),
+            "iou_threshold": (self.iou_threshold_spin, lambda x: x.value()),
+            "soft_nms": (self.chk_soft_nms, lambda x: x.isChecked()),
+            "box_fusion": (self.chk_box_fusion, lambda x: x.isChecked()),
+            "tiling_mode": (self.tiling_mode_combo, lambda x: x.currentText()),
+            "pyramid_levels": (self.pyramid_levels_spin, lambda x: x.value()),
+            "tiling_preset": (self.tiling_preset_combo, lambda x: x.currentData()),
+            "adaptive_tiling": (self.chk_adaptive_tiling, lambda x: x.isChecked()),
+            "objectness_cutoff": (self.objectness_cutoff_spin, lambda x: x.value()),
+            "max_tiles": (self.max_tiles_spin, lambda x: x.value()),
+            "profiling": (self.chk_profiling, lambda x: x.isChecked()),
+            "batch_size": (self.batch_size_spin, lambda x: x.value()),
+            "interpreter_backend": (self.backend_combo, lambda x: x.currentText()),
+            "num_workers": (self.num_workers_spin, lambda x: x.value()),
+            "num_threads": (self.num_threads_spin, lambda x: x.value()),
+            "rgb_input": (self.chk_rgb_input, lambda x: x.isChecked()),
+            "model_cache_mb": (self.model_cache_spin, lambda x: x.value()),
+            "memory_budget_mb": (self.memory_budget_spin, lambda x: x.value()),
+            "detect_every_n_frames": (self.detect_every_spin, lambda x: x.value()),
+            "camera_index": (self.camera_index_spin, lambda x: x.value()),
+            "roi_template": (self.roi_template_combo, lambda x: x.currentData()),
+            "export_file": (self.export_file, lambda x: x.text()),
+            "export_formats": (self.export_format_checks,
+                               lambda x: [name for name, check in x.items() if check.isChecked()])
         }
 
+    def refreshRoiTemplates(self):
+        """Lists the saved ROI templates, which change outside this window."""
+        self.roi_template_combo.clear()
+        self.roi_template_combo.addItem("Whole image", "")
+        for name in sorted(self.settings.get_setting("roi_templates")):
+            self.roi_template_combo.addItem(name, name)
+        index = self.roi_template_combo.findData(self.settings.get_setting("roi_template"))
+        self.roi_template_combo.setCurrentIndex(max(index, 0))
+
+    def refreshPresets(self):
+        """Lists the tuned presets, which are rewritten by tools/autotune.py."""
+        self.tiling_preset_combo.clear()
+        self.tiling_preset_combo.addItem("Custom (settings above)", "")
+        presets = load_presets(self.settings.get_setting("presets_file"))
+        for name in PRESET_NAMES:
+            if name in presets:
+                self.tiling_preset_combo.addItem(name.capitalize(), name)
+        index = self.tiling_preset_combo.findData(self.settings.get_setting("tiling_preset"))
+        self.tiling_preset_combo.setCurrentIndex(max(index, 0))
+
     def __chooseClassNamesFile(self):
         file_name, _ = QFileDialog.getOpenFileName(self, "Select Class Names File", "", "JSON Files (*.json)")
         if file_name:
@@ -113,9 +333,16 @@ class SettingsWindow(QWidget):
         if file_name:
             self.model_file.setText(file_name)
 
+    def __chooseExportFile(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, "Select Export File", self.export_file.text(),
+                                                   "JSON Lines (*.jsonl)")
+        if file_name:
+            self.export_file.setText(file_name)
+
     def __save_settings(self):
         new_settings = {key: getter(widget) for key, (widget, getter) in self.settings_controls.items()}
         self.settings.update_settings(new_settings)
+        self.settings_saved.emit(new_settings)
         
         popup = PopupHint(text="Settings saved", background_color="green", text_color="white",
                           border_color="darkgreen")
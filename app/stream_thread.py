@@ -0,0 +1,61 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from model.model_registry import registry
+from model.video_stream import VideoStream, StreamDetector, StreamStats
+
+
+class StreamThread(QThread):
+    # (BGR frame, detections, stream statistics) for every processed frame; the view draws the boxes
+    frame_signal = pyqtSignal(tuple)
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, source, model_path, cutoff, class_name, batch_size=8,
+                 num_workers=1, num_threads=None, rgb_input=False, inference_options=None,
+                 detect_every=5, queue_size=2, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.cutoff = cutoff
+        self.class_name = class_name
+        self.model_args = (model_path, batch_size, num_workers, num_threads, rgb_input)
+        # Extra keyword arguments for TFLiteModel.detect() (NMS, tiling, ...)
+        self.inference_options = inference_options or {}
+        self.detect_every = detect_every
+        self.queue_size = queue_size
+        self.__running = True
+
+    def stop(self):
+        """Asks the thread to finish after the current frame."""
+        self.__running = False
+
+    def run(self):
+        try:
+            model = registry.acquire(*self.model_args)
+        except Exception as e:
+            self.error_signal.emit(str(e))
+            return
+        try:
+            stream = VideoStream(self.source, self.queue_size).start()
+        except Exception as e:
+            registry.release(model)
+            self.error_signal.emit(str(e))
+            return
+
+        detector = StreamDetector(model, self.cutoff, self.detect_every, **self.inference_options)
+        stats = StreamStats()
+        try:
+            while self.__running:
+                item = stream.queue.get(timeout=0.5)
+                if item is None:
+                    if stream.queue.closed:
+                        break
+                    continue
+                _, frame = item
+                detections, _ = detector.process(frame)
+                stats.tick()
+                self.frame_signal.emit((frame, detections, stats.report(stream)))
+        except Exception as e:
+            self.error_signal.emit(str(e))
+            print("Error in stream thread: ", e)
+        finally:
+            stream.stop()
+            registry.release(model)
@@ -1,23 +1,48 @@
 import json
 
 from PyQt5.QtWidgets import (QMainWindow, QVBoxLayout, QWidget, QLabel,
-                             QMessageBox, QPushButton)
+                             QMessageBox, QPushButton, QInputDialog)
 from PyQt5.QtGui import QPixmap, QImage
-from PyQt5.QtCore import Qt
-from collections import Counter
+from PyQt5.QtCore import Qt, QTimer
 
 from .menu import MenuBar
 from .settings_window import SettingsWindow
 from utils.settings_manager import SettingsManager
 from .start_up_window import StartUpWindow
 from .inference_thread import DetectionThread
+from .stream_thread import StreamThread
+from .detection_view import DetectionView
+from model.model_registry import registry
+from model.detection_cache import DetectionCache
+from model.model_tflite import TFLiteModel
+from model.image_source import ImageSource
+from model.presets import apply_preset, load_presets
+from model.exporter import ResultExporter, detection_record
+from model import backend
 
 
 class MainWindow(QMainWindow):
+    # The shorter side of the preview decode; zooming in further shows it enlarged
+    PREVIEW_MIN_SIDE = 1440
+
     def __init__(self) -> None:
         super(MainWindow, self).__init__()
         self.detection_thread = None
+        self.stream_thread = None
         self.imgPath = None
+        # The loaded image, decoded on demand and shared with the detection thread
+        self.image_source = None
+        self.class_names = {}
+        self.detection_cache = None
+        # Writes the results of every run in the background
+        self.exporter = None
+        # Raw candidates of the last run, kept to re-apply a new cutoff instantly
+        self.last_run = None
+        self.detections = None
+        self.live_cutoff = None
+        # Regions of interest of the active template, as (x0, y0, x1, y1) image fractions
+        self.rois = []
+        self.roi_template = ""
 
         self.start_up_window = None
         self.settings_window = None
@@ -27,13 +52,51 @@ class MainWindow(QMainWindow):
             "show_dialog_on_start": True,
             "cutoff": 0.5,
             "class_names_file": "",
-            "model_file": ""
+            "model_file": "",
+            "batch_size": 8,
+            "num_workers": 1,
+            "num_threads": 0,
+            # Models trained on RGB images; tiles are cut from BGR ones
+            "rgb_input": False,
+            "model_cache_mb": 512,
+            "memory_budget_mb": 0,
+            "iou_threshold": 0.5,
+            "soft_nms": False,
+            "box_fusion": False,
+            "adaptive_tiling": False,
+            "max_tiles": 0,
+            "tiling_mode": "window",
+            "pyramid_levels": 3,
+            # Options tuned by tools/autotune.py; "" uses the settings as they are
+            "presets_file": "tiling_presets.json",
+            "tiling_preset": "",
+            "objectness_cutoff": 0.2,
+            "candidate_cutoff": 0.1,
+            "use_cache": True,
+            "cache_file": "detection_cache.sqlite",
+            "cache_max_mb": 256,
+            "cache_max_age_days": 30,
+            # Results are appended to this JSONL file, other formats are written next to it
+            "export_file": "exports/detections.jsonl",
+            "export_formats": ["jsonl", "csv"],
+            "profiling": False,
+            "profile_json_file": "",
+            "profile_trace_file": "",
+            "interpreter_backend": "auto",
+            "detect_every_n_frames": 5,
+            "stream_queue_size": 2,
+            "camera_index": 0,
+            # Template name -> regions of interest, e.g. one per fixed-mount camera
+            "roi_templates": {},
+            "roi_template": ""
         }
 
         # Update the DEFAULT_SETTINGS attribute of SettingsManager before creating an instance
         SettingsManager.DEFAULT_SETTINGS = default_settings
 
         self.settings = SettingsManager()
+        backend.set_backend(self.settings.get_setting("interpreter_backend"))
+        registry.set_limits(max_bytes=self.settings.get_setting("model_cache_mb") * 1024 * 1024)
 
         self.setWindowTitle("Test")
         self.setMinimumSize(600, 400)
@@ -43,20 +106,37 @@ class MainWindow(QMainWindow):
         self.setMenuBar(self.menu_bar)
 
         self.__initUI()
+        self._selectRoiTemplate(self.settings.get_setting("roi_template"))
+
+        # Coalesce slider movements into one redraw
+        self.cutoff_timer = QTimer(self)
+        self.cutoff_timer.setSingleShot(True)
+        self.cutoff_timer.setInterval(30)
+        self.cutoff_timer.timeout.connect(self._applyCutoff)
 
         self._checkShowStartUpWindow()
 
+        # Load the selected model in the background so the first run is fast,
+        # once the event loop runs, so that it doesn't delay the first paint
+        QTimer.singleShot(0, self._warmModel)
+
     def __initUI(self):
         centra_widget = QWidget(self)
         self.setCentralWidget(centra_widget)
         layout = QVBoxLayout()
 
-        # Display area for Image
-        self.image_label = QLabel("No Image Load")
-        self.image_label.setScaledContents(True)
-        self.image_label.setStyleSheet("border: 1px solid black;")
-        self.image_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(self.image_label)
+        # Display area for the image, with detections and ROIs drawn over it
+        self.image_view = DetectionView("No Image Load")
+        self.image_view.setStyleSheet("border: 1px solid black;")
+        self.image_view.rois_changed.connect(self._onRoisChanged)
+        layout.addWidget(self.image_view)
+
+        # Timing statistics of the last run, shown when profiling is on
+        self.stats_label = QLabel()
+        self.stats_label.setStyleSheet("font-family: monospace;")
+        self.stats_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.stats_label.hide()
+        layout.addWidget(self.stats_label)
 
         # Button run detect
         self.run_inference_button = QPushButton("Run Inference", self)
@@ -66,19 +146,206 @@ class MainWindow(QMainWindow):
         centra_widget.setLayout(layout)
 
     def _loadImage(self, imgPath):
+        source = ImageSource(imgPath)
+        # A reduced decode is enough for the preview; huge images aren't read in full yet
+        try:
+            preview, factor = source.reduced(self.PREVIEW_MIN_SIDE)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
         self.imgPath = imgPath
-        pixmap = QPixmap(imgPath)
-        self.image_label.setPixmap(pixmap.scaled(self.image_label.width(), self.image_label.height(),
-                                                 Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        self.image_label.setText("")
+        self.image_source = source
+        self.last_run = None
+        self.detections = None
+        self._showImage(preview, factor)
+        self._showDetections(None)
 
     def _showSettings(self):
         if not self.settings_window:
             self.settings_window = SettingsWindow(self.settings)
+            self.settings_window.settings_saved.connect(self._onSettingsSaved)
+            self.settings_window.cutoff_changed.connect(self._onCutoffChanged)
+        self.settings_window.refreshRoiTemplates()
+        self.settings_window.refreshPresets()
         self.settings_window.show()
         # self.settings_window.raise_()
         # self.settings_window.activateWindow()
 
+    def _onSettingsSaved(self, new_settings):
+        # The next run's results go to the new export file and formats,
+        # and its candidates to a cache with the new file and limits
+        self._closeExporter()
+        self._closeDetectionCache()
+        backend.set_backend(self.settings.get_setting("interpreter_backend"))
+        registry.set_limits(max_bytes=self.settings.get_setting("model_cache_mb") * 1024 * 1024)
+        self._selectRoiTemplate(self.settings.get_setting("roi_template"))
+        self._warmModel()
+
+    def _selectRoiTemplate(self, name):
+        """Makes the regions of interest of a saved template the active ones."""
+        self.roi_template = name
+        self.rois = [tuple(roi) for roi in self.settings.get_setting("roi_templates").get(name, [])]
+        self.image_view.setRois(self.rois)
+
+    def _setRoiDrawing(self, drawing):
+        self.image_view.setDrawing(drawing)
+        if drawing:
+            self.statusBar().showMessage("Drag on the image to add regions of interest")
+        else:
+            self.statusBar().clearMessage()
+
+    def _clearRois(self):
+        self.image_view.clearRois()
+
+    def _onRoisChanged(self, rois):
+        self.rois = rois
+        # Cached candidates were found for the old regions
+        self.last_run = None
+        if self.roi_template:
+            self.__storeRoiTemplate(self.roi_template)
+
+    def _saveRoiTemplate(self):
+        default = self.roi_template
+        if not default and isinstance(getattr(self.stream_thread, "source", None), int):
+            default = f"camera {self.stream_thread.source}"
+        name, ok = QInputDialog.getText(self, "Save ROI Template", "Template name:", text=default)
+        if ok and name.strip():
+            self.roi_template = name.strip()
+            self.__storeRoiTemplate(self.roi_template)
+            self.settings.set_setting("roi_template", self.roi_template)
+
+    def __storeRoiTemplate(self, name):
+        templates = dict(self.settings.get_setting("roi_templates"))
+        templates[name] = [list(roi) for roi in self.rois]
+        self.settings.set_setting("roi_templates", templates)
+
+    def _onCutoffChanged(self, cutoff):
+        self.live_cutoff = cutoff
+        self.cutoff_timer.start()
+
+    def _applyCutoff(self):
+        """Re-filters and redraws the last run's candidates at the live cutoff."""
+        if self.last_run is None or self.live_cutoff is None:
+            return
+        source, candidates, floor = self.last_run
+        if self.live_cutoff < floor:
+            # The candidates below the floor were never kept, a new run is needed
+            self.statusBar().showMessage(f"Cutoff below {floor:.2f} requires running inference again")
+            return
+
+        options = self._withPreset({"iou_threshold": self.settings.get_setting("iou_threshold")})
+        self.detections = TFLiteModel.postprocess(candidates, self.live_cutoff, options["iou_threshold"],
+                                                  self.settings.get_setting("soft_nms"),
+                                                  self.settings.get_setting("box_fusion"))
+        self._showDetections(self.detections)
+        self.statusBar().showMessage(f"{len(self.detections)} objects at cutoff {self.live_cutoff:.2f}")
+
+    def _showImage(self, image, scale=1):
+        """Shows a BGR image, reduced by scale from the full resolution."""
+        # QPixmap.fromImage copies the pixels, so the numpy buffer may go afterwards
+        qimage = QImage(image.data, image.shape[1], image.shape[0], image.strides[0], QImage.Format_BGR888)
+        self.image_view.setImage(QPixmap.fromImage(qimage), scale)
+
+    def _showDetections(self, detections):
+        if detections is None:
+            self.image_view.clearDetections()
+        else:
+            self.image_view.setDetections(detections, self.class_names)
+        self.menu_bar.setClasses(self.image_view.classes())
+
+    def _setClassVisible(self, class_id, visible):
+        self.image_view.setClassVisible(class_id, visible)
+
+    def _fitToWindow(self):
+        self.image_view.fitToWindow()
+
+    def _startStream(self, source):
+        """Runs detection with tracking on a video file or a camera index."""
+        model_path = self.settings.get_setting("model_file")
+        class_name_path = self.settings.get_setting("class_names_file")
+        if model_path == "" or class_name_path == "":
+            QMessageBox.warning(self, "Warning", "The model and the class names file must be selected.")
+            return
+
+        self._stopStream()
+        with open(class_name_path, 'r') as file:
+            self.class_names = {int(k): v for k, v in json.load(file).items()}
+        if isinstance(source, int) and f"camera {source}" in self.settings.get_setting("roi_templates"):
+            # A fixed-mount camera has its own regions of interest
+            self._selectRoiTemplate(f"camera {source}")
+        inference_options = {
+            "iou_threshold": self.settings.get_setting("iou_threshold"),
+            "soft_nms": self.settings.get_setting("soft_nms"),
+            "box_fusion": self.settings.get_setting("box_fusion"),
+            "tiling_mode": self.settings.get_setting("tiling_mode"),
+            "pyramid_levels": self.settings.get_setting("pyramid_levels"),
+            "rois": self.rois or None
+        }
+        inference_options = self._withPreset(inference_options)
+        self.imgPath = None
+        self.last_run = None
+        self.stream_thread = StreamThread(source, model_path, self.settings.get_setting("cutoff"),
+                                          self.class_names, self.settings.get_setting("batch_size"),
+                                          self.settings.get_setting("num_workers"),
+                                          self.settings.get_setting("num_threads") or None,
+                                          self.settings.get_setting("rgb_input"),
+                                          inference_options,
+                                          self.settings.get_setting("detect_every_n_frames"),
+                                          self.settings.get_setting("stream_queue_size"))
+        self.stream_thread.frame_signal.connect(self.on_stream_frame)
+        self.stream_thread.error_signal.connect(self.on_detection_error)
+        self.stream_thread.finished.connect(self.on_stream_finished)
+        self.run_inference_button.setEnabled(False)
+        self.stream_thread.start()
+
+    def _stopStream(self):
+        if self.stream_thread is not None:
+            self.stream_thread.stop()
+            self.stream_thread.wait()
+            self.stream_thread = None
+            self.run_inference_button.setEnabled(True)
+
+    def on_stream_frame(self, result):
+        frame, detections, stats = result
+        self.detections = detections
+        self._showImage(frame)
+        self._showDetections(detections)
+        self.statusBar().showMessage(f"{len(detections)} objects  |  {stats['fps']:.1f} FPS  |  "
+                                     f"dropped {stats['dropped']}/{stats['read']} "
+                                     f"({stats['drop_rate'] * 100:.1f}%)")
+
+    def on_stream_finished(self):
+        self.run_inference_button.setEnabled(True)
+
+    def _withPreset(self, options):
+        """Overrides the options from settings with the selected tiling preset, if any."""
+        presets = load_presets(self.settings.get_setting("presets_file"))
+        name = self.settings.get_setting("tiling_preset")
+        if name and name not in presets:
+            # The presets file was moved or re-tuned without this preset
+            self.statusBar().showMessage(f"Tiling preset '{name}' not found, using the settings")
+            name = ""
+        return apply_preset(options, presets, name)
+
+    def _warmModel(self):
+        model_path = self.settings.get_setting("model_file")
+        if not model_path:
+            return
+        registry.warm(model_path,
+                      self.settings.get_setting("batch_size"),
+                      self.settings.get_setting("num_workers"),
+                      self.settings.get_setting("num_threads") or None,
+                      self.settings.get_setting("rgb_input"))
+
+    def _detectionCache(self):
+        if not self.settings.get_setting("use_cache"):
+            return None
+        if self.detection_cache is None:
+            self.detection_cache = DetectionCache(self.settings.get_setting("cache_file"),
+                                                  self.settings.get_setting("cache_max_mb") * 1024 * 1024,
+                                                  self.settings.get_setting("cache_max_age_days"))
+        return self.detection_cache
+
     def _checkShowStartUpWindow(self):
         if self.settings.get_setting("show_dialog_on_start"):
             self.start_up_window = StartUpWindow(self.settings)
@@ -91,6 +358,29 @@ class MainWindow(QMainWindow):
         
         cutoff = self.settings.get_setting("cutoff")
         model_path = self.settings.get_setting("model_file")
+        batch_size = self.settings.get_setting("batch_size")
+        num_workers = self.settings.get_setting("num_workers")
+        # 0 lets TFLite pick the number of threads itself
+        num_threads = self.settings.get_setting("num_threads") or None
+        rgb_input = self.settings.get_setting("rgb_input")
+        inference_options = {
+            "iou_threshold": self.settings.get_setting("iou_threshold"),
+            "soft_nms": self.settings.get_setting("soft_nms"),
+            "box_fusion": self.settings.get_setting("box_fusion"),
+            "adaptive_tiling": self.settings.get_setting("adaptive_tiling"),
+            "max_tiles": self.settings.get_setting("max_tiles"),
+            "tiling_mode": self.settings.get_setting("tiling_mode"),
+            "pyramid_levels": self.settings.get_setting("pyramid_levels"),
+            "objectness_cutoff": self.settings.get_setting("objectness_cutoff"),
+            "candidate_cutoff": self.settings.get_setting("candidate_cutoff"),
+            "rois": self.rois or None,
+            "memory_budget_mb": self.settings.get_setting("memory_budget_mb")
+        }
+        inference_options = self._withPreset(inference_options)
+        if inference_options["memory_budget_mb"] and not (inference_options["soft_nms"] or
+                                                          inference_options["box_fusion"]):
+            # Hard NMS can run band by band, so raw detections don't pile up
+            inference_options["band_nms_iou"] = inference_options["iou_threshold"]
         class_name_path = self.settings.get_setting("class_names_file")
 
         if model_path == "":
@@ -103,33 +393,49 @@ class MainWindow(QMainWindow):
         with open(class_name_path, 'r') as file:
             class_names = json.load(file)
             class_names = {int(k): v for k, v in class_names.items()}
+        self.class_names = class_names
         # Disable the main window or its components
         self.setEnabled(False)
         QMessageBox.information(self, "Processing", "Detection is running, please wait...")
 
         # Start the thread for detection
-        self.detection_thread = DetectionThread(model_path, self.imgPath, cutoff, class_names)
+        self.detection_thread = DetectionThread(model_path, self.imgPath, cutoff, class_names, batch_size,
+                                                num_workers, num_threads, rgb_input, inference_options,
+                                                self._detectionCache(), class_name_path,
+                                                self.settings.get_setting("profiling"),
+                                                self.settings.get_setting("profile_json_file"),
+                                                self.settings.get_setting("profile_trace_file"),
+                                                self.image_source)
+        self.detection_thread.stats_signal.connect(self.on_detection_stats)
+        self.detection_thread.candidates_signal.connect(self.on_candidates_ready)
         self.detection_thread.finished_signal.connect(self.on_detection_finished)
         self.detection_thread.error_signal.connect(self.on_detection_error)
         self.detection_thread.start()
 
+    def on_detection_stats(self, stats):
+        lines = [f"Total: {stats['total_ms']:.1f} ms"]
+        for name, stage in sorted(stats["stages"].items(), key=lambda item: -item[1]["ms"]):
+            lines.append(f"{name:<14}{stage['ms']:>10.1f} ms  x{stage['calls']}")
+        lines.append("  ".join(f"{name}: {value}" for name, value in stats["counters"].items()))
+        self.stats_label.setText("\n".join(lines))
+        self.stats_label.show()
+
+    def on_candidates_ready(self, result):
+        self.last_run = result
+
     def on_detection_finished(self, result):
-        image, detections = result
+        detections, seconds = result
+        self.detections = detections
         # Re-enable the main window or its components
         self.setEnabled(True)
+        # Boxes go over the preview that is already shown, no image is redrawn
+        self._showDetections(detections)
+        self.process_detections(detections, seconds)
 
         if not detections:
             QMessageBox.information(self, "No Detections", "No objects were detected.")
             return
 
-        self.process_detections(detections)
-
-        # Convert the image to QPixmap and display it in the label
-        # Assume image is in the correct format (if not, convert it before setting)
-        qimage = QImage(image.data, image.shape[1], image.shape[0], QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimage)
-        self.image_label.setPixmap(pixmap)
-        
         QMessageBox.information(self, "Success", "Detection completed successfully.")
 
     def on_detection_error(self, error_message):
@@ -137,22 +443,49 @@ class MainWindow(QMainWindow):
         self.setEnabled(True)
         QMessageBox.critical(self, "Error", f"An error occurred: {error_message}")
 
-    def process_detections(self, detections):
-        # Count the number of detections for each class
-        class_counts = Counter([det[1] for det in detections])  # Assuming det[1] is the class name
-
-        # Write the counts to a text file
-        with open("detection_counts.txt", "w") as file:
-            for class_name, count in class_counts.items():
-                file.write(f"{class_name}: {count}\n")
-        
-        # Optionally, write the counts to a JSON file for easier processing by other programs
-        with open("detection_counts.json", "w") as file:
-            json.dump(class_counts, file, indent=4)
-
-        QMessageBox.information(self, "Detection Complete", "The detection counts have been written to detection_counts.txt and detection_counts.json.")
+    def process_detections(self, detections, seconds):
+        """Queues the run's boxes, scores, counts and timing for the background exporter."""
+        if not self.settings.get_setting("export_formats"):
+            return
+        try:
+            exporter = self._exporter()
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Export", f"The results could not be exported: {e}")
+            return
+        exporter.submit(detection_record(self.imgPath, self.image_source.size, detections,
+                                         self.class_names, seconds))
+        self.statusBar().showMessage(f"Results are written to {', '.join(exporter.paths.values())}")
+
+    def _exporter(self):
+        if self.exporter is None:
+            self.exporter = ResultExporter(self.settings.get_setting("export_file"),
+                                           self.settings.get_setting("export_formats"),
+                                           self.class_names, self.settings.get_setting("model_file"))
+        return self.exporter
+
+    def _closeDetectionCache(self):
+        if self.detection_cache is None:
+            return
+        cache, self.detection_cache = self.detection_cache, None
+        if self.detection_thread is not None and self.detection_thread.isRunning():
+            # The running detection still looks up and stores candidates
+            self.detection_thread.finished.connect(cache.close)
+        else:
+            cache.close()
+
+    def _closeExporter(self):
+        if self.exporter is None:
+            return
+        exporter, self.exporter = self.exporter, None
+        try:
+            exporter.close()
+        except OSError as e:
+            QMessageBox.warning(self, "Export", f"The results could not be exported: {e}")
 
     def closeEvent(self, event):
+        self._stopStream()
+        self._closeExporter()
+        self._closeDetectionCache()
         if self.start_up_window:
             self.start_up_window.close()
         if self.settings_window:
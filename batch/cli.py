@@ -0,0 +1,152 @@
+"""
+Headless batch detection.
+
+Runs the sliding-window detector over a directory, glob pattern or list of
+images and appends one JSON line per image to the output file. Images that
+already have a result in the output file are skipped, so an interrupted run
+can simply be started again.
+
+Usage:
+    python -m batch photos/ --model model.tflite --class-names class_names.json
+    python -m batch "audits/**/*.jpg" --output audit.jsonl --adaptive-tiling
+    python -m batch photos/ --model model.tflite --class-names class_names.json --preset fast
+    python -m batch photos/ --model model.tflite --class-names class_names.json --export csv,coco
+"""
+import argparse
+import json
+
+from model.model_tflite import TFLiteModel
+from model.detection_cache import DetectionCache
+from model.presets import PRESET_NAMES, apply_preset, load_presets
+from model.exporter import EXPORT_FORMATS, parquet_available
+from model import tile_planner
+from .pipeline import BatchPipeline, collect_images, load_processed
+from .process_pool import ProcessPipeline
+
+
+def load_class_names(path):
+    with open(path, 'r') as file:
+        return {int(k): v for k, v in json.load(file).items()}
+
+
+def parse_roi(value):
+    """Parses an "x0,y0,x1,y1" region of interest given as fractions of the image size."""
+    try:
+        return tile_planner.parse_roi(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_formats(value):
+    """Parses comma-separated export formats."""
+    formats = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in formats if name not in EXPORT_FORMATS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown export formats {unknown}, expected some of {list(EXPORT_FORMATS)}")
+    return formats
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m batch", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", help="Image files, directories or glob patterns")
+    parser.add_argument("--file-list", help="Text file with one image path per line")
+    parser.add_argument("--model", required=True, help="Path to the .tflite model")
+    parser.add_argument("--class-names", required=True, help="Path to the class names JSON file")
+    parser.add_argument("--output", default="detections.jsonl", help="JSONL file to append results to")
+    parser.add_argument("--no-resume", action="store_true", help="Process images that already have results")
+    parser.add_argument("--export", type=parse_formats, default=[],
+                        help="Also write these formats next to the output: csv, coco, parquet (needs pyarrow)")
+    parser.add_argument("--cache", help="SQLite file to cache raw detections in")
+    parser.add_argument("--cache-max-mb", type=int, default=1024)
+    parser.add_argument("--cache-max-age-days", type=float, default=30)
+
+    parser.add_argument("--cutoff", type=float, default=0.5)
+    parser.add_argument("--iou-threshold", type=float, default=0.5)
+    parser.add_argument("--soft-nms", action="store_true")
+    parser.add_argument("--box-fusion", action="store_true",
+                        help="Merge overlapping boxes with weighted box fusion instead of NMS")
+    parser.add_argument("--tiling-mode", choices=["window", "pyramid"], default="window")
+    parser.add_argument("--pyramid-levels", type=int, default=3)
+    parser.add_argument("--adaptive-tiling", action="store_true")
+    parser.add_argument("--max-tiles", type=int, default=0)
+    parser.add_argument("--roi", type=parse_roi, action="append", dest="rois",
+                        help="Only detect in this x0,y0,x1,y1 region, as fractions of the image; repeatable")
+    parser.add_argument("--objectness-cutoff", type=float, default=0.2)
+    parser.add_argument("--candidate-cutoff", type=float, default=None,
+                        help="Keep raw candidates down to this score in the cache")
+    parser.add_argument("--preset", choices=PRESET_NAMES,
+                        help="Tiling and IoU options tuned by tools.autotune; overrides the options above")
+    parser.add_argument("--presets-file", default="tiling_presets.json")
+
+    parser.add_argument("--memory-budget-mb", type=float, default=0,
+                        help="Decode images larger than this reduced and reduce detections row by row (0 = off)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--num-workers", type=int, default=1, help="Interpreters running tiles in parallel")
+    parser.add_argument("--num-threads", type=int, default=0, help="Threads per interpreter (0 = auto)")
+    parser.add_argument("--rgb-input", action="store_true", help="The model takes RGB rather than BGR tiles")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="Worker processes, each with its own model (0 = run in this process)")
+    parser.add_argument("--chunk-tiles", type=int, default=64,
+                        help="Windows per chunk that idle worker processes can take over")
+    parser.add_argument("--decoders", type=int, default=2, help="Image decoding threads")
+    parser.add_argument("--prefetch", type=int, default=4, help="Decoded images kept ahead of inference")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    presets = load_presets(args.presets_file)
+    if args.preset and args.preset not in presets:
+        parser.error(f"No preset {args.preset!r} in {args.presets_file}, run python -m tools.autotune first")
+    if "parquet" in args.export and not parquet_available():
+        parser.error("Parquet export requires pyarrow to be installed")
+
+    paths = collect_images(args.inputs, args.file_list)
+    if not args.no_resume:
+        processed = load_processed(args.output)
+        skipped = len(paths)
+        paths = [path for path in paths if path not in processed]
+        skipped -= len(paths)
+        if skipped:
+            print(f"Skipping {skipped} already processed images")
+
+    if not paths:
+        print("Nothing to do.")
+        return
+
+    cache = None
+    if args.cache:
+        cache = DetectionCache(args.cache, args.cache_max_mb * 1024 * 1024, args.cache_max_age_days)
+
+    options = dict(iou_threshold=args.iou_threshold, soft_nms=args.soft_nms, box_fusion=args.box_fusion,
+                   tiling_mode=args.tiling_mode, pyramid_levels=args.pyramid_levels,
+                   adaptive_tiling=args.adaptive_tiling, max_tiles=args.max_tiles,
+                   objectness_cutoff=args.objectness_cutoff,
+                   candidate_cutoff=args.candidate_cutoff, rois=args.rois,
+                   memory_budget_mb=args.memory_budget_mb)
+    options = apply_preset(options, presets, args.preset)
+    model_args = (args.model, args.batch_size, args.num_workers, args.num_threads or None, args.rgb_input)
+    try:
+        if args.processes:
+            pipeline = ProcessPipeline(model_args, load_class_names(args.class_names), args.cutoff,
+                                       num_processes=args.processes, chunk_tiles=args.chunk_tiles,
+                                       num_decoders=args.decoders, queue_size=args.prefetch,
+                                       cache=cache, class_names_path=args.class_names, **options)
+            summary = pipeline.run(paths, args.output, export_formats=args.export)
+        else:
+            model = TFLiteModel(*model_args)
+            try:
+                pipeline = BatchPipeline(model, load_class_names(args.class_names), args.cutoff,
+                                         num_decoders=args.decoders, queue_size=args.prefetch,
+                                         cache=cache, class_names_path=args.class_names, **options)
+                summary = pipeline.run(paths, args.output, export_formats=args.export)
+            finally:
+                model.close()
+    finally:
+        if cache is not None:
+            cache.close()
+
+    print(f"Processed {summary['images']} images ({summary['failed']} failed, {summary['cached']} cached) "
+          f"in {summary['seconds']:.1f} s: {summary['images_per_sec']:.2f} images/sec")
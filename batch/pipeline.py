@@ -0,0 +1,216 @@
+import glob
+import json
+import os
+import threading
+import time
+from queue import Queue
+
+import cv2
+
+from model.detections import candidate_floor
+from model.exporter import ResultExporter, detection_record
+from model.image_source import ImageSource, image_size
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+# Marks the end of a stream in the pipeline queues
+_DONE = object()
+
+
+def collect_images(inputs, file_list=None):
+    """
+    Expands directories, glob patterns and plain file paths into image paths.
+
+    Args:
+        inputs (List[str]): Directories, glob patterns or image files.
+        file_list (str, optional): A text file with one image path per line.
+
+    Returns:
+        List[str]: Image paths in a stable, de-duplicated order.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths += sorted(os.path.join(item, name) for name in os.listdir(item)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif glob.has_magic(item):
+            paths += sorted(path for path in glob.glob(item, recursive=True)
+                            if path.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.append(item)
+
+    if file_list:
+        with open(file_list, 'r') as file:
+            paths += [line.strip() for line in file if line.strip()]
+
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+
+def load_processed(output_path):
+    """Returns the images that already have a successful record in a JSONL file."""
+    processed = set()
+    if not os.path.exists(output_path):
+        return processed
+
+    with open(output_path, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be cut off if a previous run was killed
+                continue
+            if "error" not in record:
+                processed.add(record["image"])
+    return processed
+
+
+def write_records(results, exporter, summary):
+    """Hands records from a queue to a ResultExporter until _DONE, counting them in summary."""
+    while True:
+        record = results.get()
+        if record is _DONE:
+            break
+
+        # The exporter writes in batches on its own thread
+        exporter.submit(record)
+        summary["failed" if "error" in record else "images"] += 1
+        summary["cached"] += record.get("cached", False)
+
+
+def export_results(output_path, export_formats, class_name, model_path):
+    """A ResultExporter that always writes the JSONL file, which resuming reads."""
+    formats = ("jsonl",) + tuple(name for name in export_formats if name != "jsonl")
+    return ResultExporter(output_path, formats, class_name, model_path)
+
+
+class BatchPipeline:
+    """
+    A bounded decode -> infer -> write pipeline for many images.
+
+    Prefetch threads decode images with cv2.imread into a bounded queue, the
+    calling thread runs the model, and a writer thread hands one record per
+    image to a ResultExporter, which appends them in batches. Queue sizes
+    bound how many decoded images are held in memory.
+
+    With a memory_budget_mb option, images are instead decoded on the calling
+    thread within the budget (see TFLiteModel.detect_candidates()), and hard
+    NMS is applied band by band as the windows advance.
+    """
+
+    def __init__(self, model, class_name, cutoff, num_decoders=2, queue_size=4,
+                 cache=None, class_names_path="", **options) -> None:
+        self.model = model
+        self.class_name = class_name
+        self.cutoff = cutoff
+        self.tiling = dict(options)
+        self.iou_threshold = self.tiling.pop("iou_threshold", 0.5)
+        self.soft_nms = self.tiling.pop("soft_nms", False)
+        self.box_fusion = self.tiling.pop("box_fusion", False)
+        if self.tiling.get("memory_budget_mb") and not (self.soft_nms or self.box_fusion):
+            # Hard NMS can run band by band, so raw detections don't pile up
+            self.tiling["band_nms_iou"] = self.iou_threshold
+        self.num_decoders = max(1, num_decoders)
+        self.queue_size = max(1, queue_size)
+        self.cache = cache
+        self.class_names_path = class_names_path
+
+    def run(self, paths, output_path, log_every=50, export_formats=()):
+        """
+        Processes the images and appends the results to a JSONL file.
+
+        export_formats adds more ResultExporter formats next to the JSONL file.
+
+        Returns:
+            Dict[str, float]: A summary with image counts, elapsed time and images/sec.
+        """
+        paths_queue = Queue()
+        decoded = Queue(maxsize=self.queue_size)
+        results = Queue(maxsize=self.queue_size)
+        for path in paths:
+            paths_queue.put(path)
+        for _ in range(self.num_decoders):
+            paths_queue.put(_DONE)
+
+        decoders = [threading.Thread(target=self.__decode, args=(paths_queue, decoded), daemon=True)
+                    for _ in range(self.num_decoders)]
+        summary = {"images": 0, "failed": 0, "cached": 0}
+        exporter = export_results(output_path, export_formats, self.class_name, self.model.model_path)
+        writer = threading.Thread(target=write_records, args=(results, exporter, summary), daemon=True)
+        for thread in decoders + [writer]:
+            thread.start()
+
+        start = time.perf_counter()
+        finished_decoders = 0
+        done = 0
+        while finished_decoders < self.num_decoders:
+            item = decoded.get()
+            if item is _DONE:
+                finished_decoders += 1
+                continue
+
+            results.put(self.__infer(*item))
+
+            done += 1
+            if log_every and done % log_every == 0:
+                print(f"{done}/{len(paths)} images, {done / (time.perf_counter() - start):.2f} images/sec")
+
+        results.put(_DONE)
+        writer.join()
+        exporter.close()
+
+        elapsed = time.perf_counter() - start
+        summary["seconds"] = round(elapsed, 3)
+        summary["images_per_sec"] = round(summary["images"] / elapsed, 3) if elapsed > 0 else 0.0
+        return summary
+
+    def __infer(self, path, image, key, hit, error):
+        if error is not None:
+            return {"image": path, "error": error}
+
+        image_start = time.perf_counter()
+        try:
+            if hit is not None:
+                candidates, size = hit
+            else:
+                candidates = self.model.detect_candidates(image, self.cutoff, **self.tiling)
+                size = image_size(image)
+                if self.cache is not None:
+                    floor = candidate_floor(self.cutoff, self.tiling.get("candidate_cutoff"))
+                    self.cache.put(key, candidates, floor, *size)
+
+            detections = self.model.postprocess(candidates, self.cutoff, self.iou_threshold,
+                                                self.soft_nms, self.box_fusion)
+            record = detection_record(path, size, detections, self.class_name,
+                                      time.perf_counter() - image_start)
+            record["cached"] = hit is not None
+            return record
+        except Exception as e:
+            return {"image": path, "error": str(e)}
+
+    def __decode(self, paths_queue, decoded):
+        while True:
+            path = paths_queue.get()
+            if path is _DONE:
+                decoded.put(_DONE)
+                return
+
+            key = hit = None
+            try:
+                if self.cache is not None:
+                    # A cache hit doesn't need the pixels at all
+                    key, hit = self.cache.lookup(path, self.model.model_path, self.cutoff, self.class_names_path,
+                                                 rgb_input=self.model.rgb_input, **self.tiling)
+            except OSError as e:
+                decoded.put((path, None, None, None, str(e)))
+                continue
+            if hit is not None:
+                decoded.put((path, None, key, hit, None))
+                continue
+
+            if self.tiling.get("memory_budget_mb"):
+                # Decoded on the inference thread within the budget, so prefetched images hold no pixels
+                decoded.put((path, ImageSource(path), key, None, None))
+                continue
+            image = cv2.imread(path)
+            error = None if image is not None else f"Could not read image: {path}"
+            decoded.put((path, image, key, None, error))
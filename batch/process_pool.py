@@ -0,0 +1,319 @@
+import itertools
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+from queue import Queue, Empty
+
+import cv2
+import numpy as np
+
+from model.detections import Detections, candidate_floor
+from model.model_tflite import TFLiteModel
+from .pipeline import detection_record, export_results, write_records, _DONE
+
+
+def _attach(name, shape):
+    # Worker processes share the parent's resource tracker, so attaching here
+    # doesn't unlink the block when a worker exits
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+
+def _worker_main(model_args, tiling, cutoff, chunk_tiles, images, chunks, results, initializer=None):
+    """
+    The loop of a worker process.
+
+    Stolen tile chunks of other workers' images are taken before new images,
+    so an image split into chunks is finished by every idle worker together.
+    """
+    if initializer is not None:
+        initializer()
+    model = TFLiteModel(*model_args)
+    model.warm_up()
+    floor = candidate_floor(cutoff, tiling.get("candidate_cutoff"))
+    results.put(("ready", None))
+
+    while True:
+        try:
+            task = chunks.get_nowait()
+        except Empty:
+            try:
+                task = images.get(timeout=0.05)
+            except Empty:
+                continue
+        if task is None:
+            break
+
+        kind, job_id, name, shape, (index, regions) = task
+        shm = image = None
+        try:
+            shm, image = _attach(name, shape)
+            if kind == "image":
+                _run_image(model, job_id, name, shape, image, cutoff, floor, tiling, chunk_tiles,
+                            chunks, results)
+            else:
+                found = model.run_tiles(image, floor, regions, tiling.get("rois"))
+                results.put(("part", job_id, index, _compact(found)))
+        except Exception as e:
+            results.put(("error", job_id, str(e)))
+        finally:
+            del image
+            if shm is not None:
+                shm.close()
+
+    model.close()
+
+
+def _run_image(model, job_id, name, shape, image, cutoff, floor, tiling, chunk_tiles, chunks, results):
+    tiling = dict(tiling)
+    if tiling.get("tiling_mode", "window") != "window":
+        # Pyramid levels are built per image and aren't split
+        results.put(("plan", job_id, 1))
+        results.put(("part", job_id, 0, _compact(model.detect_candidates(image, cutoff, **tiling))))
+        return
+
+    for option in ("tiling_mode", "pyramid_levels", "pyramid_overlap"):
+        tiling.pop(option, None)
+    regions, coarse = model.plan_windows(image, cutoff, **tiling)
+    if regions is None:
+        results.put(("plan", job_id, 1))
+        results.put(("part", job_id, 0, _compact(coarse)))
+        return
+
+    parts = [regions[start:start + chunk_tiles] for start in range(0, len(regions), chunk_tiles)]
+    results.put(("plan", job_id, len(parts)))
+    # Any idle process may take the remaining parts
+    for index, part in enumerate(parts[1:], 1):
+        chunks.put(("tiles", job_id, name, shape, (index, part)))
+    results.put(("part", job_id, 0, _compact(model.run_tiles(image, floor, parts[0], tiling.get("rois")))))
+
+
+def _compact(detections):
+    return detections.boxes, detections.scores, detections.class_ids
+
+
+class ProcessPipeline:
+    """
+    A batch pipeline that runs the model in a pool of worker processes.
+
+    Each process loads its own TFLiteModel once, so Python-side tile work runs
+    in parallel instead of contending for one GIL. Decoder threads in the
+    parent read images into shared memory blocks; workers map the pixels
+    without copying and send back compact (boxes, scores, class ids) arrays.
+
+    Scheduling is work-stealing: a worker that plans more than chunk_tiles
+    windows for an image keeps the first chunk and offers the rest on a shared
+    chunk queue, which idle workers drain before they take new images. One
+    huge image is therefore spread over all processes instead of stalling the
+    batch. The parent merges the chunks, applies NMS and writes the records.
+
+    Args:
+        model_args (tuple): (model_path, batch_size, num_workers, num_threads,
+            rgb_input) for the TFLiteModel of every process.
+        class_name (Dict[int, str]): Class names by id.
+        cutoff (float): The detection cutoff.
+        num_processes (int, optional): Worker processes. Defaults to 2.
+        chunk_tiles (int, optional): Windows per stealable chunk. Defaults to 64.
+        num_decoders (int, optional): Decoding threads. Defaults to 2.
+        queue_size (int, optional): Decoded images in shared memory at once,
+            beyond one per process. Defaults to 4.
+        cache (DetectionCache, optional): The raw detection cache.
+        class_names_path (str, optional): The class names file, part of cache keys.
+        initializer (Callable, optional): A picklable function every worker
+            process calls before loading its model, e.g. to select an
+            interpreter backend; spawned processes don't inherit the parent's.
+        **options: Options for TFLiteModel.detect().
+    """
+
+    def __init__(self, model_args, class_name, cutoff, num_processes=2, chunk_tiles=64,
+                 num_decoders=2, queue_size=4, cache=None, class_names_path="", initializer=None,
+                 **options) -> None:
+        self.model_args = tuple(model_args)
+        self.initializer = initializer
+        self.class_name = class_name
+        self.cutoff = cutoff
+        self.tiling = dict(options)
+        self.iou_threshold = self.tiling.pop("iou_threshold", 0.5)
+        self.soft_nms = self.tiling.pop("soft_nms", False)
+        self.box_fusion = self.tiling.pop("box_fusion", False)
+        # Images are copied whole into shared memory, which queue_size bounds instead
+        self.tiling.pop("memory_budget_mb", None)
+        self.num_processes = max(1, num_processes)
+        self.chunk_tiles = max(1, chunk_tiles)
+        self.num_decoders = max(1, num_decoders)
+        self.queue_size = max(1, queue_size)
+        self.cache = cache
+        self.class_names_path = class_names_path
+
+    def run(self, paths, output_path, log_every=50, export_formats=()):
+        """
+        Processes the images and appends the results to a JSONL file.
+
+        export_formats adds more ResultExporter formats next to the JSONL file.
+
+        Returns:
+            Dict[str, float]: A summary with image counts, elapsed time and images/sec.
+        """
+        # spawn: the interpreter runtime must not be inherited through fork
+        context = multiprocessing.get_context("spawn")
+        images, chunks, results = context.Queue(), context.Queue(), context.Queue()
+        workers = [context.Process(target=_worker_main,
+                                   args=(self.model_args, self.tiling, self.cutoff, self.chunk_tiles,
+                                         images, chunks, results, self.initializer),
+                                   daemon=True)
+                   for _ in range(self.num_processes)]
+        for worker in workers:
+            worker.start()
+
+        summary = {"images": 0, "failed": 0, "cached": 0}
+        records = Queue()
+        exporter = export_results(output_path, export_formats, self.class_name, self.model_args[0])
+        writer = threading.Thread(target=write_records, args=(records, exporter, summary), daemon=True)
+        writer.start()
+
+        jobs = {}
+        lock = threading.Lock()
+        finished = itertools.count(1)
+
+        def finish(record):
+            records.put(record)
+            done = next(finished)
+            if log_every and done % log_every == 0:
+                print(f"{done}/{len(paths)} images, {done / (time.perf_counter() - start):.2f} images/sec")
+
+        # Bounds the decoded images held in shared memory
+        slots = threading.Semaphore(self.num_processes + self.queue_size)
+        paths_queue = Queue()
+        for path in paths:
+            paths_queue.put(path)
+        decoders = [threading.Thread(target=self.__decode,
+                                     args=(paths_queue, images, finish, jobs, lock, slots), daemon=True)
+                    for _ in range(self.num_decoders)]
+
+        start = time.perf_counter()
+        try:
+            ready = 0
+            while ready < self.num_processes:
+                message = self.__get(results, workers)
+                ready += message is not None and message[0] == "ready"
+
+            start = time.perf_counter()
+            for thread in decoders:
+                thread.start()
+            while True:
+                with lock:
+                    if not jobs and not any(thread.is_alive() for thread in decoders):
+                        break
+                message = self.__get(results, workers, timeout=0.1)
+                if message is not None:
+                    self.__handle(message, jobs, lock, finish, slots)
+        finally:
+            for _ in workers:
+                images.put(None)
+            for worker in workers:
+                worker.join(timeout=10)
+                if worker.is_alive():
+                    worker.terminate()
+            for job in jobs.values():
+                self.__release(job)
+            records.put(_DONE)
+            writer.join()
+            exporter.close()
+
+        elapsed = time.perf_counter() - start
+        summary["seconds"] = round(elapsed, 3)
+        summary["images_per_sec"] = round(summary["images"] / elapsed, 3) if elapsed > 0 else 0.0
+        return summary
+
+    @staticmethod
+    def __get(results, workers, timeout=1.0):
+        try:
+            return results.get(timeout=timeout)
+        except Empty:
+            if not all(worker.is_alive() for worker in workers):
+                raise RuntimeError("A worker process exited unexpectedly")
+            return None
+
+    def __decode(self, paths_queue, images, finish, jobs, lock, slots):
+        while True:
+            try:
+                path = paths_queue.get_nowait()
+            except Empty:
+                return
+
+            key = hit = None
+            try:
+                if self.cache is not None:
+                    # A cache hit doesn't need the pixels at all
+                    key, hit = self.cache.lookup(path, self.model_args[0], self.cutoff, self.class_names_path,
+                                                 rgb_input=self.model_args[4], **self.tiling)
+            except OSError as e:
+                finish({"image": path, "error": str(e)})
+                continue
+            if hit is not None:
+                finish(self.__record(path, hit[0], hit[1], 0.0, cached=True))
+                continue
+
+            slots.acquire()
+            start = time.perf_counter()
+            image = cv2.imread(path)
+            if image is None:
+                slots.release()
+                finish({"image": path, "error": f"Could not read image: {path}"})
+                continue
+
+            shm = shared_memory.SharedMemory(create=True, size=image.nbytes)
+            np.ndarray(image.shape, dtype=np.uint8, buffer=shm.buf)[...] = image
+            # The shared memory block name is unique, so it doubles as the job id
+            job_id = shm.name
+            with lock:
+                jobs[job_id] = {"path": path, "shm": shm, "key": key, "start": start,
+                                "size": (image.shape[1], image.shape[0]), "parts": [], "expected": None}
+            images.put(("image", job_id, shm.name, image.shape, (0, None)))
+            del image
+
+    def __handle(self, message, jobs, lock, finish, slots):
+        kind, job_id = message[0], message[1]
+        with lock:
+            job = jobs.get(job_id)
+        if job is None:
+            # A late chunk of a job that already failed
+            return
+
+        if kind == "error":
+            finish({"image": job["path"], "error": message[2]})
+        elif kind == "plan":
+            job["expected"] = message[2]
+        else:
+            job["parts"].append((message[2], Detections(*message[3])))
+        if kind != "error" and (job["expected"] is None or len(job["parts"]) < job["expected"]):
+            return
+
+        with lock:
+            del jobs[job_id]
+        self.__release(job)
+        slots.release()
+        if kind == "error":
+            return
+
+        # In chunk order, so ties in NMS resolve as in a single process
+        candidates = Detections.concatenate([part for _, part in sorted(job["parts"], key=lambda p: p[0])])
+        if self.cache is not None:
+            floor = candidate_floor(self.cutoff, self.tiling.get("candidate_cutoff"))
+            self.cache.put(job["key"], candidates, floor, *job["size"])
+        finish(self.__record(job["path"], candidates, job["size"], time.perf_counter() - job["start"]))
+
+    def __record(self, path, candidates, size, seconds, cached=False):
+        detections = TFLiteModel.postprocess(candidates, self.cutoff, self.iou_threshold,
+                                             self.soft_nms, self.box_fusion)
+        record = detection_record(path, size, detections, self.class_name, seconds)
+        record["cached"] = cached
+        return record
+
+    @staticmethod
+    def __release(job):
+        if job["shm"] is not None:
+            job["shm"].close()
+            job["shm"].unlink()
+            job["shm"] = None
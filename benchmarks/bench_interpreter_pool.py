@@ -0,0 +1,67 @@
+"""
+Scaling benchmark for InterpreterPool.
+
+Pushes the same set of random tiles through pools of 1, 2, 4 and 8 workers
+and prints tiles per second for each size.
+
+Usage:
+    python -m benchmarks.bench_interpreter_pool path/to/model.tflite
+"""
+import argparse
+import time
+
+import numpy as np
+
+from model.interpreter_pool import InterpreterPool
+
+
+def run_pool(model_path, num_workers, num_tiles, batch_size, num_threads):
+    pool = InterpreterPool(model_path, num_workers, batch_size, num_threads)
+    try:
+        _, height, width, channels = pool.input_details[0]['shape']
+        dtype = pool.input_details[0]['dtype']
+        shape = (pool.batch_size, height, width, channels)
+        rng = np.random.default_rng(0)
+        if np.issubdtype(dtype, np.integer):
+            info = np.iinfo(dtype)
+            batch = rng.integers(info.min, info.max, size=shape, dtype=dtype, endpoint=True)
+        else:
+            batch = rng.random(shape).astype(dtype)
+
+        # Warm-up: the first invoke of each interpreter is noticeably slower
+        for future in [pool.submit(batch) for _ in range(num_workers)]:
+            future.result()
+
+        num_batches = -(-num_tiles // pool.batch_size)
+        start = time.perf_counter()
+        futures = [pool.submit(batch) for _ in range(num_batches)]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.close()
+
+    return num_batches * pool.batch_size / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", help="Path to a .tflite detection model")
+    parser.add_argument("--tiles", type=int, default=256, help="Tiles per measurement")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--num-threads", type=int, default=1,
+                        help="Threads per interpreter (0 lets TFLite decide)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'tiles/s':>10} {'speedup':>8}")
+    for num_workers in args.workers:
+        tiles_per_sec = run_pool(args.model, num_workers, args.tiles, args.batch_size,
+                                 args.num_threads or None)
+        baseline = baseline or tiles_per_sec
+        print(f"{num_workers:>8} {tiles_per_sec:>10.1f} {tiles_per_sec / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
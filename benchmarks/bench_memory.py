@@ -0,0 +1,77 @@
+"""
+Peak memory of one detection versus image size, with and without a memory budget.
+
+Writes synthetic shelf JPEGs of growing size and runs TFLiteModel.detect()
+on each in a fresh process, printing the process's peak RSS. With a budget
+the peak should stay flat as the images grow.
+
+Usage:
+    python -m benchmarks.bench_memory --model path/to/model.tflite
+    python -m benchmarks.bench_memory --budget-mb 64     # builds a synthetic model
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+
+import cv2
+
+from .synthetic import build_detection_model, make_shelf_image
+
+
+def _high_water_mb():
+    # ru_maxrss of a spawned child starts at the parent's peak on Linux; VmHWM doesn't
+    try:
+        with open("/proc/self/status", 'r') as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _peak_rss(model_path, image_path, memory_budget_mb, results):
+    from model.image_source import ImageSource
+    from model.model_tflite import TFLiteModel
+
+    model = TFLiteModel(model_path)
+    detections = model.detect(ImageSource(image_path), 0.5, memory_budget_mb=memory_budget_mb,
+                              band_nms_iou=0.5 if memory_budget_mb else None)
+    model.close()
+    results.put((_high_water_mb(), len(detections)))
+
+
+def peak_rss(model_path, image_path, memory_budget_mb):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_peak_rss, args=(model_path, image_path, memory_budget_mb, results))
+    process.start()
+    peak, found = results.get()
+    process.join()
+    return peak, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Path to a .tflite detection model; a synthetic one by default")
+    parser.add_argument("--widths", type=int, nargs="+", default=[2000, 4000, 8000, 12000])
+    parser.add_argument("--budget-mb", type=float, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        model_path = args.model or build_detection_model(os.path.join(tmpdir, "synthetic.tflite"))
+        print(f"{'image':>12} {'decoded MB':>11} {'peak MB':>9} {'budget peak MB':>15} {'found':>7} {'budget found':>13}")
+        for width in args.widths:
+            height = width * 3 // 4
+            image_path = os.path.join(tmpdir, f"shelf_{width}.jpg")
+            cv2.imwrite(image_path, make_shelf_image(width, height))
+            peak, found = peak_rss(model_path, image_path, 0)
+            budget_peak, budget_found = peak_rss(model_path, image_path, args.budget_mb)
+            print(f"{width:>6}x{height:<5} {width * height * 3 / 2 ** 20:>11.1f} {peak:>9.1f} "
+                  f"{budget_peak:>15.1f} {found:>7} {budget_found:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Micro-benchmarks for the NMS engine.
+
+Times greedy NMS, class-aware NMS, grid NMS, weighted box fusion and
+soft-NMS on clustered random boxes that look like the output of
+overlapping sliding-window tiles.
+
+Usage:
+    python -m benchmarks.bench_nms
+"""
+import argparse
+import time
+
+import numpy as np
+
+from model.nms import nms, soft_nms, grid_nms, weighted_box_fusion
+
+
+def make_boxes(n, num_objects=None, num_classes=10, seed=0):
+    """Random boxes scattered around object centers, as from overlapping tiles."""
+    rng = np.random.default_rng(seed)
+    num_objects = num_objects or max(1, n // 20)
+    side = 40 * np.sqrt(num_objects)
+    centers = rng.uniform(0, side, size=(num_objects, 2))
+    owner = rng.integers(0, num_objects, size=n)
+    xy = centers[owner] + rng.normal(0, 4, size=(n, 2))
+    wh = rng.uniform(25, 35, size=(n, 2))
+    boxes = np.hstack([xy, xy + wh]).astype(np.float32)
+    scores = rng.random(n).astype(np.float32)
+    class_ids = (owner % num_classes).astype(np.int16)
+    return boxes, scores, class_ids
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--soft-max", type=int, default=10000,
+                        help="Largest size to run soft-NMS on (it is quadratic)")
+    args = parser.parse_args()
+
+    print(f"{'boxes':>8} {'nms ms':>10} {'per-class ms':>13} {'grid ms':>10} {'wbf ms':>10} "
+          f"{'soft-nms ms':>12} {'kept':>7}")
+    for n in args.sizes:
+        boxes, scores, class_ids = make_boxes(n)
+        kept = len(nms(boxes, scores, args.iou))
+        t_nms = best_of(lambda: nms(boxes, scores, args.iou), args.repeat)
+        t_cls = best_of(lambda: nms(boxes, scores, args.iou, class_ids), args.repeat)
+        t_grid = best_of(lambda: grid_nms(boxes, scores, args.iou, class_ids), args.repeat)
+        t_wbf = best_of(lambda: weighted_box_fusion(boxes, scores, args.iou, class_ids), args.repeat)
+        if n <= args.soft_max:
+            t_soft = f"{best_of(lambda: soft_nms(boxes, scores, args.iou, class_ids), 1) * 1000:>12.1f}"
+        else:
+            t_soft = f"{'skipped':>12}"
+        print(f"{n:>8} {t_nms * 1000:>10.1f} {t_cls * 1000:>13.1f} {t_grid * 1000:>10.1f} "
+              f"{t_wbf * 1000:>10.1f} {t_soft} {kept:>7}")
+
+
+if __name__ == "__main__":
+    main()
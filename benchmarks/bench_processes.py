@@ -0,0 +1,67 @@
+"""
+Throughput of the multi-process batch pipeline versus the number of processes.
+
+Writes synthetic shelf images of mixed sizes, including one much larger
+image, and runs them through ProcessPipeline with 1, 2, 4 and 8 worker
+processes, printing images per second for each.
+
+Usage:
+    python -m benchmarks.bench_processes --model path/to/model.tflite
+    python -m benchmarks.bench_processes          # builds a synthetic model
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import cv2
+
+from batch.process_pool import ProcessPipeline
+from .synthetic import build_detection_model, make_shelf_image
+
+
+def write_images(directory, num_images, seed=0):
+    paths = []
+    for i in range(num_images):
+        # Every eighth image is a large panorama, the worst case for static scheduling
+        width, height = (6000, 2000) if i % 8 == 0 else (1600, 1200)
+        path = os.path.join(directory, f"shelf_{i:03d}.jpg")
+        cv2.imwrite(path, make_shelf_image(width, height, seed=seed + i))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Path to a .tflite detection model; a synthetic one by default")
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--num-threads", type=int, default=1, help="Threads per interpreter")
+    parser.add_argument("--chunk-tiles", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        model_path = args.model or build_detection_model(os.path.join(tmpdir, "synthetic.tflite"))
+        paths = write_images(tmpdir, args.images)
+        class_name = {i: f"class_{i}" for i in range(100)}
+
+        baseline = None
+        print(f"{'processes':>10} {'images/s':>10} {'speedup':>8}")
+        for num_processes in args.processes:
+            output = os.path.join(tmpdir, f"out_{num_processes}.jsonl")
+            pipeline = ProcessPipeline((model_path, args.batch_size, 1, args.num_threads, False), class_name, 0.5,
+                                       num_processes=num_processes, chunk_tiles=args.chunk_tiles)
+            summary = pipeline.run(paths, output, log_every=0)
+            images_per_sec = summary["images_per_sec"]
+            baseline = baseline or images_per_sec
+            print(f"{num_processes:>10} {images_per_sec:>10.2f} {images_per_sec / baseline:>7.2f}x")
+
+            with open(output, 'r') as file:
+                failed = [record for record in map(json.loads, file) if "error" in record]
+            if failed:
+                print(f"{len(failed)} images failed, e.g. {failed[0]['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Startup-time benchmark: from launching the process to the first paint of
+MainWindow when started through main.main().
+
+Every run is a fresh Python process with an empty working directory, using
+the offscreen Qt platform, so no display is needed. The child also reports
+whether TensorFlow had been imported by the time of the first paint.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The child's result file, relative to its working directory. Not stdout,
+# which the background backend preload may write to at the same moment
+RESULT_FILE = "first_paint.json"
+
+CHILD = """
+import json, sys, time
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+import main
+from app.window import MainWindow
+
+paint_event = MainWindow.paintEvent
+
+def first_paint(self, event):
+    paint_event(self, event)
+    if not getattr(self, "_painted", False):
+        self._painted = True
+        with open(%r, 'w') as file:
+            json.dump({"painted": time.time(), "tensorflow": "tensorflow" in sys.modules}, file)
+        QTimer.singleShot(0, QApplication.instance().quit)
+
+MainWindow.paintEvent = first_paint
+main.main()
+""" % RESULT_FILE
+
+
+def measure_once(workdir):
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"),
+               PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    # Hide the start-up dialog, which would otherwise be painted too
+    with open(os.path.join(workdir, "settings.json"), 'w') as file:
+        json.dump({"show_dialog_on_start": False}, file)
+
+    result_path = os.path.join(workdir, RESULT_FILE)
+    if os.path.exists(result_path):
+        os.remove(result_path)
+
+    start = time.time()
+    process = subprocess.run([sys.executable, "-c", CHILD], cwd=workdir, env=env,
+                             capture_output=True, text=True, timeout=120)
+    if not os.path.exists(result_path):
+        raise RuntimeError(f"The window was never painted:\n{process.stdout}{process.stderr}")
+    with open(result_path, 'r') as file:
+        result = json.load(file)
+    return result["painted"] - start, result["tensorflow"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    times = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(args.runs):
+            seconds, tensorflow_loaded = measure_once(workdir)
+            times.append(seconds)
+            print(f"first paint after {seconds * 1000:.0f} ms (tensorflow imported: {tensorflow_loaded})")
+
+    print(f"median {statistics.median(times) * 1000:.0f} ms, best {min(times) * 1000:.0f} ms over {len(times)} runs")
+
+
+if __name__ == "__main__":
+    main()
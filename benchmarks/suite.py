@@ -0,0 +1,175 @@
+"""
+Reproducible benchmark suite for the detection engine.
+
+Builds a synthetic TFLite model and synthetic large images in a temporary
+directory, then measures end-to-end do_sliding_window_inference latency,
+tiles per second, NMS time, peak RSS and the memory allocated while
+preprocessing a batch of tiles for each image size. Runs offline on a
+CPU-only machine.
+
+Usage:
+    python -m benchmarks.suite --output benchmarks/baseline.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json
+
+With --compare the exit status is 1 when any metric is worse than the
+baseline by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+
+from model.model_tflite import TFLiteModel
+from model.profiler import Profiler, profiling
+from .synthetic import build_detection_model, make_shelf_image
+
+# metric -> True when higher is better
+METRICS = {
+    "latency_ms": False,
+    "tiles_per_sec": True,
+    "nms_ms": False,
+    "peak_rss_mb": False,
+    "preprocess_alloc_kb": False,
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_scenario(model, image_path, repeat, cutoff, options):
+    latencies, tile_rates, nms_times = [], [], []
+    for _ in range(repeat):
+        prof = Profiler()
+        start = time.perf_counter()
+        with profiling(prof):
+            model.do_sliding_window_inference(image_path, cutoff, {}, **options)
+        latencies.append(time.perf_counter() - start)
+
+        report = prof.report()
+        tiles = report["counters"].get("tiles", 0)
+        tile_time = sum(report["stages"].get(name, {"ms": 0})["ms"]
+                        for name in ("preprocess", "invoke", "postprocess")) / 1000
+        tile_rates.append(tiles / tile_time if tile_time else 0.0)
+        nms_times.append(report["stages"].get("nms", {"ms": 0})["ms"])
+
+    # A separate traced run, so tracemalloc doesn't skew the timings
+    prof = Profiler(trace_memory=True)
+    tracemalloc.start()
+    try:
+        with profiling(prof):
+            model.do_sliding_window_inference(image_path, cutoff, {}, **options)
+    finally:
+        tracemalloc.stop()
+    preprocess = prof.report()["stages"].get("preprocess", {})
+
+    return {
+        "latency_ms": round(statistics.median(latencies) * 1000, 2),
+        "tiles_per_sec": round(statistics.median(tile_rates), 1),
+        "nms_ms": round(statistics.median(nms_times), 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "preprocess_alloc_kb": preprocess.get("alloc_kb", 0.0),
+    }
+
+
+def run_suite(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        model_path = build_detection_model(os.path.join(tmpdir, "synthetic.tflite"),
+                                           input_size=args.input_size, quantize=args.quantize)
+        model = TFLiteModel(model_path, args.batch_size, args.num_workers, args.num_threads or None)
+        try:
+            model.warm_up()
+            # Smallest first, so the process peak RSS reflects the current size
+            for size in sorted(args.sizes, key=lambda s: s[0] * s[1]):
+                width, height = size
+                image_path = os.path.join(tmpdir, f"shelf_{width}x{height}.jpg")
+                cv2.imwrite(image_path, make_shelf_image(width, height))
+                name = f"{width}x{height}"
+                results[name] = run_scenario(model, image_path, args.repeat, args.cutoff,
+                                             {"adaptive_tiling": args.adaptive_tiling,
+                                              "tiling_mode": args.tiling_mode})
+                print(f"{name:>12}: " + ", ".join(f"{k}={v}" for k, v in results[name].items()))
+        finally:
+            model.close()
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Returns a list of human-readable regressions against the baseline."""
+    regressions = []
+    for name, metrics in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = reference.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=parse_size, nargs="+", default=[(2000, 1500), (4000, 3000)],
+                        help="Synthetic image sizes as WIDTHxHEIGHT")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cutoff", type=float, default=0.5)
+    parser.add_argument("--input-size", type=int, default=320)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--num-workers", type=int, default=1)
+    parser.add_argument("--num-threads", type=int, default=1)
+    parser.add_argument("--adaptive-tiling", action="store_true")
+    parser.add_argument("--tiling-mode", choices=["window", "pyramid"], default="window")
+    parser.add_argument("--quantize", action="store_true", help="Benchmark a full-integer uint8 model")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Relative change treated as a regression")
+    args = parser.parse_args(argv)
+
+    current = run_suite(args)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(current, file, indent=4)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare(current, baseline, args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against", args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Synthetic inputs for the benchmarks: a tiny TFLite detection model and large
+shelf-like images, both generated locally so nothing has to be downloaded.
+"""
+import cv2
+import numpy as np
+
+
+def build_detection_model(path, input_size=320, num_boxes=10, num_classes=10, box_size=0.05, seed=0,
+                          quantize=False):
+    """
+    Builds a small TFLite model with the outputs TFLiteModel expects.
+
+    The model has a float32 [batch, input_size, input_size, 3] input and four
+    outputs in the order of the SSD post-processing op: scores [batch, n],
+    boxes [batch, n, 4] as (ymin, xmin, ymax, xmax) fractions, count [batch]
+    and classes [batch, n]. Two convolutions give the interpreter real work;
+    the boxes are fixed so that every tile produces small detections.
+
+    Args:
+        path (str): Where to write the .tflite file.
+        input_size (int, optional): The square input side. Defaults to 320.
+        num_boxes (int, optional): Detections per tile. Defaults to 10.
+        num_classes (int, optional): Number of classes. Defaults to 10.
+        box_size (float, optional): Box side as a fraction of the tile; smaller
+            boxes make the sliding window use more tiles. Defaults to 0.05.
+        seed (int, optional): Seed for the weights and box positions.
+        quantize (bool, optional): Build a full-integer model with a uint8 input
+            and uint8 outputs. Defaults to False.
+
+    Returns:
+        str: The path of the written model.
+    """
+    import tensorflow as tf
+
+    rng = np.random.default_rng(seed)
+    kernel1 = tf.constant(rng.normal(0, 0.1, (3, 3, 3, 16)).astype(np.float32))
+    kernel2 = tf.constant(rng.normal(0, 0.1, (3, 3, 16, 32)).astype(np.float32))
+    weights = tf.constant(rng.normal(0, 0.1, (32, num_boxes)).astype(np.float32))
+    centers = rng.uniform(box_size, 1 - box_size, (num_boxes, 2))
+    boxes = tf.constant(np.hstack([centers - box_size / 2, centers + box_size / 2]).astype(np.float32))
+    classes = tf.constant((np.arange(num_boxes) % num_classes).astype(np.float32))
+
+    module = tf.Module()
+
+    @tf.function(input_signature=[tf.TensorSpec([None, input_size, input_size, 3], tf.float32)])
+    def detect(images):
+        x = tf.nn.relu(tf.nn.conv2d(images, kernel1, 2, "SAME"))
+        x = tf.nn.relu(tf.nn.conv2d(x, kernel2, 2, "SAME"))
+        x = tf.reduce_mean(x, axis=[1, 2])
+        # The bias keeps scores above a typical threshold
+        scores = tf.sigmoid(tf.matmul(x, weights) + 2.0)
+        batch = tf.shape(images)[0]
+        return (scores,
+                tf.tile(boxes[None], [batch, 1, 1]),
+                tf.fill([batch], float(num_boxes)),
+                tf.tile(classes[None], [batch, 1]))
+
+    module.detect = detect
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([detect.get_concrete_function()], module)
+    if quantize:
+        def representative_dataset():
+            for i in range(16):
+                tile = make_shelf_image(input_size, input_size, seed=i)
+                yield [np.float32(tile[None] / 255)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.uint8
+        converter.inference_output_type = tf.uint8
+    with open(path, 'wb') as file:
+        file.write(converter.convert())
+    return path
+
+
+def make_shelf_image(width, height, seed=0):
+    """Generates a BGR image with rows of coloured packs on a noisy wall."""
+    rng = np.random.default_rng(seed)
+    image = rng.integers(90, 140, size=(height, width, 3), dtype=np.uint8)
+    pack_w, pack_h = max(width // 60, 8), max(height // 25, 12)
+    for y in range(pack_h, height - 2 * pack_h, 3 * pack_h):
+        for x in range(pack_w, width - 2 * pack_w, pack_w + pack_w // 4):
+            colour = tuple(int(c) for c in rng.integers(0, 255, size=3))
+            cv2.rectangle(image, (x, y), (x + pack_w, y + pack_h), colour, cv2.FILLED)
+    return image
+
@@ -1,8 +1,10 @@
 import sys
 
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
 
 from app.window import MainWindow
+from model import backend
 
 
 def __center_window(app, window):
@@ -19,6 +21,8 @@ def main():
     __center_window(app, window)
 
     window.show()
+    # Import the interpreter backend only once the window is on screen
+    QTimer.singleShot(0, backend.preload_in_background)
     app.exec_()
 
 if __name__ == "__main__":
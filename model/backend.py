@@ -0,0 +1,80 @@
+"""
+Pluggable TFLite interpreter backends.
+
+Nothing is imported until the first interpreter is created, so importing the
+application doesn't pay for TensorFlow. The small tflite_runtime package is
+preferred and the full tensorflow package is the fallback.
+"""
+import threading
+
+
+def _tflite_runtime():
+    from tflite_runtime.interpreter import Interpreter
+    return Interpreter
+
+
+def _tensorflow():
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+# Tried in this order by the "auto" backend
+BACKENDS = {
+    "tflite_runtime": _tflite_runtime,
+    "tensorflow": _tensorflow,
+}
+
+_lock = threading.Lock()
+_backend = "auto"
+_interpreter_class = None
+
+
+def set_backend(name):
+    """
+    Selects the backend used by new interpreters.
+
+    Args:
+        name (str): "auto" or one of the BACKENDS keys.
+    """
+    global _backend, _interpreter_class
+    if name != "auto" and name not in BACKENDS:
+        raise ValueError(f"Unknown interpreter backend: {name}")
+    with _lock:
+        if name != _backend:
+            _backend = name
+            _interpreter_class = None
+
+
+def load_interpreter_class():
+    """Imports the selected backend on first use and returns its Interpreter class."""
+    global _interpreter_class
+    with _lock:
+        if _interpreter_class is None:
+            names = list(BACKENDS) if _backend == "auto" else [_backend]
+            for name in names:
+                try:
+                    _interpreter_class = BACKENDS[name]()
+                    break
+                except ImportError:
+                    continue
+            else:
+                raise ImportError(f"No TFLite interpreter backend available, tried: {', '.join(names)}")
+        return _interpreter_class
+
+
+def create_interpreter(model_path, num_threads=None):
+    return load_interpreter_class()(model_path=model_path, num_threads=num_threads)
+
+
+def preload_in_background():
+    """Imports the backend in a daemon thread, e.g. once the main window is shown."""
+    def preload():
+        try:
+            load_interpreter_class()
+        except ImportError as e:
+            # Reported again when a model is actually loaded
+            print("Error while loading interpreter backend: ", e)
+
+    thread = threading.Thread(target=preload, daemon=True)
+    thread.start()
+    return thread
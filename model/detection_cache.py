@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from .detections import Detections, candidate_floor
+from .image_source import image_size
+from . import profiler
+
+# Bump when the engine changes in a way that invalidates stored candidates
+CACHE_VERSION = 1
+
+# detect_candidates() options that are off when empty, zero or None
+OPTIONAL_PARAMS = ("rois", "band_nms_iou", "memory_budget_mb", "rgb_input")
+
+
+@lru_cache(maxsize=1024)
+def _hash_file(path, mtime_ns, size):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_hash(path):
+    """Returns the SHA-1 of a file's content, memoized by path, mtime and size."""
+    if not path:
+        return ""
+    stat = os.stat(path)
+    return _hash_file(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+class DetectionCache:
+    """
+    An on-disk SQLite cache of raw detection candidates.
+
+    Entries are keyed by the image content, the model and class-names files and
+    the tiling parameters, and hold the candidates before thresholding and NMS.
+    In the sliding-window mode the cutoff sizes the windows and decides whether
+    any are run at all, so it's part of the key; a pyramid entry can serve any
+    cutoff at or above the score floor it was computed with.
+
+    Attributes:
+        filename (str): The path to the SQLite database.
+        max_bytes (int): The total size of stored candidates to keep.
+        max_age (float): The age in seconds after which unused entries are dropped.
+    """
+
+    def __init__(self, filename="detection_cache.sqlite", max_bytes=256 * 1024 * 1024,
+                 max_age_days=30) -> None:
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 3600
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(filename, check_same_thread=False)
+        self.__db.execute("""
+            CREATE TABLE IF NOT EXISTS candidates (
+                key TEXT PRIMARY KEY,
+                floor REAL NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                boxes BLOB NOT NULL,
+                scores BLOB NOT NULL,
+                class_ids BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self.__db.commit()
+
+    def key(self, image_path, model_path, class_names_path="", **params):
+        """
+        Builds the cache key for an image and a set of tiling parameters.
+
+        Args:
+            image_path (str): The image file; its content is hashed.
+            model_path (str): The .tflite model file.
+            class_names_path (str, optional): The class names JSON file.
+            **params: Tiling parameters that change the candidates.
+
+        Returns:
+            str: A hex digest.
+        """
+        parts = {
+            "version": CACHE_VERSION,
+            "image": file_hash(image_path),
+            "model": file_hash(model_path),
+            "class_names": file_hash(class_names_path),
+            "params": params
+        }
+        return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key, cutoff):
+        """
+        Returns (candidates, (width, height)) or None on a miss.
+
+        Entries computed with a score floor above the cutoff are a miss, since
+        they lack the candidates between the two.
+        """
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT floor, width, height, boxes, scores, class_ids FROM candidates WHERE key = ?",
+                (key,)).fetchone()
+            if row is None or row[0] > cutoff:
+                return None
+            self.__db.execute("UPDATE candidates SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.__db.commit()
+
+        floor, width, height, boxes, scores, class_ids = row
+        candidates = Detections(np.frombuffer(boxes, dtype=np.float32),
+                                np.frombuffer(scores, dtype=np.float32),
+                                np.frombuffer(class_ids, dtype=np.int16))
+        return candidates, (width, height)
+
+    def lookup(self, image_path, model_path, cutoff, class_names_path="", **tiling):
+        """
+        Looks up the candidates for an image and detect_candidates() options.
+
+        The model's own options that change its output, such as rgb_input,
+        are passed along with the tiling options.
+
+        Returns:
+            Tuple[str, Optional[tuple]]: The key to store a result under and the
+                result of get(), or None on a miss.
+        """
+        # The score floor is stored with the entry, so it's not part of the key.
+        # Options that are off don't change the key, so older entries still match
+        params = {k: v for k, v in tiling.items()
+                  if k != "candidate_cutoff" and not (k in OPTIONAL_PARAMS and not v)}
+        if tiling.get("tiling_mode", "window") == "window":
+            # The coarse pass at the cutoff plans the windows
+            params["window_cutoff"] = cutoff
+        key = self.key(image_path, model_path, class_names_path, **params)
+        return key, self.get(key, cutoff)
+
+    def put(self, key, candidates, floor, width, height):
+        """Stores candidates computed with the given score floor."""
+        blobs = (candidates.boxes.tobytes(), candidates.scores.tobytes(), candidates.class_ids.tobytes())
+        with self.__lock:
+            self.__db.execute(
+                "INSERT OR REPLACE INTO candidates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, floor, width, height) + blobs + (sum(map(len, blobs)), time.time()))
+            self.__evict()
+            self.__db.commit()
+
+    def clear(self):
+        with self.__lock:
+            self.__db.execute("DELETE FROM candidates")
+            self.__db.commit()
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
+
+    def __evict(self):
+        self.__db.execute("DELETE FROM candidates WHERE accessed < ?", (time.time() - self.max_age,))
+        total = self.__db.execute("SELECT COALESCE(SUM(size), 0) FROM candidates").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Drop the least recently used entries until the cache fits
+        rows = self.__db.execute("SELECT key, size FROM candidates ORDER BY accessed, rowid").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.__db.executemany("DELETE FROM candidates WHERE key = ?", stale)
+
+
+def detect_candidates_cached(cache, model, image_path, cutoff, class_names_path="", image=None, **tiling):
+    """
+    Returns the raw candidates for an image, from the cache when possible.
+
+    The image is only decoded on a cache miss, unless it's passed in. An
+    ImageSource is passed on to the model, which decodes what it needs.
+
+    Args:
+        cache (DetectionCache): The cache, or None to always run the model.
+        model (TFLiteModel): The model to run on a miss.
+        image_path (str): The image file.
+        cutoff (float): The detection cutoff.
+        class_names_path (str, optional): The class names JSON file.
+        image (Union[np.ndarray, ImageSource], optional): The already decoded
+            BGR image or a shared source of it.
+        **tiling: Options for TFLiteModel.detect_candidates().
+
+    Returns:
+        Tuple[Detections, Union[np.ndarray, ImageSource], Tuple[int, int]]: The
+            candidates, the given or decoded image (None on a hit without a
+            given image) and (width, height).
+    """
+    key = None
+    if cache is not None:
+        with profiler.current().stage("cache lookup"):
+            key, hit = cache.lookup(image_path, model.model_path, cutoff, class_names_path,
+                                   rgb_input=model.rgb_input, **tiling)
+        if hit is not None:
+            profiler.current().count("cache hits")
+            return hit[0], image, hit[1]
+
+    if image is None:
+        with profiler.current().stage("decode"):
+            image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"Could not read image: {image_path}")
+
+    candidates = model.detect_candidates(image, cutoff, **tiling)
+    width, height = image_size(image)
+    if cache is not None:
+        cache.put(key, candidates, candidate_floor(cutoff, tiling.get("candidate_cutoff")), width, height)
+    return candidates, image, (width, height)
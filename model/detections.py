@@ -0,0 +1,206 @@
+from collections import Counter
+
+import numpy as np
+
+from .nms import nms, soft_nms, grid_nms, weighted_box_fusion, suppression_edges
+
+# Above this many boxes hard NMS only compares grid neighbours
+GRID_NMS_MIN_BOXES = 2000
+
+
+def candidate_floor(cutoff, candidate_cutoff=None):
+    """The lowest score kept among raw candidates for these cutoffs."""
+    return cutoff if candidate_cutoff is None else min(cutoff, candidate_cutoff)
+
+
+class Detections:
+    """
+    A columnar container of detected objects.
+
+    Attributes:
+        boxes (np.ndarray): An (n, 4) float32 array of (xmin, ymin, xmax, ymax)
+            boxes in image pixel coordinates.
+        scores (np.ndarray): An (n,) float32 array of confidence scores.
+        class_ids (np.ndarray): An (n,) int16 array of model class ids. Names are
+            only looked up when detections are displayed or exported.
+    """
+
+    __slots__ = ("boxes", "scores", "class_ids")
+
+    def __init__(self, boxes=None, scores=None, class_ids=None) -> None:
+        self.boxes = np.asarray(boxes if boxes is not None else np.empty((0, 4)),
+                                dtype=np.float32).reshape(-1, 4)
+        self.scores = np.asarray(scores if scores is not None else (), dtype=np.float32)
+        self.class_ids = np.asarray(class_ids if class_ids is not None else (), dtype=np.int16)
+
+    @classmethod
+    def concatenate(cls, items):
+        """Joins several Detections into one."""
+        items = [item for item in items if len(item)]
+        if not items:
+            return cls()
+        if len(items) == 1:
+            return items[0]
+        return cls(np.concatenate([item.boxes for item in items]),
+                   np.concatenate([item.scores for item in items]),
+                   np.concatenate([item.class_ids for item in items]))
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __getitem__(self, index):
+        """Selects detections by a boolean mask, an index array or a slice."""
+        return Detections(self.boxes[index], self.scores[index], self.class_ids[index])
+
+    def __repr__(self) -> str:
+        return f"Detections(n={len(self)})"
+
+    def filter(self, cutoff):
+        """Returns the detections whose score is above the cutoff."""
+        return self[self.scores > cutoff]
+
+    def offset(self, dx, dy):
+        """Returns the detections shifted by (dx, dy), e.g. by a tile origin."""
+        return Detections(self.boxes + np.array([dx, dy, dx, dy], dtype=np.float32),
+                          self.scores, self.class_ids)
+
+    def scale(self, sx, sy):
+        """Returns the detections with boxes scaled by (sx, sy), e.g. from a downscaled image."""
+        return Detections(self.boxes * np.array([sx, sy, sx, sy], dtype=np.float32),
+                          self.scores, self.class_ids)
+
+    def inside(self, regions):
+        """Returns the detections whose box center lies in any (x0, y0, x1, y1) region."""
+        regions = np.asarray(regions, dtype=np.float32).reshape(-1, 4)
+        centers = (self.boxes[:, :2] + self.boxes[:, 2:]) / 2
+        mask = ((centers[:, None, 0] >= regions[None, :, 0]) & (centers[:, None, 0] < regions[None, :, 2]) &
+                (centers[:, None, 1] >= regions[None, :, 1]) & (centers[:, None, 1] < regions[None, :, 3]))
+        return self[mask.any(axis=1)]
+
+    def nms(self, iou_threshold=0.5, class_aware=True, soft=False, score_threshold=0.001):
+        """
+        Applies non-maximum suppression.
+
+        Args:
+            iou_threshold (float, optional): The IoU threshold. Defaults to 0.5.
+            class_aware (bool, optional): Suppress only within the same class.
+                Defaults to True.
+            soft (bool, optional): Use Gaussian soft-NMS; kept detections get
+                their decayed scores. Defaults to False.
+            score_threshold (float, optional): With soft-NMS, detections whose
+                decayed score falls below this are dropped. Defaults to 0.001.
+
+        Returns:
+            Detections: The kept detections, ordered by decreasing score.
+        """
+        class_ids = self.class_ids if class_aware else None
+        if soft:
+            keep, scores = soft_nms(self.boxes, self.scores, iou_threshold, class_ids,
+                                    score_threshold=score_threshold)
+            return Detections(self.boxes[keep], scores, self.class_ids[keep])
+        if len(self) > GRID_NMS_MIN_BOXES:
+            return self[grid_nms(self.boxes, self.scores, iou_threshold, class_ids)]
+        return self[nms(self.boxes, self.scores, iou_threshold, class_ids)]
+
+    def fuse(self, iou_threshold=0.55, class_aware=True, fragment_threshold=0.8):
+        """
+        Merges overlapping detections with weighted box fusion.
+
+        Unlike nms(), which keeps the best box of a cluster, the boxes of a
+        cluster are averaged, and fragments of objects cut by tile borders
+        are joined to the whole object. See nms.weighted_box_fusion().
+
+        Returns:
+            Detections: One detection per cluster, ordered by decreasing score
+                of the cluster's best box.
+        """
+        class_ids = self.class_ids if class_aware else None
+        boxes, scores, heads = weighted_box_fusion(self.boxes, self.scores, iou_threshold, class_ids,
+                                                   fragment_threshold)
+        return Detections(boxes, scores, self.class_ids[heads])
+
+    def names(self, class_name):
+        """Resolves class ids to names using a {class_id: name} dictionary."""
+        return [class_name.get(int(object_id), "Unknown") for object_id in self.class_ids]
+
+    def class_counts(self, class_name):
+        """Counts detections per class name."""
+        return Counter(self.names(class_name))
+
+    def to_list(self, class_name):
+        """Converts to [score, name, xmin, ymin, xmax, ymax] lists with integer boxes."""
+        boxes = self.boxes.astype(int).tolist()
+        return [[score, name] + box
+                for score, name, box in zip(self.scores.tolist(), self.names(class_name), boxes)]
+
+
+class BandNMS:
+    """
+    Greedy NMS over detections that arrive in bands from the top of the image down.
+
+    Tiles are run row by row, so once every tile starting above a line y is
+    done, no later box can reach above it. A box ending above that line
+    whose higher-scoring rivals are all settled is settled itself: it is
+    either kept, and moved to the result, or suppressed, and dropped. Only
+    the unsettled boxes near the moving line are held, and the result is the
+    same as NMS over all detections at once.
+
+    Args:
+        iou_threshold (float, optional): The IoU threshold. Defaults to 0.5.
+        class_aware (bool, optional): Suppress only within the same class.
+            Defaults to True.
+    """
+
+    def __init__(self, iou_threshold=0.5, class_aware=True) -> None:
+        self.iou_threshold = iou_threshold
+        self.class_aware = class_aware
+        self.__open = Detections()
+        self.__kept = []
+
+    @property
+    def pending(self):
+        """The number of detections not settled yet."""
+        return len(self.__open)
+
+    def add(self, detections, boundary=np.inf):
+        """
+        Adds the detections of finished tiles.
+
+        Args:
+            detections (Detections): New detections, in tile order.
+            boundary (float, optional): The top of the highest tile still to
+                come. Defaults to infinity, meaning no more tiles.
+        """
+        # Ties in score keep their arrival order, as in one NMS over everything
+        work = Detections.concatenate([self.__open, detections])
+        n = len(work)
+        if n == 0:
+            return
+
+        order, source, target = suppression_edges(work.boxes, work.scores, self.iou_threshold,
+                                                  work.class_ids if self.class_aware else None)
+        by_target = np.argsort(target, kind="stable")
+        rivals = source[by_target]
+        starts = np.searchsorted(target[by_target], np.arange(n + 1))
+        # Inclusive coordinates: a box ending at y - 1 can't meet a box starting at y
+        closed = work.boxes[:, 3] + 1 <= boundary
+
+        kept = np.zeros(n, dtype=bool)
+        settled = np.zeros(n, dtype=bool)
+        for i in order:
+            higher = rivals[starts[i]:starts[i + 1]]
+            suppressors = higher[kept[higher]]
+            if len(suppressors):
+                # Suppressed for good once one suppressor is kept for good
+                settled[i] = settled[suppressors].any()
+            else:
+                kept[i] = True
+                settled[i] = closed[i] and settled[higher].all()
+
+        self.__kept.append(work[kept & settled])
+        self.__open = work[~settled]
+
+    def finish(self):
+        """Settles the remaining detections and returns every kept one."""
+        self.add(Detections())
+        return Detections.concatenate(self.__kept)
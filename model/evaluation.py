@@ -0,0 +1,114 @@
+import json
+
+import numpy as np
+
+from .detections import Detections
+from .nms import box_iou
+
+
+def load_labels(path):
+    """
+    Reads labelled images from a JSONL file in the batch output format.
+
+    Every line is {"image": path, "detections": [{"class_id": id, "box":
+    [xmin, ymin, xmax, ymax]}, ...]}, so a batch run corrected by hand is a
+    label file. Scores, if present, are ignored.
+
+    Returns:
+        List[Tuple[str, Detections]]: The image paths and their true boxes.
+    """
+    labels = []
+    with open(path, 'r') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            objects = record.get("detections", [])
+            truth = Detections([obj["box"] for obj in objects], [1.0] * len(objects),
+                               [obj["class_id"] for obj in objects])
+            labels.append((record["image"], truth))
+    return labels
+
+
+def match_detections(detections, truth, iou_threshold=0.5):
+    """
+    Marks the detections that find a true box.
+
+    Detections are taken by descending score; each claims the unclaimed true
+    box of its class it overlaps most, if the IoU reaches the threshold.
+
+    Returns:
+        np.ndarray: A bool array, True for the true positives, in detection order.
+    """
+    hits = np.zeros(len(detections), dtype=bool)
+    if not len(detections) or not len(truth):
+        return hits
+
+    overlap = box_iou(detections.boxes, truth.boxes)
+    overlap[detections.class_ids[:, None] != truth.class_ids[None, :]] = 0
+    claimed = np.zeros(len(truth), dtype=bool)
+    for i in np.argsort(-detections.scores, kind="stable"):
+        candidates = np.where(claimed, 0, overlap[i])
+        best = int(np.argmax(candidates))
+        if candidates[best] >= iou_threshold:
+            claimed[best] = True
+            hits[i] = True
+    return hits
+
+
+def average_precision(scores, hits, num_truth):
+    """
+    The area under the precision-recall curve, with all-point interpolation.
+
+    Args:
+        scores (np.ndarray): The scores of every detection of one class.
+        hits (np.ndarray): Whether each detection is a true positive.
+        num_truth (int): The number of true boxes of the class.
+
+    Returns:
+        float: The average precision, 0 when there are no true boxes.
+    """
+    if num_truth == 0:
+        return 0.0
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    hits = np.asarray(hits, dtype=bool)[order]
+    true_positives = np.cumsum(hits)
+    recall = np.concatenate([[0.0], true_positives / num_truth])
+    precision = true_positives / np.arange(1, len(hits) + 1)
+    # Make precision non-increasing from right to left
+    precision = np.concatenate([[1.0], np.maximum.accumulate(precision[::-1])[::-1]])
+    return float(np.sum(np.diff(recall) * precision[1:]))
+
+
+def evaluate(results, iou_threshold=0.5):
+    """
+    Scores detections against the true boxes of a labelled image set.
+
+    Args:
+        results (Iterable[Tuple[Detections, Detections]]): (detections, truth)
+            pairs, one per image.
+        iou_threshold (float, optional): The IoU a detection needs to match.
+            Defaults to 0.5.
+
+    Returns:
+        Dict[str, float]: recall, precision and map, the mean average precision
+            over the classes with true boxes.
+    """
+    scores, hits, classes, truth_classes = [], [], [], []
+    for detections, truth in results:
+        scores.append(detections.scores)
+        hits.append(match_detections(detections, truth, iou_threshold))
+        classes.append(detections.class_ids)
+        truth_classes.append(truth.class_ids)
+    scores, hits = np.concatenate(scores or [[]]), np.concatenate(hits or [[]]).astype(bool)
+    classes, truth_classes = np.concatenate(classes or [[]]), np.concatenate(truth_classes or [[]])
+
+    aps = [average_precision(scores[classes == class_id], hits[classes == class_id],
+                             int(np.sum(truth_classes == class_id)))
+           for class_id in np.unique(truth_classes)]
+    found = int(hits.sum())
+    return {
+        "recall": found / len(truth_classes) if len(truth_classes) else 0.0,
+        "precision": found / len(hits) if len(hits) else 0.0,
+        "map": float(np.mean(aps)) if aps else 0.0,
+    }
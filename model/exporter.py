@@ -0,0 +1,276 @@
+import csv
+import importlib.util
+import json
+import os
+import threading
+import time
+from queue import Queue, Empty
+
+from .detection_cache import file_hash
+
+# Format -> file extension, next to the main output path
+EXPORT_FORMATS = {
+    "jsonl": ".jsonl",
+    "csv": ".csv",
+    "coco": ".coco.json",
+    "parquet": ".parquet",
+}
+
+# One row per detection; an image without detections is one row with empty box fields
+CSV_COLUMNS = ("image", "width", "height", "seconds", "model_hash",
+               "class_id", "name", "score", "xmin", "ymin", "xmax", "ymax")
+
+# Marks the end of the record stream
+_DONE = object()
+
+
+def parquet_available():
+    """True if pyarrow is installed, so Parquet can be exported."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def detection_record(path, size, detections, class_name, seconds):
+    """Builds the JSON-serializable result for one image of the given (width, height)."""
+    names = detections.names(class_name)
+    return {
+        "image": path,
+        "width": int(size[0]),
+        "height": int(size[1]),
+        "seconds": round(seconds, 4),
+        "counts": dict(detections.class_counts(class_name)),
+        "detections": [
+            {"class_id": int(class_id), "name": name, "score": round(float(score), 4),
+             "box": [round(float(v), 1) for v in box]}
+            for box, score, class_id, name
+            in zip(detections.boxes, detections.scores, detections.class_ids, names)
+        ]
+    }
+
+
+def record_rows(record):
+    """Flattens a record into CSV_COLUMNS rows, one per detection."""
+    head = [record["image"], record["width"], record["height"], record["seconds"], record.get("model_hash", "")]
+    if not record["detections"]:
+        return [head + [None] * 7]
+    return [head + [obj["class_id"], obj["name"], obj["score"], *obj["box"]] for obj in record["detections"]]
+
+
+def atomic_write(path, write, mode='w'):
+    """
+    Replaces a file with what write(file) writes, all at once.
+
+    The content goes to a temporary file that is renamed over the target, so
+    readers see either the old or the new file, never a partial one.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, mode) as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+class ResultExporter:
+    """
+    Writes detection records in several formats from a background thread.
+
+    submit() only queues a record. The writer thread collects records and
+    writes them in batches: when flush_records have arrived, or flush_seconds
+    after the first unwritten one. JSONL and CSV are appended, one write per
+    batch. COCO JSON and Parquet are single documents, so they're kept in
+    memory and atomically replaced at most every document_seconds, and on
+    flush() and close(). Existing files are continued, not overwritten.
+
+    Failed images (records with an "error") only go to the JSONL file.
+
+    Args:
+        output_path (str): The JSONL file; the other formats are written next
+            to it with their own extensions.
+        formats (Sequence[str], optional): EXPORT_FORMATS keys. Defaults to jsonl.
+        class_name (Dict[int, str], optional): Class names, the COCO categories.
+        model_path (str, optional): The model, whose hash is added to every record.
+        flush_records (int, optional): Records per batch. Defaults to 256.
+        flush_seconds (float, optional): The longest a record waits to be
+            written. Defaults to 1.0.
+        document_seconds (float, optional): The least time between rewrites of
+            the COCO and Parquet files. Defaults to 30.0.
+    """
+
+    def __init__(self, output_path, formats=("jsonl",), class_name=None, model_path="",
+                 flush_records=256, flush_seconds=1.0, document_seconds=30.0) -> None:
+        unknown = set(formats) - set(EXPORT_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown export formats: {', '.join(sorted(unknown))}")
+        if "parquet" in formats and not parquet_available():
+            raise ValueError("Parquet export requires pyarrow to be installed")
+
+        root = output_path[:-len(".jsonl")] if output_path.endswith(".jsonl") else output_path
+        self.paths = {name: (output_path if name == "jsonl" else root + EXPORT_FORMATS[name])
+                      for name in formats}
+        directory = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.class_name = class_name or {}
+        self.model_hash = file_hash(model_path) if model_path else ""
+        self.flush_records = max(1, flush_records)
+        self.flush_seconds = flush_seconds
+        self.document_seconds = document_seconds
+        self.written = 0
+        self.error = None
+
+        self.__coco = self.__load_coco() if "coco" in self.paths else None
+        self.__rows = self.__load_rows() if "parquet" in self.paths else None
+        self.__dirty = False
+        self.__queue = Queue()
+        self.__thread = threading.Thread(target=self.__write_loop, daemon=True)
+        self.__thread.start()
+
+    def submit(self, record):
+        """Queues a record from detection_record() for writing."""
+        self.__queue.put(record)
+
+    def flush(self):
+        """Writes everything submitted so far, documents included, and waits for it."""
+        done = threading.Event()
+        self.__queue.put(done)
+        done.wait()
+        self.__check()
+
+    def close(self):
+        """Writes the remaining records and stops the writer thread."""
+        if self.__thread.is_alive():
+            self.__queue.put(_DONE)
+            self.__thread.join()
+        self.__check()
+
+    def __check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def __write_loop(self):
+        batch = []
+        deadline = None
+        documents_due = time.perf_counter() + self.document_seconds
+        while True:
+            # Wake up for the batch deadline, and for the documents once they're out of date
+            wake = [t for t in (deadline, documents_due if self.__dirty else None) if t is not None]
+            timeout = max(0.0, min(wake) - time.perf_counter()) if wake else None
+            try:
+                item = self.__queue.get(timeout=timeout)
+            except Empty:
+                item = None
+
+            if isinstance(item, dict):
+                batch.append(item)
+                deadline = deadline or time.perf_counter() + self.flush_seconds
+                if len(batch) < self.flush_records:
+                    continue
+
+            self.__guarded(self.__write_batch, batch)
+            batch, deadline = [], None
+            if item is _DONE or isinstance(item, threading.Event) or time.perf_counter() >= documents_due:
+                self.__guarded(self.__write_documents)
+                documents_due = time.perf_counter() + self.document_seconds
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _DONE:
+                return
+
+    def __guarded(self, write, *args):
+        # A write error is raised to the caller in flush()/close(); the thread keeps running
+        try:
+            write(*args)
+        except Exception as e:
+            self.error = e
+
+    def __write_batch(self, batch):
+        if not batch:
+            return
+        for record in batch:
+            if self.model_hash:
+                record.setdefault("model_hash", self.model_hash)
+
+        if "jsonl" in self.paths:
+            with open(self.paths["jsonl"], 'a') as file:
+                file.write("".join(json.dumps(record) + "\n" for record in batch))
+
+        found = [record for record in batch if "error" not in record]
+        rows = [row for record in found for row in record_rows(record)]
+        if "csv" in self.paths and rows:
+            path = self.paths["csv"]
+            new = not os.path.exists(path) or os.path.getsize(path) == 0
+            with open(path, 'a', newline='') as file:
+                writer = csv.writer(file)
+                if new:
+                    writer.writerow(CSV_COLUMNS)
+                writer.writerows(rows)
+        if self.__rows is not None:
+            self.__rows += rows
+        if self.__coco is not None:
+            for record in found:
+                self.__add_coco(record)
+        self.__dirty = self.__dirty or bool(found)
+        self.written += len(batch)
+
+    def __load_coco(self):
+        coco = {"images": [], "annotations": [], "categories": []}
+        path = self.paths["coco"]
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                coco = json.load(file)
+        coco["categories"] = {c["id"]: c for c in coco["categories"]}
+        for class_id, name in self.class_name.items():
+            coco["categories"].setdefault(int(class_id), {"id": int(class_id), "name": name})
+        return coco
+
+    def __add_coco(self, record):
+        coco = self.__coco
+        image_id = len(coco["images"]) + 1
+        coco["images"].append({"id": image_id, "file_name": record["image"], "width": record["width"],
+                               "height": record["height"], "seconds": record["seconds"],
+                               "model_hash": record.get("model_hash", "")})
+        for obj in record["detections"]:
+            xmin, ymin, xmax, ymax = obj["box"]
+            coco["categories"].setdefault(obj["class_id"], {"id": obj["class_id"], "name": obj["name"]})
+            coco["annotations"].append({
+                "id": len(coco["annotations"]) + 1,
+                "image_id": image_id,
+                "category_id": obj["class_id"],
+                # COCO boxes are [x, y, width, height]
+                "bbox": [xmin, ymin, round(xmax - xmin, 1), round(ymax - ymin, 1)],
+                "area": round((xmax - xmin) * (ymax - ymin), 1),
+                "score": obj["score"],
+                "iscrowd": 0,
+            })
+
+    def __write_documents(self):
+        if not self.__dirty:
+            return
+        if self.__coco is not None:
+            document = dict(self.__coco, categories=sorted(self.__coco["categories"].values(),
+                                                           key=lambda c: c["id"]))
+            atomic_write(self.paths["coco"], lambda file: json.dump(document, file))
+        if self.__rows is not None:
+            self.__write_parquet()
+        self.__dirty = False
+
+    def __load_rows(self):
+        path = self.paths["parquet"]
+        if not os.path.exists(path):
+            return []
+        import pyarrow.parquet as pq
+        return [[row[name] for name in CSV_COLUMNS] for row in pq.read_table(path).to_pylist()]
+
+    def __write_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([("image", pa.string()), ("width", pa.int32()), ("height", pa.int32()),
+                            ("seconds", pa.float64()), ("model_hash", pa.string()),
+                            ("class_id", pa.int32()), ("name", pa.string()), ("score", pa.float64()),
+                            ("xmin", pa.float64()), ("ymin", pa.float64()),
+                            ("xmax", pa.float64()), ("ymax", pa.float64())])
+        columns = list(zip(*self.__rows))
+        table = pa.table({name: list(column) for name, column in zip(CSV_COLUMNS, columns)}, schema=schema)
+        atomic_write(self.paths["parquet"], lambda file: pq.write_table(table, file), mode='wb')
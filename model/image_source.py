@@ -0,0 +1,135 @@
+import threading
+
+import cv2
+import numpy as np
+
+from . import profiler
+
+# Reduction factors OpenCV can decode at, largest first
+REDUCED_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+
+class ImageSource:
+    """
+    An image file that is decoded lazily, at most once per resolution.
+
+    The full-resolution pixels are only read when first asked for, while
+    cheap reduced decodes (cv2.IMREAD_REDUCED_*, which JPEG decodes at a
+    fraction of the cost) serve previews and the coarse detection pass. The
+    same instance can be shared by the GUI and the engine, so the file is
+    never decoded twice at the same resolution.
+
+    Attributes:
+        path (str): The image file.
+    """
+
+    def __init__(self, path, image=None) -> None:
+        self.path = path
+        self.__full = image
+        # reduction factor -> decoded image
+        self.__reduced = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def decoded(self):
+        """True once the full-resolution image has been read."""
+        return self.__full is not None
+
+    @property
+    def size(self):
+        """
+        The (width, height) of the full image.
+
+        Until the full image is decoded, the size is estimated from a reduced
+        decode and may be off by less than the reduction factor.
+        """
+        with self.__lock:
+            if self.__full is not None:
+                return self.__full.shape[1], self.__full.shape[0]
+            factor = min(self.__reduced, default=None)
+        if factor is None:
+            return image_size(self.full())
+        height, width = self.__reduced[factor].shape[:2]
+        return width * factor, height * factor
+
+    def full(self):
+        """Returns the full-resolution BGR image, decoding it on first use."""
+        with self.__lock:
+            if self.__full is None:
+                with profiler.current().stage("decode"):
+                    self.__full = self.__read(cv2.IMREAD_COLOR)
+            return self.__full
+
+    def reduced(self, min_side):
+        """
+        Returns the most reduced decode whose shorter side is at least min_side.
+
+        The choice only depends on the file, not on what has been decoded
+        before, so repeated runs on the same image see the same pixels.
+
+        Args:
+            min_side (int): The smallest acceptable shorter side in pixels.
+
+        Returns:
+            Tuple[np.ndarray, int]: The BGR image and its reduction factor; a
+                factor of 1 is the full-resolution image.
+        """
+        # The 1/8 decode is cheap and tells the approximate full size
+        smallest = self.__decode_reduced(8)
+        full_side = min(smallest.shape[:2]) * 8
+        for factor in REDUCED_FLAGS:
+            if full_side // factor >= min_side:
+                return self.__decode_reduced(factor), factor
+        return self.full(), 1
+
+    def within(self, max_bytes):
+        """
+        Returns the least reduced decode that takes at most max_bytes.
+
+        Bounds the memory of the working image whatever the file size. An image
+        already decoded in full is returned as it is, since its memory is spent.
+
+        Args:
+            max_bytes (int): The most bytes of decoded pixels; zero means no limit.
+
+        Returns:
+            Tuple[np.ndarray, int]: The BGR image and its reduction factor; a
+                factor of 1 is the full-resolution image.
+        """
+        if not max_bytes or self.decoded:
+            return self.full(), 1
+        smallest = self.__decode_reduced(8)
+        full_bytes = smallest.nbytes * 64
+        if full_bytes <= max_bytes:
+            return self.full(), 1
+        for factor in sorted(REDUCED_FLAGS)[:-1]:
+            if full_bytes // (factor * factor) <= max_bytes:
+                return self.__decode_reduced(factor), factor
+        return smallest, 8
+
+    def __decode_reduced(self, factor):
+        with self.__lock:
+            image = self.__reduced.get(factor)
+            if image is None:
+                with profiler.current().stage("decode reduced"):
+                    image = self.__read(REDUCED_FLAGS[factor])
+                self.__reduced[factor] = image
+            return image
+
+    def __read(self, flags):
+        image = cv2.imread(self.path, flags)
+        if image is None:
+            raise ValueError(f"Could not read image: {self.path}")
+        return image
+
+
+def image_size(image):
+    """Returns the (width, height) of a decoded image or an ImageSource."""
+    if isinstance(image, ImageSource):
+        return image.size
+    height, width = np.shape(image)[:2]
+    return width, height
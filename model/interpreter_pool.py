@@ -0,0 +1,177 @@
+import threading
+from concurrent.futures import Future
+from queue import Queue
+
+import numpy as np
+
+from . import profiler
+from .backend import create_interpreter
+from .quantization import dequantize
+
+
+class InterpreterWorker:
+    """A TFLite interpreter whose input tensor is sized for a batch of tiles."""
+
+    def __init__(self, model_path, batch_size=1, num_threads=None) -> None:
+        self.interpreter = create_interpreter(model_path, num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+
+        # The tile batch size the interpreter actually supports
+        self.batch_size = self.__resize_input_batch(max(1, int(batch_size)))
+
+    def __resize_input_batch(self, batch_size):
+        """Resize the input tensor to hold a whole batch of tiles.
+
+        Models whose graph can't be resized (e.g. fixed post-processing ops)
+        fall back to a batch of one, and tiles are then invoked in chunks.
+        """
+        if batch_size == 1:
+            return 1
+
+        _, height, width, channels = self.input_details[0]['shape']
+        try:
+            self.interpreter.resize_tensor_input(self.input_details[0]['index'],
+                                                 [batch_size, height, width, channels])
+            self.interpreter.allocate_tensors()
+            output_details = self.interpreter.get_output_details()
+            if any(len(d['shape']) == 0 or d['shape'][0] != batch_size for d in output_details):
+                raise ValueError("Model outputs do not follow the batch dimension")
+        except (RuntimeError, ValueError):
+            self.interpreter.resize_tensor_input(self.input_details[0]['index'],
+                                                 [1, height, width, channels])
+            self.interpreter.allocate_tensors()
+            batch_size = 1
+
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        return batch_size
+
+    def __get_output(self, i):
+        # Quantized models return integer scores and boxes
+        return dequantize(self.interpreter.get_tensor(self.output_details[i]['index']), self.output_details[i])
+
+    def __run_inference_for_single_image(self, image):
+        self.interpreter.set_tensor(self.input_details[0]['index'], image)
+        self.interpreter.invoke()
+
+        scores = self.__get_output(0)[0]
+        boxes = self.__get_output(1)[0]
+        classes = self.__get_output(3)[0]
+
+        return scores, boxes, classes
+
+    def run(self, batch, n=None):
+        """Run the interpreter on the first n tiles of a (m, height, width, 3) batch.
+
+        Returns scores, boxes and classes with a leading dimension of n.
+        """
+        n = len(batch) if n is None else n
+        if self.batch_size == 1:
+            results = [self.__run_inference_for_single_image(batch[i:i + 1]) for i in range(n)]
+            scores, boxes, classes = zip(*results)
+            return np.stack(scores), np.stack(boxes), np.stack(classes)
+
+        if len(batch) < self.batch_size:
+            # Pad the tail of the batch with zeros instead of reallocating the tensors
+            padded = np.zeros((self.batch_size,) + batch.shape[1:], dtype=batch.dtype)
+            padded[:len(batch)] = batch
+            batch = padded
+
+        # Tiles past n are left over from an earlier batch; their outputs are dropped
+        self.interpreter.set_tensor(self.input_details[0]['index'], batch)
+        self.interpreter.invoke()
+
+        # get_tensor returns copies, so results stay valid after the next invoke
+        scores = self.__get_output(0)[:n]
+        boxes = self.__get_output(1)[:n]
+        classes = self.__get_output(3)[:n]
+
+        return scores, boxes, classes
+
+
+class InterpreterPool:
+    """
+    A pool of interpreters for running tile batches in parallel.
+
+    Every worker thread owns exactly one InterpreterWorker, so interpreters are
+    never shared between threads. Batches are submitted to a common queue and
+    results come back as futures, which the caller collects in submission
+    order. With a single worker batches run inline in the calling thread.
+    """
+
+    def __init__(self, model_path, num_workers=1, batch_size=1, num_threads=None) -> None:
+        num_workers = max(1, int(num_workers))
+        self.workers = [InterpreterWorker(model_path, batch_size, num_threads)
+                        for _ in range(num_workers)]
+        self.input_details = self.workers[0].input_details
+        self.output_details = self.workers[0].output_details
+        self.batch_size = self.workers[0].batch_size
+
+        self.__jobs = Queue()
+        self.__threads = []
+        if num_workers > 1:
+            for worker in self.workers:
+                thread = threading.Thread(target=self.__worker_loop, args=(worker,), daemon=True)
+                thread.start()
+                self.__threads.append(thread)
+
+    @property
+    def num_workers(self):
+        return len(self.workers)
+
+    def submit(self, batch, n=None):
+        """Schedule a batch of tiles and return a Future of (scores, boxes, classes).
+
+        Only the first n tiles are used, so a full-size buffer can hold a short
+        last batch. The batch must not be modified until the future is done.
+        """
+        future = Future()
+        # Workers record into the profiler of the thread that submitted the batch
+        prof = profiler.current()
+        if not self.__threads:
+            future.set_running_or_notify_cancel()
+            self.__run(self.workers[0], batch, n, future, prof)
+        else:
+            self.__jobs.put((batch, n, future, prof))
+        return future
+
+    def warm_up(self):
+        """Invoke every interpreter once on an empty batch."""
+        _, height, width, channels = self.input_details[0]['shape']
+        batch = np.zeros((self.batch_size, height, width, channels), dtype=self.input_details[0]['dtype'])
+        for worker in self.workers:
+            worker.run(batch)
+
+    def close(self):
+        """Stop the worker threads once the queued batches are done.
+
+        A closed pool keeps working, running batches inline on its first worker.
+        """
+        for _ in self.__threads:
+            self.__jobs.put(None)
+        for thread in self.__threads:
+            thread.join()
+        self.__threads = []
+
+    def __worker_loop(self, worker):
+        while True:
+            job = self.__jobs.get()
+            if job is None:
+                break
+
+            batch, n, future, prof = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.__run(worker, batch, n, future, prof)
+
+    @staticmethod
+    def __run(worker, batch, n, future, prof):
+        try:
+            with prof.stage("invoke"):
+                result = worker.run(batch, n)
+            prof.count("invokes", len(result[0]) if worker.batch_size == 1 else 1)
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
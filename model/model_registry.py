@@ -0,0 +1,165 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .model_tflite import TFLiteModel
+
+
+class ModelRegistry:
+    """
+    A process-wide cache of loaded and warmed-up TFLiteModel instances.
+
+    Models are keyed by their absolute path, file mtime and size together with
+    the execution parameters, so a model file replaced on disk is reloaded.
+    The least recently used models are evicted once either the number of
+    models or their estimated memory footprint exceeds the configured limits.
+
+    Code that runs a model for a while, such as a detection thread, checks it
+    out with acquire() and hands it back with release(). An evicted model is
+    only closed once every checkout of it has been released.
+
+    Attributes:
+        max_models (int): The maximum number of cached models.
+        max_bytes (int): The memory cap for cached models, estimated as the model
+            file size times the number of interpreters.
+    """
+
+    def __init__(self, max_models=4, max_bytes=512 * 1024 * 1024) -> None:
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        # key -> (Future[TFLiteModel], estimated size in bytes)
+        self.__entries = OrderedDict()
+        # Future -> number of checkouts not released yet
+        self.__users = {}
+        # Evicted futures that are closed when their last checkout is released
+        self.__retired = set()
+        self.__lock = threading.Lock()
+
+    def get(self, model_path, batch_size=8, num_workers=1, num_threads=None, rgb_input=False):
+        """
+        Returns a ready model, loading and warming it up if it isn't cached.
+
+        Concurrent calls for the same model wait for the one that loads it.
+        The model isn't checked out, so it may be closed once it's evicted;
+        use acquire() to hold on to it.
+        """
+        return self.__get(model_path, batch_size, num_workers, num_threads, rgb_input, checkout=False)
+
+    def acquire(self, model_path, batch_size=8, num_workers=1, num_threads=None, rgb_input=False):
+        """Like get(), but the model stays open until it's passed to release()."""
+        return self.__get(model_path, batch_size, num_workers, num_threads, rgb_input, checkout=True)
+
+    def release(self, model):
+        """Hands back a model from acquire(), closing it if it was evicted meanwhile."""
+        with self.__lock:
+            future = next((f for f in self.__users if f.done() and f.exception() is None and f.result() is model),
+                          None)
+            if future is None:
+                return
+            self.__users[future] -= 1
+            if self.__users[future]:
+                return
+            del self.__users[future]
+            if future not in self.__retired:
+                return
+            self.__retired.discard(future)
+        model.close()
+
+    def set_limits(self, max_models=None, max_bytes=None):
+        """Changes the limits, evicting models over the new ones right away."""
+        with self.__lock:
+            if max_models is not None:
+                self.max_models = max_models
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self.__evict()
+
+    def __get(self, model_path, batch_size, num_workers, num_threads, rgb_input, checkout):
+        path = os.path.abspath(model_path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size, batch_size, num_workers, num_threads, rgb_input)
+
+        future = Future()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+            else:
+                # A changed file makes every older entry for the same path stale
+                for stale in [k for k in self.__entries if k[0] == path and k[1:3] != key[1:3]]:
+                    self.__release(self.__entries.pop(stale)[0])
+                self.__entries[key] = (future, stat.st_size * max(1, num_workers))
+            if checkout:
+                # Checked out before waiting, so an eviction meanwhile doesn't close it
+                owned = entry[0] if entry is not None else future
+                self.__users[owned] = self.__users.get(owned, 0) + 1
+            if entry is None:
+                self.__evict()
+
+        if entry is not None:
+            try:
+                return entry[0].result()
+            except Exception:
+                if checkout:
+                    self.__forget(entry[0])
+                raise
+
+        try:
+            model = TFLiteModel(path, batch_size, num_workers, num_threads, rgb_input)
+            model.warm_up()
+        except Exception as e:
+            with self.__lock:
+                if key in self.__entries and self.__entries[key][0] is future:
+                    del self.__entries[key]
+            if checkout:
+                self.__forget(future)
+            future.set_exception(e)
+            raise
+        future.set_result(model)
+        return model
+
+    def warm(self, model_path, batch_size=8, num_workers=1, num_threads=None, rgb_input=False):
+        """Loads and warms up a model in a background thread."""
+        thread = threading.Thread(target=self.__warm,
+                                  args=(model_path, batch_size, num_workers, num_threads, rgb_input),
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self):
+        """Drops every cached model."""
+        with self.__lock:
+            while self.__entries:
+                self.__release(self.__entries.popitem()[1][0])
+
+    def __warm(self, *args):
+        try:
+            self.get(*args)
+        except Exception as e:
+            # The error is reported again when the model is actually used
+            print("Error while warming up model: ", e)
+
+    def __evict(self):
+        total = sum(size for _, size in self.__entries.values())
+        while len(self.__entries) > 1 and (len(self.__entries) > self.max_models or total > self.max_bytes):
+            future, size = self.__entries.popitem(last=False)[1]
+            total -= size
+            self.__release(future)
+
+    def __release(self, future):
+        # Checked-out models are closed by the last release(), the others as soon as they're ready
+        if self.__users.get(future):
+            self.__retired.add(future)
+            return
+        future.add_done_callback(lambda f: f.exception() is None and f.result().close())
+
+    def __forget(self, future):
+        # A model that failed to load has nothing to close
+        with self.__lock:
+            self.__users.pop(future, None)
+            self.__retired.discard(future)
+
+
+# Shared by the GUI and any other code running detections in this process
+registry = ModelRegistry()
@@ -1,103 +1,177 @@
-import tensorflow as tf
+import threading
+from collections import deque
+
 import cv2
 import numpy as np
 
-
-def non_max_suppression(detections, overlapThresh):
-    if len(detections) == 0:
-        return []
-    
-    boxes = np.array([[xmin, ymin, xmax, ymax, score]
-                      for score, object_name, xmin, ymin, xmax, ymax in detections])
-    if boxes.dtype.kind == "i":
-        boxes = boxes.astype("float")
-
-    pick = []
-    x1 = boxes[:,0]
-    y1 = boxes[:,1]
-    x2 = boxes[:,2]
-    y2 = boxes[:,3]
-    sc = boxes[:,4]
-    
-    area = (x2 - x1 + 1) * (y2 - y1 + 1)
-    idxs = np.argsort(sc)
-    
-    while len(idxs) > 0:
-        last = len(idxs) - 1
-        i = idxs[last]
-        pick.append(i)
-        
-        xx1 = np.maximum(x1[i], x1[idxs[:last]])
-        yy1 = np.maximum(y1[i], y1[idxs[:last]])
-        xx2 = np.minimum(x2[i], x2[idxs[:last]])
-        yy2 = np.minimum(y2[i], y2[idxs[:last]])
-        
-        w = np.maximum(0, xx2 - xx1 + 1)
-        h = np.maximum(0, yy2 - yy1 + 1)
-        
-        overlap = (w * h) / area[idxs[:last]]
-        
-        idxs = np.delete(idxs, np.concatenate(([last],
-            np.where(overlap > overlapThresh)[0])))
-        
-    return [detections[pick[i]] for i in range(len(pick))]
+from .interpreter_pool import InterpreterPool
+from .detections import Detections, BandNMS, candidate_floor
+from .tile_planner import (grid_tiles, covering_tiles, plan_adaptive_tiles, restrict_to_rois,
+                           roi_pixels, roi_bounds)
+from . import profiler
+from .quantization import input_lut, is_quantized
+from .image_source import ImageSource
 
 
 class TFLiteModel:
-    def __init__(self, model_path) -> None:
-        self.interpreter = tf.lite.Interpreter(model_path)
-        self.interpreter.allocate_tensors()
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
+    def __init__(self, model_path, batch_size=8, num_workers=1, num_threads=None, rgb_input=False) -> None:
+        self.model_path = model_path
+        # Tiles are cut from BGR images; models trained on RGB need the channels swapped
+        self.rgb_input = rgb_input
+        self.pool = InterpreterPool(model_path, num_workers, batch_size, num_threads)
+        self.input_details = self.pool.input_details
+        self.output_details = self.pool.output_details
+        self.batch_size = self.pool.batch_size
+        # Quantized models take 8-bit tiles directly, without a float conversion
+        self.input_dtype = self.input_details[0]['dtype']
+        self.__input_lut = None
+        if is_quantized(self.input_details[0]):
+            self.__input_lut = input_lut(self.input_details[0])
+        # Replaces the batched tile loop, e.g. to share batches between requests:
+        # a callable (image, cutoff, regions) -> Detections
+        self.tile_runner = None
+        # A single-worker pool runs in the caller's thread, so runs are serialized
+        self.__lock = threading.Lock()
 
-    def __run_inference_for_single_image(self, image):
-        self.interpreter.set_tensor(self.input_details[0]['index'], image)
-        self.interpreter.invoke()
+        # Preprocessing writes into reusable buffers, so tiles don't allocate.
+        # A buffer is reused only after the batch it held has been collected.
+        _, height, width, channels = self.input_details[0]['shape']
+        self.__buffers = [np.zeros((self.batch_size, height, width, channels), dtype=self.input_dtype)
+                          for _ in range(2 * self.pool.num_workers)]
+        self.__scratch = np.empty((height, width, channels), dtype=np.uint8)
+        # Beyond this the coarse pass only throws pixels away when resizing to the input
+        self.coarse_min_side = 4 * max(height, width)
 
-        scores = self.interpreter.get_tensor(self.output_details[0]['index'])[0]
-        boxes = self.interpreter.get_tensor(self.output_details[1]['index'])[0]
-        classes = self.interpreter.get_tensor(self.output_details[3]['index'])[0]
+    def warm_up(self):
+        """Pay the first-invoke cost of every interpreter ahead of time."""
+        with self.__lock:
+            self.pool.warm_up()
 
-        return scores, boxes, classes
-    
-    def __run_inference_for_image_part(self, image, cutoff, class_name, ax0, ay0, ax1, ay1):
-        detections = []
-        im = image[ay0:ay1, ax0:ax1]
+    def close(self):
+        self.pool.close()
 
-        im_resize = cv2.resize(im, (self.input_details[0]['shape'][2], self.input_details[0]['shape'][1]))
-        im_resize = np.expand_dims(im_resize, axis=0)
+    def decode_batch(self, scores, boxes, classes, regions, cutoff):
+        """Convert raw outputs of a batch into detections in image coordinates.
 
-        # Нормализация входных данных
-        im_resize = np.float32(im_resize / 255)
+        Args:
+            scores, boxes, classes (np.ndarray): The interpreter outputs of n tiles.
+            regions (Sequence[tuple]): The (x0, y0, x1, y1) image region of each tile.
+            cutoff (float): Keep detections scoring above this value.
+        """
+        regions = np.asarray(regions, dtype=np.float32)
+        origin = np.hstack([regions[:, :2], regions[:, :2]])
+        size = np.hstack([regions[:, 2:] - regions[:, :2]] * 2)
 
-        scores, boxes, classes = self.__run_inference_for_single_image(im_resize)
+        tile_idx, box_idx = np.nonzero(scores > cutoff)
+        # The model returns (ymin, xmin, ymax, xmax) boxes as fractions of the tile
+        tile_boxes = boxes[tile_idx, box_idx][:, [1, 0, 3, 2]]
 
-        h, w, _ = im.shape
+        # Dequantized class ids are only close to integers, e.g. 2.9999 for class 3
+        return Detections(tile_boxes * size[tile_idx] + origin[tile_idx],
+                          scores[tile_idx, box_idx],
+                          np.rint(classes[tile_idx, box_idx]))
 
-        for i in range(len(scores)):
-            if scores[i] > cutoff:
-                ymin = int(boxes[i][0] * h)
-                xmin = int(boxes[i][1] * w)
-                ymax = int(boxes[i][2] * h)
-                xmax = int(boxes[i][3] * w)
+    def __run_inference_for_image_parts(self, image, cutoff, regions, band_nms_iou=None):
+        """Run inference for many (ax0, ay0, ax1, ay1) regions in fixed-size batches.
 
-                object_id = int(classes[i])
-                object_name = class_name.get(object_id, "Unknown")
+        Batches are prepared here while the pool invokes earlier ones; results
+        are decoded in submission order, so the output doesn't depend on the
+        number of workers.
+        """
+        if self.tile_runner is not None:
+            return self.tile_runner(image, cutoff, regions)
+        with self.__lock:
+            return self.__run_batches(image, cutoff, regions, band_nms_iou)
 
-                detections.append([scores[i], object_name, xmin + ax0, ymin + ay0, xmax + ax0, ymax + ay0])
+    def fill_tile(self, tile, out):
+        """Resize a tile and write it into out in the model's input dtype and channel order.
 
-        return detections
+        Uses a shared scratch array, so only one thread may fill tiles at a time.
+        """
+        height, width = out.shape[:2]
+        if self.input_dtype != np.float32 and self.__input_lut is None and not self.rgb_input:
+            cv2.resize(tile, (width, height), dst=out)
+            return
+
+        pixels = cv2.resize(tile, (width, height), dst=self.__scratch)
+        if self.rgb_input:
+            pixels = pixels[..., ::-1]
+        if self.input_dtype == np.float32:
+            # Input normalization, in two steps so the ufunc doesn't allocate a casting buffer
+            out[...] = pixels
+            np.divide(out, 255, out=out)
+        elif self.__input_lut is None:
+            out[...] = pixels
+        else:
+            # np.take would first widen the uint8 indices into a new intp array
+            cv2.LUT(pixels, self.__input_lut, dst=out)
+
+    def __run_batches(self, image, cutoff, regions, band_nms_iou=None):
+        """Collects the tile detections, reduced band by band with NMS if band_nms_iou is set."""
+        batches = self.__iter_batches(image, cutoff, regions)
+        if band_nms_iou is None:
+            return Detections.concatenate([detections for detections, _ in batches])
+
+        reducer = BandNMS(band_nms_iou)
+        for detections, boundary in batches:
+            with profiler.current().stage("band nms"):
+                reducer.add(detections, boundary)
+        return reducer.finish()
+
+    def __iter_batches(self, image, cutoff, regions):
+        """
+        Runs the regions in batches and yields each batch's detections as it completes.
+
+        Tiles are cut lazily, at most a few batches ahead of the results. Each
+        batch comes with the top of the highest region still to be collected,
+        so callers can settle the detections above it.
+        """
+        prof = profiler.current()
+        prof.count("tiles", len(regions))
+        # The top of the highest remaining region, for each region onwards
+        tops = np.minimum.accumulate(np.array([region[1] for region in regions] + [np.inf])[::-1])[::-1]
+        # Bounds the batches in flight, so not every tile is held in memory
+        max_pending = len(self.__buffers)
+        pending = deque()
 
-    def __run_inference_for_image_part_pcnt(self, image, cutoff, class_name, p_ax0=0, p_ay0=0, p_ax1=1, p_ay1=1):
+        for n, start in enumerate(range(0, len(regions), self.batch_size)):
+            part = regions[start:start + self.batch_size]
+            with prof.stage("preprocess"):
+                batch = self.__buffers[n % max_pending]
+                chunk = []
+                for i, (ax0, ay0, ax1, ay1) in enumerate(part):
+                    im = image[ay0:ay1, ax0:ax1]
+                    self.fill_tile(im, batch[i])
+                    # The slice may be cut short at the image border
+                    chunk.append((ax0, ay0, ax0 + im.shape[1], ay0 + im.shape[0]))
+
+            pending.append((self.pool.submit(batch, len(part)), chunk, start + len(part)))
+            if len(pending) >= max_pending:
+                yield self.__collect(pending.popleft(), cutoff, tops)
+
+        while pending:
+            yield self.__collect(pending.popleft(), cutoff, tops)
+
+    def __collect(self, job, cutoff, tops):
+        future, chunk, end = job
+        scores, boxes, classes = future.result()
+        with profiler.current().stage("postprocess"):
+            return self.decode_batch(scores, boxes, classes, chunk, cutoff), tops[end]
+
+    def __run_inference_for_image_part(self, image, cutoff, ax0, ay0, ax1, ay1):
+        return self.__run_inference_for_image_parts(image, cutoff, [(ax0, ay0, ax1, ay1)])
+
+    def __run_inference_for_image_part_pcnt(self, image, cutoff, p_ax0=0, p_ay0=0, p_ax1=1, p_ay1=1):
         h, w, _ = image.shape
         max_x, max_y = w - 1, h - 1
-        return self.__run_inference_for_image_part(image, cutoff, class_name,
+        return self.__run_inference_for_image_part(image, cutoff,
                                             int(p_ax0 * max_x), int(p_ay0 * max_y),
                                             int(p_ax1 * max_x), int(p_ay1 * max_y))
     
-    def __display_image_with_boxes(self, image, detections, p_x0=0, p_y0=0, p_x1=0, p_y1=0):
+    @staticmethod
+    def display_image_with_boxes(image, detections, class_name, p_x0=0, p_y0=0, p_x1=0, p_y1=0):
         image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        for score, name, xmin, ymin, xmax, ymax in detections:
+        for score, name, xmin, ymin, xmax, ymax in detections.to_list(class_name):
             label = f"{name}: {score * 100:.2f}%"
             cv2.rectangle(image, (xmin, ymin), (xmax, ymax), (10, 255, 0), 2)
 
@@ -120,37 +194,221 @@ class TFLiteModel:
 
         return image
 
-    def do_sliding_window_inference(self, path_file, cutoff, class_name):
-        image = cv2.imread(path_file)
-        detections = self.__run_inference_for_image_part_pcnt(image, cutoff, class_name, 0, 0, 1, 1)
+    def __run_pyramid(self, image, floor, levels, rois=None, overlap=0.5):
+        """Tile every pyramid level at the model's input size and map detections to full resolution.
+
+        Tiles overlap by half by default, so an object up to half a tile wide
+        is whole in some tile of its level; larger objects are found on coarser levels.
+        The last level is never smaller than one tile. With rois, only the
+        tiles that intersect a region of interest are run.
+        """
+        prof = profiler.current()
+        _, tile_height, tile_width, _ = self.input_details[0]['shape']
+        tile_size = max(tile_height, tile_width)
+        h, w, _ = image.shape
+
+        detections = []
+        level = image
+        for i in range(max(1, int(levels))):
+            if i > 0:
+                if min(level.shape[:2]) // 2 < tile_size:
+                    break
+                with prof.stage("pyramid"):
+                    level = cv2.pyrDown(level)
+
+            level_h, level_w, _ = level.shape
+            step = max(1, int(tile_size * (1 - overlap)))
+            regions = covering_tiles(level_w, level_h, tile_size, step)
+            regions = restrict_to_rois(regions, rois, level_w, level_h)
+            found = self.__run_inference_for_image_parts(level, floor, regions.tolist())
+            detections.append(found.scale(w / level_w, h / level_h))
+
+        detections = Detections.concatenate(detections)
+        return detections.inside(roi_pixels(rois, w, h)) if rois else detections
+
+    def detect_candidates(self, image, cutoff, candidate_cutoff=None,
+                          adaptive_tiling=False, max_tiles=0, objectness_cutoff=None,
+                          tiling_mode="window", pyramid_levels=3, rois=None, band_nms_iou=None,
+                          memory_budget_mb=0, window_scale=4.0, stride_scale=1.0, pyramid_overlap=0.5):
+        """
+        Runs the sliding window and returns raw detections before NMS.
+
+        The window is sized from a coarse full-image pass at the cutoff:
+        window_scale mean box heights square, advancing stride_scale mean box
+        sizes per step. tools/autotune.py measures which scales pay off. With
+        adaptive tiling only the windows that cover or neighbour objects found
+        by the coarse pass are run. The coarse pass then also keeps candidates
+        down to objectness_cutoff, so faint objects still attract windows, and
+        max_tiles caps the number of windows per image.
+
+        In the "pyramid" tiling mode the image is instead halved with
+        cv2.pyrDown into up to pyramid_levels levels, each tiled at the model's
+        native input size, which finds near and far objects in the same image
+        and doesn't depend on the coarse pass. Adaptive tiling doesn't apply.
+
+        Given an ImageSource, the coarse pass runs on a reduced decode of at
+        least coarse_min_side pixels, and the full-resolution image is only
+        decoded when windows have to be run.
+
+        Regions of interest restrict the work to the parts of the frame that
+        matter: the coarse pass only sees their bounding box, only windows that
+        intersect a region are run, and only detections centred in a region
+        are kept.
+
+        A memory budget bounds the working image: a full-resolution decode
+        larger than memory_budget_mb is replaced by the least reduced decode
+        that fits, with the windows scaled to match. With band_nms_iou the
+        window detections are reduced with NMS row band by row band as the
+        windows advance, so only the unsettled detections near the current
+        row are held instead of every raw detection of the image.
+
+        Args:
+            image (Union[np.ndarray, ImageSource]): A decoded BGR image or an
+                image file to decode on demand.
+            cutoff (float): The score used to size the window.
+            candidate_cutoff (float, optional): Keep tile detections down to this
+                score, so a lower cutoff can be applied later without re-running
+                the model. Defaults to the cutoff.
+            tiling_mode (str, optional): "window" or "pyramid". Defaults to "window".
+            pyramid_levels (int, optional): The most pyramid levels, the full
+                resolution included. Defaults to 3.
+            pyramid_overlap (float, optional): The share of a pyramid tile
+                overlapped by the next one. Defaults to 0.5.
+            window_scale (float, optional): The window side in mean box
+                heights. Defaults to 4.0.
+            stride_scale (float, optional): The window step in mean box sizes.
+                Defaults to 1.0.
+            rois (Sequence[tuple], optional): (x0, y0, x1, y1) regions of
+                interest as fractions of the image size. Defaults to the whole image.
+            band_nms_iou (float, optional): The IoU of the NMS applied band by
+                band to window detections. Only exact for the hard NMS of
+                postprocess() with the same threshold. Defaults to None, off.
+            memory_budget_mb (float, optional): The most memory of the decoded
+                image an ImageSource is worked on at. Defaults to 0, no limit.
+
+        Returns:
+            Detections: Tile detections with scores above
+                min(cutoff, candidate_cutoff), before NMS.
+        """
+        floor = candidate_floor(cutoff, candidate_cutoff)
+        source = image if isinstance(image, ImageSource) else None
+        if tiling_mode not in ("window", "pyramid"):
+            raise ValueError(f"Unknown tiling mode: {tiling_mode}")
+        max_bytes = int(memory_budget_mb * 1024 * 1024)
+        if tiling_mode == "pyramid":
+            work, factor = source.within(max_bytes) if source else (image, 1)
+            return self.__run_pyramid(work, floor, pyramid_levels, rois,
+                                      pyramid_overlap).scale(factor, factor)
+
+        regions, coarse = self.plan_windows(image, cutoff, candidate_cutoff, adaptive_tiling,
+                                            max_tiles, objectness_cutoff, rois, memory_budget_mb,
+                                            window_scale, stride_scale)
+        if regions is None:
+            return coarse
+        work, factor = source.within(max_bytes) if source else (image, 1)
+        if factor == 1:
+            return self.run_tiles(work, floor, regions, rois, band_nms_iou)
+        return self.run_tiles(work, floor, regions // factor, rois, band_nms_iou).scale(factor, factor)
+
+    def plan_windows(self, image, cutoff, candidate_cutoff=None, adaptive_tiling=False,
+                     max_tiles=0, objectness_cutoff=None, rois=None, memory_budget_mb=0,
+                     window_scale=4.0, stride_scale=1.0):
+        """
+        Runs the coarse pass and plans the sliding windows of detect_candidates().
+
+        Returns:
+            Tuple[Optional[np.ndarray], Detections]: The (n, 4) windows to run,
+                or None when the coarse pass found nothing above the cutoff, and
+                the coarse-pass candidates above the score floor.
+        """
+        floor = candidate_floor(cutoff, candidate_cutoff)
+        source = image if isinstance(image, ImageSource) else None
+        coarse_cutoff = floor
+        if adaptive_tiling and objectness_cutoff is not None:
+            coarse_cutoff = min(floor, objectness_cutoff)
+        coarse_image, factor = source.reduced(self.coarse_min_side) if source else (image, 1)
+        bounds = roi_bounds(rois) if rois else (0, 0, 1, 1)
+        candidates = self.__run_inference_for_image_part_pcnt(coarse_image, coarse_cutoff, *bounds)
+        if factor != 1:
+            candidates = candidates.scale(factor, factor)
+        if rois:
+            coarse_h, coarse_w = coarse_image.shape[:2]
+            candidates = candidates.inside(roi_pixels(rois, coarse_w * factor, coarse_h * factor))
+        detections = candidates.filter(cutoff)
 
         if not detections:
             print("No detections found meeting the cutoff threshold.")
-            return (image, [])
+            return None, candidates.filter(floor)
 
-        boxes = [[xmin, ymin, xmax, ymax, score]
-                 for score, object_name, xmin, ymin, xmax, ymax in detections]
+        if source is None:
+            h, w, _ = image.shape
+        elif memory_budget_mb:
+            # The full image may never be decoded, so its size is estimated
+            w, h = source.size
+        else:
+            h, w, _ = source.full().shape
 
-        h, w, _ = image.shape
+        sizes = detections.boxes[:, 2:] - detections.boxes[:, :2]
+        mean_dx, mean_dy = np.mean(sizes, axis=0).astype(int)
 
-        a = np.array(boxes)
-        mean_dx = int(np.mean(a[:,2] - a[:,0]))
-        mean_dy = int(np.mean(a[:,3] - a[:,1]))
+        window_size = int(window_scale * mean_dy)
+        # Columns advance by the mean box height and rows by the mean width
+        step_x, step_y = int(stride_scale * mean_dy), int(stride_scale * mean_dx)
+        regions = grid_tiles(w, h, window_size, step_x, step_y)
+        regions = restrict_to_rois(regions, rois, w, h)
+        if adaptive_tiling:
+            regions = plan_adaptive_tiles(regions, candidates.boxes, candidates.scores,
+                                          mean_dx, mean_dy, max_tiles)
 
-        step_x, step_y = mean_dx, mean_dy
-        window_size = 4 * mean_dy
-        detections = []
-        y0 = 0
-        while y0 < h - 1:
-            x0 = 0
-            while x0 < w - 1:
-                x1, y1 = x0 + window_size, y0 + window_size
-                detections += self.__run_inference_for_image_part(image, cutoff, class_name, x0, y0, x1, y1)
-                x0 += step_y
-            y0 += step_x
-        
-        detections = non_max_suppression(detections, 0.5)
-
-        processed_image = self.__display_image_with_boxes(image, detections)
+        return regions, candidates.filter(floor)
+
+    def run_tiles(self, image, cutoff, regions, rois=None, band_nms_iou=None):
+        """Runs the model on (x0, y0, x1, y1) regions of a decoded image.
+
+        Returns:
+            Detections: The tile detections above the cutoff in image coordinates,
+                only those centred in a region of interest if rois are given.
+        """
+        detections = self.__run_inference_for_image_parts(image, cutoff, np.asarray(regions).tolist(),
+                                                          band_nms_iou)
+        if rois:
+            h, w = image.shape[:2]
+            detections = detections.inside(roi_pixels(rois, w, h))
+        return detections
+
+    @staticmethod
+    def postprocess(candidates, cutoff, iou_threshold=0.5, soft_nms=False, box_fusion=False):
+        """Applies the cutoff and NMS, or weighted box fusion, to raw candidates."""
+        with profiler.current().stage("nms"):
+            if box_fusion:
+                return candidates.filter(cutoff).fuse(iou_threshold)
+            # Decayed soft-NMS scores must still reach the cutoff
+            return candidates.filter(cutoff).nms(iou_threshold, soft=soft_nms, score_threshold=cutoff)
+
+    def detect(self, image, cutoff, iou_threshold=0.5, soft_nms=False, box_fusion=False, **tiling):
+        """
+        Detects objects in a decoded BGR image or an ImageSource.
+
+        Keyword options are passed on to detect_candidates().
+
+        Returns:
+            Detections: The detections after NMS.
+        """
+        candidates = self.detect_candidates(image, cutoff, **tiling)
+        return self.postprocess(candidates, cutoff, iou_threshold, soft_nms, box_fusion)
+
+    def do_sliding_window_inference(self, path_file, cutoff, class_name, **options):
+        """Runs detect() on an image file and draws the detections onto it.
+
+        Keyword options are passed on to detect().
+        """
+        source = ImageSource(path_file)
+        detections = self.detect(source, cutoff, **options)
+        image = source.full()
+        if not detections:
+            return (image, detections)
+
+        with profiler.current().stage("draw"):
+            processed_image = self.display_image_with_boxes(image, detections, class_name)
 
         return (processed_image, detections)
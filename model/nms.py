@@ -0,0 +1,364 @@
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    """
+    Computes the pairwise IoU of two sets of (xmin, ymin, xmax, ymax) boxes.
+
+    Coordinates are inclusive pixel indices, so a box covers
+    (xmax - xmin + 1) * (ymax - ymin + 1) pixels.
+
+    Args:
+        boxes_a (np.ndarray): An (n, 4) array of boxes.
+        boxes_b (np.ndarray): An (m, 4) array of boxes.
+
+    Returns:
+        np.ndarray: An (n, m) array of IoU values.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float32)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0] + 1) * (boxes_a[:, 3] - boxes_a[:, 1] + 1)
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0] + 1) * (boxes_b[:, 3] - boxes_b[:, 1] + 1)
+
+    w = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2]) - np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0]) + 1
+    h = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3]) - np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1]) + 1
+    inter = np.maximum(w, 0) * np.maximum(h, 0)
+
+    return inter / (area_a[:, None] + area_b[None, :] - inter)
+
+
+def _separate_classes(boxes, class_ids):
+    # Offsets the boxes of each class so boxes of different classes never overlap
+    boxes = np.asarray(boxes, dtype=np.float32)
+    if class_ids is None or len(boxes) == 0:
+        return boxes
+    span = boxes.max() - min(boxes.min(), 0) + 2
+    return boxes + (np.asarray(class_ids, dtype=np.float32) * span)[:, None]
+
+
+def nms(boxes, scores, iou_threshold=0.5, class_ids=None, block_size=512):
+    """
+    Greedy non-maximum suppression.
+
+    Boxes are visited in order of decreasing score and a box is dropped when
+    its IoU with an already kept box exceeds the threshold. The work is done
+    block by block: IoU inside a block of the best remaining boxes is one
+    matrix, and the boxes kept in a block suppress all later boxes at once.
+
+    Args:
+        boxes (np.ndarray): An (n, 4) array of (xmin, ymin, xmax, ymax) boxes.
+        scores (np.ndarray): An (n,) array of scores.
+        iou_threshold (float, optional): The IoU above which boxes are suppressed.
+            Defaults to 0.5.
+        class_ids (np.ndarray, optional): Per-box class ids. When given, boxes only
+            suppress boxes of the same class. Defaults to None.
+        block_size (int, optional): The number of boxes resolved per block.
+            Defaults to 512.
+
+    Returns:
+        np.ndarray: Indices of the kept boxes, ordered by decreasing score.
+    """
+    scores = np.asarray(scores)
+    n = len(scores)
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+
+    order = np.argsort(-scores, kind="stable")
+    boxes = _separate_classes(boxes, class_ids)[order]
+    suppressed = np.zeros(n, dtype=bool)
+    # Caps the IoU matrix built when the tail is suppressed
+    max_cells = 4 * 1024 * 1024
+
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        block = np.arange(start, end)[~suppressed[start:end]]
+        if len(block) == 0:
+            continue
+
+        iou = box_iou(boxes[block], boxes[block]) > iou_threshold
+        alive = np.ones(len(block), dtype=bool)
+        for i in range(len(block)):
+            if alive[i]:
+                alive[i + 1:] &= ~iou[i, i + 1:]
+        suppressed[block[~alive]] = True
+        kept = block[alive]
+
+        rest = np.arange(end, n)[~suppressed[end:]]
+        step = max(1, max_cells // len(kept))
+        for chunk_start in range(0, len(rest), step):
+            chunk = rest[chunk_start:chunk_start + step]
+            overlap = box_iou(boxes[kept], boxes[chunk]) > iou_threshold
+            suppressed[chunk[overlap.any(axis=0)]] = True
+
+    return order[~suppressed]
+
+
+def soft_nms(boxes, scores, iou_threshold=0.5, class_ids=None, sigma=0.5,
+             score_threshold=0.001, method="gaussian"):
+    """
+    Soft non-maximum suppression (Bodla et al., 2017).
+
+    Instead of dropping overlapping boxes their scores are decayed, either
+    linearly for IoU above the threshold or with a Gaussian of the IoU.
+
+    Args:
+        boxes (np.ndarray): An (n, 4) array of (xmin, ymin, xmax, ymax) boxes.
+        scores (np.ndarray): An (n,) array of scores.
+        iou_threshold (float, optional): The IoU above which the linear method
+            decays scores. Defaults to 0.5.
+        class_ids (np.ndarray, optional): Per-box class ids. Defaults to None.
+        sigma (float, optional): The width of the Gaussian decay. Defaults to 0.5.
+        score_threshold (float, optional): Boxes whose decayed score falls below
+            this value are dropped. Defaults to 0.001.
+        method (str, optional): "gaussian" or "linear". Defaults to "gaussian".
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Indices of the kept boxes ordered by
+            decreasing decayed score, and their decayed scores.
+    """
+    if method not in ("gaussian", "linear"):
+        raise ValueError(f"Unknown soft-NMS method: {method}")
+
+    scores = np.array(scores, dtype=np.float32)
+    boxes = _separate_classes(boxes, class_ids)
+    remaining = np.flatnonzero(scores >= score_threshold)
+    keep = []
+
+    while len(remaining) > 0:
+        best = np.argmax(scores[remaining])
+        i = remaining[best]
+        keep.append(i)
+        remaining = np.delete(remaining, best)
+        if len(remaining) == 0:
+            break
+
+        iou = box_iou(boxes[i:i + 1], boxes[remaining])[0]
+        if method == "linear":
+            decay = np.where(iou > iou_threshold, 1 - iou, 1)
+        else:
+            decay = np.exp(-(iou * iou) / sigma)
+        scores[remaining] *= decay
+        remaining = remaining[scores[remaining] >= score_threshold]
+
+    keep = np.array(keep, dtype=np.intp)
+    return keep, scores[keep]
+
+
+
+def _pair_overlap(boxes, first, second):
+    """IoU and intersection over the smaller box of the given box pairs."""
+    a, b = boxes[first], boxes[second]
+    area_a = (a[:, 2] - a[:, 0] + 1) * (a[:, 3] - a[:, 1] + 1)
+    area_b = (b[:, 2] - b[:, 0] + 1) * (b[:, 3] - b[:, 1] + 1)
+    w = np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]) + 1
+    h = np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]) + 1
+    inter = np.maximum(w, 0) * np.maximum(h, 0)
+    return inter / (area_a + area_b - inter), inter / np.minimum(area_a, area_b)
+
+
+def neighbour_pairs(boxes, class_ids=None, cell_size=None):
+    """
+    Finds the pairs of boxes that may overlap by bucketing them in a uniform grid.
+
+    Every box goes into the grid cell of its top-left corner. With cells at
+    least as large as the boxes, two overlapping boxes are in the same or in
+    adjacent cells, so only those are paired and the work grows with the
+    number of boxes and their local density instead of with the square of
+    the number of boxes. The few boxes larger than a cell are paired with
+    every box. With class_ids, only boxes of the same class are paired.
+
+    Args:
+        boxes (np.ndarray): An (n, 4) array of inclusive (xmin, ymin, xmax, ymax) boxes.
+        class_ids (np.ndarray, optional): Per-box class ids. Defaults to None.
+        cell_size (float, optional): The grid cell side. Defaults to the largest
+            box side, but at most four times the median.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Indices (i, j), i != j, of every pair of
+            boxes that intersect, plus some that don't. Each pair is listed once.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32)
+    n = len(boxes)
+    if n < 2:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    classes = np.zeros(n, dtype=np.int64) if class_ids is None else np.asarray(class_ids, dtype=np.int64)
+
+    sides = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]) + 1
+    cell = float(cell_size or min(sides.max(), 4 * np.median(sides)))
+    large = sides > cell
+    small = np.flatnonzero(~large)
+
+    cells = np.floor(boxes[small, :2] / cell).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    width = int(cells[:, 0].max()) + 2
+    height = int(cells[:, 1].max()) + 2
+    key = (classes[small] * height + cells[:, 1]) * width + cells[:, 0]
+    order = np.argsort(key, kind="stable")
+    small, key = small[order], key[order]
+    position = np.arange(len(key))
+
+    firsts, seconds = [], []
+    # The own cell and the four neighbours after it, so each pair of cells is visited once
+    for dx, dy in ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+        neighbour = key + dy * width + dx
+        begin = np.searchsorted(key, neighbour, side="left")
+        if dx == 0 and dy == 0:
+            begin = position + 1
+        count = np.searchsorted(key, neighbour, side="right") - begin
+        first = np.repeat(position, count)
+        second = np.repeat(begin - np.cumsum(count) + count, count) + np.arange(len(first))
+        firsts.append(small[first])
+        seconds.append(small[second])
+
+    for i in np.flatnonzero(large):
+        # Each pair of large boxes is listed by the first of the two
+        others = np.flatnonzero((classes == classes[i]) & (~large | (np.arange(n) > i)))
+        others = others[others != i]
+        firsts.append(np.full(len(others), i, dtype=np.intp))
+        seconds.append(others)
+
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def _suppression_graph(boxes, scores, class_ids, match):
+    """Directed "higher-ranked box suppresses lower-ranked box" edges, grouped by source."""
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+
+    first, second = neighbour_pairs(boxes, class_ids)
+    iou, ios = _pair_overlap(np.asarray(boxes, dtype=np.float32), first, second)
+    matched = match(iou, ios)
+    first, second, iou = first[matched], second[matched], iou[matched]
+    swap = rank[first] > rank[second]
+    source = np.where(swap, second, first)
+    target = np.where(swap, first, second)
+
+    by_source = np.argsort(source, kind="stable")
+    source, target, iou = source[by_source], target[by_source], iou[by_source]
+    starts = np.searchsorted(source, np.arange(len(order) + 1))
+    return order, starts, target, iou
+
+
+def suppression_edges(boxes, scores, iou_threshold=0.5, class_ids=None):
+    """
+    Finds which boxes can suppress which in greedy NMS, over grid neighbours only.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The box indices by decreasing
+            score, and the (source, target) indices of every pair whose IoU is
+            above the threshold, the source being the higher-ranked box.
+    """
+    order, starts, target, _ = _suppression_graph(boxes, scores, class_ids,
+                                                  lambda iou, ios: iou > iou_threshold)
+    source = np.repeat(np.arange(len(order)), np.diff(starts))
+    return order, source, target
+
+
+def grid_nms(boxes, scores, iou_threshold=0.5, class_ids=None):
+    """
+    Greedy non-maximum suppression over grid neighbours only.
+
+    Keeps the same boxes as nms(), but IoU is computed only for the pairs
+    from neighbour_pairs(), so dense images with thousands of boxes scale
+    roughly linearly.
+
+    Args:
+        boxes (np.ndarray): An (n, 4) array of (xmin, ymin, xmax, ymax) boxes.
+        scores (np.ndarray): An (n,) array of scores.
+        iou_threshold (float, optional): The IoU above which boxes are suppressed.
+            Defaults to 0.5.
+        class_ids (np.ndarray, optional): Per-box class ids. When given, boxes only
+            suppress boxes of the same class. Defaults to None.
+
+    Returns:
+        np.ndarray: Indices of the kept boxes, ordered by decreasing score.
+    """
+    n = len(scores)
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+
+    order, starts, target, _ = _suppression_graph(boxes, scores, class_ids,
+                                                  lambda iou, ios: iou > iou_threshold)
+    suppressed = np.zeros(n, dtype=bool)
+    for i in order:
+        if not suppressed[i] and starts[i] != starts[i + 1]:
+            suppressed[target[starts[i]:starts[i + 1]]] = True
+    return order[~suppressed[order]]
+
+
+def weighted_box_fusion(boxes, scores, iou_threshold=0.55, class_ids=None, fragment_threshold=0.8):
+    """
+    Fuses clusters of overlapping boxes into one box each.
+
+    Boxes are visited in order of decreasing score; a box that isn't part of
+    a cluster yet starts one and takes in the remaining boxes that overlap it,
+    found with neighbour_pairs(). The fused box is the score-weighted mean of
+    the members whose IoU with the first box is above iou_threshold, and its
+    score is their mean score, as in weighted box fusion (Solovyev et al.,
+    2021).
+
+    A window border can cut an object, so a tile sees only part of it. Such a
+    fragment overlaps the whole box by little IoU but lies mostly inside it;
+    members whose intersection covers more than fragment_threshold of the
+    smaller box join the cluster too and only grow the fused box to cover
+    them, so two halves of one object fuse into one whole box.
+
+    Args:
+        boxes (np.ndarray): An (n, 4) array of (xmin, ymin, xmax, ymax) boxes.
+        scores (np.ndarray): An (n,) array of scores.
+        iou_threshold (float, optional): The IoU above which boxes are fused.
+            Defaults to 0.55.
+        class_ids (np.ndarray, optional): Per-box class ids. When given, only
+            boxes of the same class are fused. Defaults to None.
+        fragment_threshold (float, optional): The share of the smaller box that
+            must overlap for it to count as a fragment; None disables fragment
+            joining. Defaults to 0.8.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The fused (k, 4) float32
+            boxes, their scores and the index of each cluster's first box,
+            ordered by decreasing score of that box.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32)
+    scores = np.asarray(scores, dtype=np.float32)
+    n = len(scores)
+    if n == 0:
+        return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.intp)
+
+    fragments = fragment_threshold is not None
+    order, starts, target, iou = _suppression_graph(
+        boxes, scores, class_ids,
+        lambda iou, ios: (iou > iou_threshold) | (fragments & (ios > (fragment_threshold or 0))))
+
+    head = np.full(n, -1, dtype=np.intp)
+    core = np.zeros(n, dtype=bool)
+    for i in order:
+        if head[i] >= 0:
+            continue
+        head[i] = i
+        core[i] = True
+        members = target[starts[i]:starts[i + 1]]
+        free = head[members] < 0
+        head[members[free]] = i
+        core[members[free]] = iou[starts[i]:starts[i + 1]][free] > iou_threshold
+
+    heads = order[head[order] == order]
+    cluster = np.empty(n, dtype=np.intp)
+    cluster[heads] = np.arange(len(heads))
+    cluster = cluster[head]
+
+    weights = np.where(core, scores, 0)
+    total = np.bincount(cluster, weights, minlength=len(heads))
+    fused = np.stack([np.bincount(cluster, weights * boxes[:, k], minlength=len(heads)) / total
+                      for k in range(4)], axis=1).astype(np.float32)
+    fused_scores = (total / np.bincount(cluster, core, minlength=len(heads))).astype(np.float32)
+
+    # Fragments only grow the fused box
+    fragment = ~core
+    np.minimum.at(fused[:, 0], cluster[fragment], boxes[fragment, 0])
+    np.minimum.at(fused[:, 1], cluster[fragment], boxes[fragment, 1])
+    np.maximum.at(fused[:, 2], cluster[fragment], boxes[fragment, 2])
+    np.maximum.at(fused[:, 3], cluster[fragment], boxes[fragment, 3])
+    return fused, fused_scores, heads
@@ -0,0 +1,96 @@
+import json
+import os
+
+# Saved by tools/autotune.py, from the cheapest to the most thorough
+PRESET_NAMES = ("fast", "balanced", "accurate")
+
+
+def load_presets(path):
+    """
+    Reads the tiling presets written by tools/autotune.py.
+
+    Returns:
+        Dict[str, dict]: detect() options by preset name, empty when the file
+            doesn't exist yet.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        presets = json.load(file).get("presets", {})
+    return {name: dict(preset["options"]) for name, preset in presets.items()}
+
+
+def save_presets(path, presets, pareto=(), **info):
+    """
+    Writes presets with their measured metrics and the Pareto front they were chosen from.
+
+    Args:
+        path (str): The presets JSON file.
+        presets (Dict[str, dict]): Profiles by preset name, each with the
+            "options" it applies and its metrics.
+        pareto (Sequence[dict], optional): The Pareto-optimal profiles.
+        **info: Extra top-level fields, e.g. the model and labels used.
+    """
+    with open(path, 'w') as file:
+        json.dump(dict(info, presets=presets, pareto=list(pareto)), file, indent=4)
+
+
+def apply_preset(options, presets, name):
+    """
+    Overrides detect() options with a preset's.
+
+    Args:
+        options (dict): The options from settings or arguments.
+        presets (Dict[str, dict]): Presets from load_presets().
+        name (str): The preset, or "" to keep the options as they are.
+
+    Returns:
+        dict: A new options dict.
+    """
+    if not name:
+        return dict(options)
+    if name not in presets:
+        raise ValueError(f"Unknown tiling preset: {name}")
+    return dict(options, **presets[name])
+
+
+def pareto_front(profiles, metric="map"):
+    """
+    Keeps the profiles that no other profile beats on both latency and the metric.
+
+    Args:
+        profiles (Sequence[dict]): Profiles with "ms" and the metric.
+        metric (str, optional): The accuracy metric. Defaults to "map".
+
+    Returns:
+        List[dict]: The Pareto-optimal profiles from the fastest to the slowest.
+    """
+    front = []
+    # Fastest first; on equal latency, the most accurate
+    for profile in sorted(profiles, key=lambda p: (p["ms"], -p[metric])):
+        if not front or profile[metric] > front[-1][metric]:
+            front.append(profile)
+    return front
+
+
+def choose_presets(front, metric="map", fast_tolerance=0.10, balanced_tolerance=0.02):
+    """
+    Picks the fast, balanced and accurate profiles from a Pareto front.
+
+    "accurate" is the best profile, "balanced" the fastest one within
+    balanced_tolerance of its metric and "fast" the fastest one within
+    fast_tolerance. The tolerances are fractions of the best metric.
+
+    Returns:
+        Dict[str, dict]: The profiles by preset name.
+    """
+    if not front:
+        return {}
+    best = max(front, key=lambda p: p[metric])
+
+    def fastest_within(tolerance):
+        return next(p for p in front if p[metric] >= best[metric] * (1 - tolerance))
+
+    return {"fast": fastest_within(fast_tolerance),
+            "balanced": fastest_within(balanced_tolerance),
+            "accurate": fastest_within(0.0)}
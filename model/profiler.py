@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+_local = threading.local()
+
+
+class NullProfiler:
+    """A profiler that records nothing; used whenever profiling is off."""
+
+    enabled = False
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def count(self, name, n=1):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler:
+    """
+    Collects per-stage wall-clock times and counters of a detection run.
+
+    Stages are timed with time.perf_counter() and may be recorded from several
+    threads, e.g. interpreter pool workers. Every stage also becomes an event
+    that can be exported as a Chrome trace (chrome://tracing, Perfetto).
+
+    With trace_memory the largest amount of memory newly allocated by a single
+    call of each stage is recorded as well, using tracemalloc. This only makes
+    sense for stages that neither nest nor overlap, and tracing slows Python
+    allocations down, so it's meant for benchmarks rather than timing runs.
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory=False) -> None:
+        self.trace_memory = trace_memory
+        self.stages = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.allocated = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.events = []
+        self.origin = time.perf_counter()
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Times the enclosed block under the given stage name."""
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.__lock:
+                if tracing:
+                    grown = tracemalloc.get_traced_memory()[1] - base
+                    self.allocated[name] = max(self.allocated[name], grown)
+                self.stages[name] += end - start
+                self.calls[name] += 1
+                self.events.append((name, start, end, threading.get_ident()))
+
+    def count(self, name, n=1):
+        """Adds n to a counter such as tiles or invokes."""
+        with self.__lock:
+            self.counters[name] += n
+
+    def report(self):
+        """
+        Returns the collected statistics.
+
+        Returns:
+            Dict[str, Any]: "total_ms", per-stage "stages" with "ms" and "calls",
+                and the "counters". With trace_memory stages also get "alloc_kb".
+        """
+        with self.__lock:
+            total = (max(end for _, _, end, _ in self.events) - self.origin) if self.events else 0.0
+            stages = {name: {"ms": round(seconds * 1000, 3), "calls": self.calls[name]}
+                      for name, seconds in self.stages.items()}
+            for name, size in self.allocated.items():
+                stages[name]["alloc_kb"] = round(size / 1024, 1)
+            return {
+                "total_ms": round(total * 1000, 3),
+                "stages": stages,
+                "counters": dict(self.counters)
+            }
+
+    def to_json(self, filename):
+        with open(filename, 'w') as file:
+            json.dump(self.report(), file, indent=4)
+
+    def to_chrome_trace(self, filename):
+        """Writes the stage events in the Chrome trace event format."""
+        pid = os.getpid()
+        with self.__lock:
+            events = [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                       "ts": round((start - self.origin) * 1e6, 1),
+                       "dur": round((end - start) * 1e6, 1)}
+                      for name, start, end, tid in self.events]
+        with open(filename, 'w') as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def current():
+    """Returns the profiler active in this thread, or the null profiler."""
+    return getattr(_local, "profiler", NULL_PROFILER)
+
+
+@contextmanager
+def profiling(profiler):
+    """Makes the profiler active in the calling thread for the enclosed block."""
+    previous = current()
+    _local.profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _local.profiler = previous
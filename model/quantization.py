@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def is_quantized(detail):
+    """True for integer tensors with quantization parameters."""
+    scale, _ = detail['quantization']
+    return np.issubdtype(detail['dtype'], np.integer) and scale != 0
+
+
+def input_lut(detail):
+    """
+    Builds a 256-entry table mapping 8-bit pixels to the model's input values.
+
+    The float pipeline feeds pixel / 255, so a quantized input gets
+    round(pixel / 255 / scale + zero_point), clipped to the input dtype.
+
+    Args:
+        detail (dict): The interpreter's input details.
+
+    Returns:
+        Optional[np.ndarray]: The table, or None when the pixels can be fed
+            unchanged (scale of 1/255 and zero point 0).
+    """
+    scale, zero_point = detail['quantization']
+    dtype = detail['dtype']
+    if abs(scale * 255 - 1) < 1e-6 and zero_point == 0:
+        return None
+
+    info = np.iinfo(dtype)
+    pixels = np.arange(256, dtype=np.float64)
+    return np.clip(np.round(pixels / 255 / scale + zero_point), info.min, info.max).astype(dtype)
+
+
+def dequantize(values, detail):
+    """Converts a quantized output tensor to float32, leaving float tensors as they are."""
+    if not is_quantized(detail):
+        return values
+    scale, zero_point = detail['quantization']
+    return (values.astype(np.float32) - zero_point) * np.float32(scale)
@@ -0,0 +1,168 @@
+import numpy as np
+
+
+def grid_tiles(width, height, window_size, step_x, step_y):
+    """
+    Lays square windows over the image on a uniform grid.
+
+    Args:
+        width (int): The image width.
+        height (int): The image height.
+        window_size (int): The window side in pixels.
+        step_x (int): The horizontal stride.
+        step_y (int): The vertical stride.
+
+    Returns:
+        np.ndarray: An (n, 4) int array of (x0, y0, x1, y1) windows in row-major
+            order. Windows may extend past the right and bottom image borders.
+    """
+    xs = np.arange(0, width - 1, max(int(step_x), 1))
+    ys = np.arange(0, height - 1, max(int(step_y), 1))
+    x0, y0 = np.meshgrid(xs, ys)
+    x0, y0 = x0.ravel(), y0.ravel()
+    return np.stack([x0, y0, x0 + window_size, y0 + window_size], axis=1)
+
+
+def _tile_starts(length, window_size, step):
+    last = max(length - window_size, 0)
+    starts = np.arange(0, last + 1, max(int(step), 1))
+    if starts[-1] != last:
+        starts = np.append(starts, last)
+    return starts
+
+
+def covering_tiles(width, height, window_size, step):
+    """
+    Lays square windows that stay inside the image and cover all of it.
+
+    Unlike grid_tiles(), the last row and column are moved back to end flush
+    with the image border instead of running past it, so no window is cut
+    short. An image smaller than the window gets one window along that axis.
+
+    Args:
+        width (int): The image width.
+        height (int): The image height.
+        window_size (int): The window side in pixels.
+        step (int): The stride along both axes.
+
+    Returns:
+        np.ndarray: An (n, 4) int array of (x0, y0, x1, y1) windows in row-major order.
+    """
+    x0, y0 = np.meshgrid(_tile_starts(width, window_size, step), _tile_starts(height, window_size, step))
+    x0, y0 = x0.ravel(), y0.ravel()
+    return np.stack([x0, y0, x0 + window_size, y0 + window_size], axis=1)
+
+
+def tile_priority(tiles, boxes, scores, margin_x=0, margin_y=0):
+    """
+    Scores every tile by the likely objects it covers or neighbours.
+
+    A tile gets the highest score of the boxes it intersects once each box is
+    grown by the margin on every side; tiles that touch nothing get zero.
+
+    Args:
+        tiles (np.ndarray): An (n, 4) array of (x0, y0, x1, y1) tiles.
+        boxes (np.ndarray): An (m, 4) array of likely object boxes, usually the
+            low-threshold detections of the coarse pass.
+        scores (np.ndarray): An (m,) array of box scores.
+        margin_x (float, optional): Horizontal neighbourhood in pixels. Defaults to 0.
+        margin_y (float, optional): Vertical neighbourhood in pixels. Defaults to 0.
+
+    Returns:
+        np.ndarray: An (n,) float32 array of tile priorities.
+    """
+    tiles = np.asarray(tiles, dtype=np.float32)
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    if len(tiles) == 0 or len(boxes) == 0:
+        return np.zeros(len(tiles), dtype=np.float32)
+
+    grown = boxes + np.array([-margin_x, -margin_y, margin_x, margin_y], dtype=np.float32)
+    hit = ((tiles[:, None, 0] < grown[None, :, 2]) & (tiles[:, None, 2] > grown[None, :, 0]) &
+           (tiles[:, None, 1] < grown[None, :, 3]) & (tiles[:, None, 3] > grown[None, :, 1]))
+    return np.where(hit, np.asarray(scores, dtype=np.float32)[None, :], 0).max(axis=1)
+
+
+def select_tiles(tiles, priority, max_tiles=0):
+    """
+    Keeps the tiles with a positive priority, optionally capped by a budget.
+
+    Args:
+        tiles (np.ndarray): An (n, 4) array of tiles.
+        priority (np.ndarray): An (n,) array of tile priorities.
+        max_tiles (int, optional): The most tiles to keep, highest priority first.
+            Zero means no limit. Defaults to 0.
+
+    Returns:
+        np.ndarray: The selected tiles in their original order.
+    """
+    selected = np.flatnonzero(priority > 0)
+    if max_tiles and len(selected) > max_tiles:
+        best = np.argsort(-priority[selected], kind="stable")[:max_tiles]
+        selected = np.sort(selected[best])
+    return tiles[selected]
+
+
+def plan_adaptive_tiles(tiles, boxes, scores, margin_x=0, margin_y=0, max_tiles=0):
+    """Schedules only the tiles that cover or neighbour the given boxes."""
+    return select_tiles(tiles, tile_priority(tiles, boxes, scores, margin_x, margin_y), max_tiles)
+
+
+def parse_roi(value):
+    """
+    Parses an "x0,y0,x1,y1" region of interest given as fractions of the image size.
+
+    Raises:
+        ValueError: If the value isn't four numbers or the region is empty or
+            outside the image.
+    """
+    try:
+        x0, y0, x1, y1 = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError(f"Expected x0,y0,x1,y1 fractions, got {value!r}")
+    if not (0 <= x0 < x1 <= 1 and 0 <= y0 < y1 <= 1):
+        raise ValueError(f"ROI {value!r} must satisfy 0 <= x0 < x1 <= 1 and 0 <= y0 < y1 <= 1")
+    return (x0, y0, x1, y1)
+
+
+def roi_pixels(rois, width, height):
+    """
+    Converts fractional (x0, y0, x1, y1) regions of interest to pixels.
+
+    Args:
+        rois (Sequence[tuple]): Regions as fractions of the image size, 0 to 1.
+        width (int): The image width.
+        height (int): The image height.
+
+    Returns:
+        np.ndarray: An (n, 4) float32 array of pixel regions.
+    """
+    rois = np.clip(np.asarray(rois, dtype=np.float32).reshape(-1, 4), 0, 1)
+    return rois * np.array([width, height, width, height], dtype=np.float32)
+
+
+def restrict_to_rois(tiles, rois, width, height):
+    """
+    Keeps the tiles that intersect at least one region of interest.
+
+    Args:
+        tiles (np.ndarray): An (n, 4) array of (x0, y0, x1, y1) tiles.
+        rois (Sequence[tuple]): Fractional regions of interest; none keeps every tile.
+        width (int): The image width.
+        height (int): The image height.
+
+    Returns:
+        np.ndarray: The intersecting tiles in their original order.
+    """
+    if rois is None or len(rois) == 0 or len(tiles) == 0:
+        return tiles
+    regions = roi_pixels(rois, width, height)
+    hit = ((tiles[:, None, 0] < regions[None, :, 2]) & (tiles[:, None, 2] > regions[None, :, 0]) &
+           (tiles[:, None, 1] < regions[None, :, 3]) & (tiles[:, None, 3] > regions[None, :, 1]))
+    return tiles[hit.any(axis=1)]
+
+
+def roi_bounds(rois):
+    """The fractional (x0, y0, x1, y1) bounding box of all regions of interest."""
+    rois = np.clip(np.asarray(rois, dtype=np.float32).reshape(-1, 4), 0, 1)
+    return (float(rois[:, 0].min()), float(rois[:, 1].min()),
+            float(rois[:, 2].max()), float(rois[:, 3].max()))
@@ -0,0 +1,132 @@
+import numpy as np
+
+from .detections import Detections
+from .nms import box_iou
+
+
+class BoxTracker:
+    """
+    A lightweight IoU/centroid tracker that carries boxes between detection frames.
+
+    On a detection frame, update() matches new detections to the tracks of
+    the same class, first by IoU and then by centroid distance for objects
+    that moved too far to overlap. Between detection frames predict() moves
+    every track by its per-frame velocity. Tracks that go unmatched for more
+    than max_misses detection frames are dropped.
+
+    Attributes:
+        iou_threshold (float): The IoU above which a detection continues a track.
+        max_distance (float): The largest centroid distance, relative to the
+            track's box size, at which a non-overlapping detection still continues it.
+        max_misses (int): Detection frames a track survives without a match.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_distance=0.5, max_misses=1) -> None:
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+        self.__next_id = 0
+        self.reset()
+
+    def reset(self):
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.velocity = np.empty((0, 4), dtype=np.float32)
+        self.scores = np.empty(0, dtype=np.float32)
+        self.class_ids = np.empty(0, dtype=np.int16)
+        self.track_ids = np.empty(0, dtype=np.int64)
+        self.__misses = np.empty(0, dtype=np.int32)
+        # Frames since each track was last matched, to turn displacement into velocity
+        self.__steps = np.empty(0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.track_ids)
+
+    def detections(self):
+        """Returns the current tracks as Detections, aligned with track_ids."""
+        return Detections(self.boxes, self.scores, self.class_ids)
+
+    def predict(self):
+        """Advances every track by one frame and returns the moved boxes."""
+        self.boxes = self.boxes + self.velocity
+        self.__steps += 1
+        return self.detections()
+
+    def update(self, detections):
+        """
+        Matches the detections of a new frame to the tracks.
+
+        Args:
+            detections (Detections): The detections of the frame after NMS.
+
+        Returns:
+            Detections: The tracks after the update, aligned with track_ids.
+        """
+        steps = self.__steps + 1
+        previous = self.boxes - self.velocity * self.__steps[:, None]
+        track_idx, det_idx = self.__match(detections)
+
+        # Matched tracks jump to the detection and learn their per-frame velocity.
+        # Fresh arrays, since earlier results share them and may still be drawn
+        new_boxes = detections.boxes[det_idx]
+        velocity = (new_boxes - previous[track_idx]) / steps[track_idx, None]
+        self.boxes, self.velocity, self.scores = self.boxes.copy(), self.velocity.copy(), self.scores.copy()
+        self.boxes[track_idx] = new_boxes
+        self.velocity[track_idx] = velocity
+        self.scores[track_idx] = detections.scores[det_idx]
+        self.__misses[track_idx] = 0
+        self.__misses[np.setdiff1d(np.arange(len(self)), track_idx)] += 1
+        self.__steps[:] = 0
+
+        alive = self.__misses <= self.max_misses
+        self.__select(alive)
+
+        fresh = np.setdiff1d(np.arange(len(detections)), det_idx)
+        ids = np.arange(self.__next_id, self.__next_id + len(fresh))
+        self.__next_id += len(fresh)
+        self.boxes = np.concatenate([self.boxes, detections.boxes[fresh]])
+        self.velocity = np.concatenate([self.velocity, np.zeros((len(fresh), 4), dtype=np.float32)])
+        self.scores = np.concatenate([self.scores, detections.scores[fresh]])
+        self.class_ids = np.concatenate([self.class_ids, detections.class_ids[fresh]])
+        self.track_ids = np.concatenate([self.track_ids, ids])
+        self.__misses = np.concatenate([self.__misses, np.zeros(len(fresh), dtype=np.int32)])
+        self.__steps = np.concatenate([self.__steps, np.zeros(len(fresh), dtype=np.int32)])
+        return self.detections()
+
+    def __select(self, mask):
+        self.boxes = self.boxes[mask]
+        self.velocity = self.velocity[mask]
+        self.scores = self.scores[mask]
+        self.class_ids = self.class_ids[mask]
+        self.track_ids = self.track_ids[mask]
+        self.__misses = self.__misses[mask]
+        self.__steps = self.__steps[mask]
+
+    def __match(self, detections):
+        """Greedily pairs tracks and detections, best IoU first, then nearest centroid."""
+        if len(self) == 0 or len(detections) == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+        same_class = self.class_ids[:, None] == detections.class_ids[None, :]
+        iou = np.where(same_class, box_iou(self.boxes, detections.boxes), 0)
+
+        centers = (self.boxes[:, :2] + self.boxes[:, 2:]) / 2
+        det_centers = (detections.boxes[:, :2] + detections.boxes[:, 2:]) / 2
+        size = np.maximum((self.boxes[:, 2:] - self.boxes[:, :2]).mean(axis=1), 1)
+        distance = np.linalg.norm(centers[:, None] - det_centers[None, :], axis=2) / size[:, None]
+        distance = np.where(same_class, distance, np.inf)
+
+        track_idx, det_idx = [], []
+        free_tracks = np.ones(len(self), dtype=bool)
+        free_dets = np.ones(len(detections), dtype=bool)
+        for cost, allowed in ((-iou, iou > self.iou_threshold),
+                              (distance, distance <= self.max_distance)):
+            # Only the gated pairs between free tracks and detections are ordered and walked
+            t, d = np.nonzero(allowed & free_tracks[:, None] & free_dets[None, :])
+            order = np.argsort(cost[t, d], kind="stable")
+            for t, d in zip(t[order].tolist(), d[order].tolist()):
+                if free_tracks[t] and free_dets[d]:
+                    free_tracks[t] = free_dets[d] = False
+                    track_idx.append(t)
+                    det_idx.append(d)
+
+        return np.array(track_idx, dtype=np.intp), np.array(det_idx, dtype=np.intp)
@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from .tracker import BoxTracker
+
+
+class FrameQueue:
+    """
+    A bounded queue of frames that drops the oldest frame when it's full.
+
+    The consumer always gets the freshest frames, so a slow detector falls
+    behind by at most maxsize frames instead of an ever-growing backlog.
+
+    Attributes:
+        maxsize (int): The most frames kept.
+        dropped (int): Frames dropped so far to make room for newer ones.
+    """
+
+    def __init__(self, maxsize=2) -> None:
+        self.maxsize = max(1, int(maxsize))
+        self.dropped = 0
+        self.__frames = deque()
+        self.__closed = False
+        self.__condition = threading.Condition()
+
+    def put(self, item):
+        """Adds an item, dropping the oldest queued item when the queue is full."""
+        with self.__condition:
+            if len(self.__frames) >= self.maxsize:
+                self.__frames.popleft()
+                self.dropped += 1
+            self.__frames.append(item)
+            self.__condition.notify()
+
+    def get(self, timeout=None):
+        """Returns the oldest queued item, or None once the queue is closed and empty."""
+        with self.__condition:
+            if not self.__condition.wait_for(lambda: self.__frames or self.__closed, timeout):
+                return None
+            return self.__frames.popleft() if self.__frames else None
+
+    @property
+    def closed(self):
+        return self.__closed
+
+    def close(self):
+        """Wakes up consumers; get() returns None once the remaining items are taken."""
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+
+class VideoStream:
+    """
+    Reads frames from a video file or a camera in a background thread.
+
+    Frames go into a FrameQueue, so under load stale frames are dropped
+    rather than delayed. Files are read at their own frame rate, like a
+    camera, unless realtime is False.
+
+    Attributes:
+        source (Union[str, int]): A video file path or a camera index.
+        queue (FrameQueue): The (frame index, BGR frame) queue.
+        frames_read (int): Frames read from the source so far.
+    """
+
+    def __init__(self, source, queue_size=2, realtime=True) -> None:
+        self.source = source
+        self.queue = FrameQueue(queue_size)
+        self.frames_read = 0
+        self.realtime = realtime
+        self.__capture = cv2.VideoCapture(source)
+        if not self.__capture.isOpened():
+            raise ValueError(f"Could not open video source: {source}")
+        self.fps = self.__capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__read_loop, daemon=True)
+
+    @property
+    def is_camera(self):
+        return isinstance(self.source, int)
+
+    def start(self):
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        self.__thread.join()
+
+    def __read_loop(self):
+        start = time.perf_counter()
+        # A camera sets its own pace; a file is read at playback speed
+        pace = self.realtime and not self.is_camera and self.fps > 0
+        try:
+            while not self.__stop.is_set():
+                ok, frame = self.__capture.read()
+                if not ok:
+                    break
+                if pace:
+                    delay = start + self.frames_read / self.fps - time.perf_counter()
+                    if delay > 0:
+                        self.__stop.wait(delay)
+                self.queue.put((self.frames_read, frame))
+                self.frames_read += 1
+        finally:
+            self.__capture.release()
+            self.queue.close()
+
+
+class StreamStats:
+    """Sustained FPS over a sliding time window and the frame drop rate."""
+
+    def __init__(self, window=2.0) -> None:
+        self.window = window
+        self.processed = 0
+        self.__times = deque()
+
+    def tick(self):
+        now = time.perf_counter()
+        self.processed += 1
+        self.__times.append(now)
+        while now - self.__times[0] > self.window:
+            self.__times.popleft()
+
+    @property
+    def fps(self):
+        if len(self.__times) < 2:
+            return 0.0
+        return (len(self.__times) - 1) / (self.__times[-1] - self.__times[0])
+
+    def report(self, stream):
+        """Returns a dict of fps, processed, read, dropped and drop_rate."""
+        read = stream.frames_read
+        return {
+            "fps": round(self.fps, 1),
+            "processed": self.processed,
+            "read": read,
+            "dropped": stream.queue.dropped,
+            "drop_rate": round(stream.queue.dropped / read, 3) if read else 0.0,
+        }
+
+
+class StreamDetector:
+    """
+    Runs the model on every n-th frame and tracks boxes in between.
+
+    Args:
+        model (TFLiteModel): The detection model.
+        cutoff (float): The detection cutoff.
+        detect_every (int, optional): Run the model on one frame in this many.
+            Defaults to 5.
+        tracker (BoxTracker, optional): The tracker. Defaults to a new one.
+        **options: Options for TFLiteModel.detect().
+    """
+
+    def __init__(self, model, cutoff, detect_every=5, tracker=None, **options) -> None:
+        self.model = model
+        self.cutoff = cutoff
+        self.detect_every = max(1, int(detect_every))
+        self.tracker = tracker or BoxTracker()
+        self.options = options
+        self.__count = 0
+
+    def process(self, frame):
+        """
+        Returns the tracked detections of the next frame.
+
+        Returns:
+            Tuple[Detections, bool]: The detections and whether the model ran.
+        """
+        detect = self.__count % self.detect_every == 0
+        self.__count += 1
+        if detect:
+            return self.tracker.update(self.model.detect(frame, self.cutoff, **self.options)), True
+        return self.tracker.predict(), False
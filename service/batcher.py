@@ -0,0 +1,126 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+import numpy as np
+
+from model.detections import Detections
+
+
+class TileBatcher:
+    """
+    Coalesces tiles from concurrent requests into shared interpreter batches.
+
+    Installed as the model's tile_runner, it turns every request's tiles into
+    queue entries. A single batching thread waits for the first tile, then for
+    more tiles until the batch is full or max_latency has passed since that
+    first tile, and submits the batch to the model's interpreter pool. The
+    tile queue is bounded, so request threads block when the interpreters
+    fall behind.
+
+    Attributes:
+        model (TFLiteModel): The model whose pool runs the batches.
+        max_latency (float): The longest a tile waits for a batch to fill, in seconds.
+        batches (int): Batches run so far.
+        tiles (int): Tiles run so far.
+    """
+
+    def __init__(self, model, max_latency=0.005, max_queued_tiles=256) -> None:
+        self.model = model
+        self.max_latency = max_latency
+        self.batch_size = model.batch_size
+        self.batches = 0
+        self.tiles = 0
+        self.__queue = Queue(max_queued_tiles)
+
+        _, height, width, channels = model.input_details[0]['shape']
+        # A buffer is only refilled once its batch is done, so at most this many batches are in flight
+        self.__free = Queue()
+        for _ in range(2 * model.pool.num_workers):
+            self.__free.put(np.zeros((self.batch_size, height, width, channels), dtype=model.input_dtype))
+
+        self.__thread = threading.Thread(target=self.__batch_loop, daemon=True)
+        self.__thread.start()
+        model.tile_runner = self
+
+    @property
+    def queue_depth(self):
+        return self.__queue.qsize()
+
+    @property
+    def fill_ratio(self):
+        """The mean share of each batch filled with tiles."""
+        return self.tiles / (self.batches * self.batch_size) if self.batches else 0.0
+
+    def __call__(self, image, cutoff, regions):
+        """Runs the tiles of one image and waits for their detections."""
+        futures = []
+        for region in regions:
+            future = Future()
+            self.__queue.put((image, tuple(region), cutoff, future))
+            futures.append(future)
+        return Detections.concatenate([future.result() for future in futures])
+
+    def close(self):
+        """Finishes the queued tiles and stops the batching thread."""
+        self.__queue.put(None)
+        self.__thread.join()
+        if self.model.tile_runner is self:
+            self.model.tile_runner = None
+
+    def __batch_loop(self):
+        while True:
+            first = self.__queue.get()
+            if first is None:
+                return
+            items = [first]
+            deadline = time.perf_counter() + self.max_latency
+            stop = False
+            while len(items) < self.batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = self.__queue.get(timeout=timeout) if timeout > 0 else self.__queue.get_nowait()
+                except Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                items.append(item)
+
+            self.__submit(items)
+            if stop:
+                return
+
+    def __submit(self, items):
+        buffer = self.__free.get()
+        regions = []
+        try:
+            for i, (image, (x0, y0, x1, y1), _, _) in enumerate(items):
+                tile = image[y0:y1, x0:x1]
+                self.model.fill_tile(tile, buffer[i])
+                # The slice may be cut short at the image border
+                regions.append((x0, y0, x0 + tile.shape[1], y0 + tile.shape[0]))
+            future = self.model.pool.submit(buffer, len(items))
+        except Exception as e:
+            self.__free.put(buffer)
+            for item in items:
+                item[3].set_exception(e)
+            return
+
+        self.batches += 1
+        self.tiles += len(items)
+        future.add_done_callback(lambda done: self.__finish(done, items, regions, buffer))
+
+    def __finish(self, done, items, regions, buffer):
+        self.__free.put(buffer)
+        try:
+            scores, boxes, classes = done.result()
+        except Exception as e:
+            for item in items:
+                item[3].set_exception(e)
+            return
+
+        for i, (_, _, cutoff, future) in enumerate(items):
+            future.set_result(self.model.decode_batch(scores[i:i + 1], boxes[i:i + 1], classes[i:i + 1],
+                                                      regions[i:i + 1], cutoff))
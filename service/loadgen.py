@@ -0,0 +1,96 @@
+"""
+Load generator for the local detection service.
+
+Keeps a fixed number of clients posting the same image over keep-alive
+connections and prints throughput and latency for each concurrency level,
+followed by the server's own metrics.
+
+Usage:
+    python -m service.loadgen shelf.jpg --url http://127.0.0.1:8765 --concurrency 1 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def request(reader, writer, method, path, body=b""):
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, path, body, deadline, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, "POST", path, body)
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run_level(host, port, path, body, concurrency, duration):
+    latencies, statuses = [], {}
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*[client(host, port, path, body, deadline, latencies, statuses)
+                           for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    return {
+        "concurrency": concurrency,
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "statuses": statuses,
+    }
+
+
+async def run(args):
+    url = urlsplit(args.url)
+    with open(args.image, 'rb') as file:
+        body = file.read()
+    path = f"/detect?cutoff={args.cutoff}"
+
+    print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}  statuses")
+    for concurrency in args.concurrency:
+        result = await run_level(url.hostname, url.port, path, body, concurrency, args.duration)
+        print(f"{concurrency:>8} {result['requests_per_sec']:>8.1f} {result['p50_ms']:>8.1f} "
+              f"{result['p99_ms']:>8.1f}  {result['statuses']}")
+
+    reader, writer = await asyncio.open_connection(url.hostname, url.port)
+    _, metrics = await request(reader, writer, "GET", "/metrics")
+    writer.close()
+    print("Server metrics:", json.dumps(metrics))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image", help="Image file to post")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--cutoff", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
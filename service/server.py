@@ -0,0 +1,280 @@
+"""
+Local HTTP detection service.
+
+Keeps one model loaded and warm and serves detection requests from other
+tools, with tiles from concurrent requests sharing interpreter batches.
+
+Endpoints:
+    POST /detect   The body is an encoded image (JPEG, PNG, ...). Query
+                   parameters: cutoff, iou_threshold, soft_nms, box_fusion,
+                   tiling_mode, pyramid_levels, pyramid_overlap, window_scale,
+                   stride_scale, adaptive_tiling, max_tiles, rois.
+    GET  /metrics  Latency percentiles, queue depth and batch fill ratio.
+    GET  /health
+
+Usage:
+    python -m service --model resources/detect_mobilenet_pack/model.tflite \\
+        --class-names resources/detect_mobilenet_pack/class_names.json --port 8765
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+
+import cv2
+import numpy as np
+
+from model.model_registry import registry
+from model.presets import PRESET_NAMES, load_presets
+from model.tile_planner import parse_roi
+from .batcher import TileBatcher
+
+# Query parameter -> parser for the options of TFLiteModel.detect()
+DETECT_PARAMS = {
+    "iou_threshold": float,
+    "soft_nms": lambda value: value.lower() in ("1", "true", "yes"),
+    "box_fusion": lambda value: value.lower() in ("1", "true", "yes"),
+    "tiling_mode": str,
+    "pyramid_levels": int,
+    "pyramid_overlap": float,
+    "window_scale": float,
+    "stride_scale": float,
+    "adaptive_tiling": lambda value: value.lower() in ("1", "true", "yes"),
+    "max_tiles": int,
+    # "x0,y0,x1,y1;x0,y0,x1,y1" regions of interest as image fractions
+    "rois": lambda value: [parse_roi(roi) for roi in value.split(";")],
+}
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ServiceMetrics:
+    """Request counters and the latencies of the most recent requests."""
+
+    def __init__(self, window=1000) -> None:
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def record(self, seconds):
+        self.requests += 1
+        self.latencies.append(seconds)
+
+    def percentile(self, q):
+        """The q-th percentile latency in milliseconds."""
+        if not self.latencies:
+            return 0.0
+        if len(self.latencies) == 1:
+            return self.latencies[0] * 1000
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[q - 1] * 1000
+
+    def report(self, batcher, in_flight):
+        return {
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "in_flight": in_flight,
+            "p50_ms": round(self.percentile(50), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "queue_depth": batcher.queue_depth,
+            "batches": batcher.batches,
+            "tiles": batcher.tiles,
+            "batch_fill_ratio": round(batcher.fill_ratio, 3),
+        }
+
+
+class DetectionService:
+    """
+    Serves TFLiteModel.detect() over HTTP/1.1 with asyncio.
+
+    Requests are decoded and detected in a thread pool. At most max_pending
+    requests are admitted at once; beyond that the service answers 503, so
+    a burst can't grow an unbounded backlog.
+
+    Args:
+        model (TFLiteModel): A loaded model; its tiles are routed through a TileBatcher.
+        class_name (Dict[int, str]): Class names by id.
+        cutoff (float, optional): The default detection cutoff. Defaults to 0.5.
+        max_latency (float, optional): Seconds a tile waits for a batch to fill.
+            Defaults to 0.005.
+        max_pending (int, optional): The most requests admitted at once. Defaults to 64.
+        max_queued_tiles (int, optional): The bound of the tile queue. Defaults to 256.
+        num_request_threads (int, optional): Threads decoding and detecting
+            requests. Defaults to 16.
+        **options: Default options for TFLiteModel.detect().
+    """
+
+    def __init__(self, model, class_name, cutoff=0.5, max_latency=0.005, max_pending=64,
+                 max_queued_tiles=256, num_request_threads=16, **options) -> None:
+        self.model = model
+        self.class_name = class_name
+        self.cutoff = cutoff
+        self.options = options
+        self.max_pending = max_pending
+        self.metrics = ServiceMetrics()
+        self.batcher = TileBatcher(model, max_latency, max_queued_tiles)
+        self.__executor = ThreadPoolExecutor(num_request_threads)
+        self.__in_flight = 0
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.__handle_connection, host, port)
+        print(f"Serving detections on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.__executor.shutdown()
+        self.batcher.close()
+
+    async def __handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await self.__respond(writer, 413, {"error": "Image too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.__route(method, target, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.__respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def __respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode() + b"\r\n" + body)
+        await writer.drain()
+
+    async def __route(self, method, target, body):
+        url = urlsplit(target)
+        if method == "GET" and url.path == "/health":
+            return 200, {"status": "ok"}
+        if method == "GET" and url.path == "/metrics":
+            return 200, self.metrics.report(self.batcher, self.__in_flight)
+        if method == "POST" and url.path == "/detect":
+            return await self.__detect_request(body, dict(parse_qsl(url.query)))
+        return 404, {"error": f"No route for {method} {url.path}"}
+
+    async def __detect_request(self, body, query):
+        if self.__in_flight >= self.max_pending:
+            self.metrics.rejected += 1
+            return 503, {"error": "Too many pending requests"}
+
+        try:
+            cutoff = float(query.pop("cutoff", self.cutoff))
+            options = dict(self.options)
+            options.update({name: DETECT_PARAMS[name](value)
+                            for name, value in query.items() if name in DETECT_PARAMS})
+        except ValueError as e:
+            return 400, {"error": str(e)}
+
+        self.__in_flight += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.__executor, self.__detect, body, cutoff, options)
+        except ValueError as e:
+            self.metrics.errors += 1
+            return 400, {"error": str(e)}
+        except Exception as e:
+            self.metrics.errors += 1
+            return 500, {"error": str(e)}
+        finally:
+            self.__in_flight -= 1
+
+        seconds = time.perf_counter() - start
+        self.metrics.record(seconds)
+        result["ms"] = round(seconds * 1000, 2)
+        return 200, result
+
+    def __detect(self, body, cutoff, options):
+        image = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("The request body is not a readable image")
+        detections = self.model.detect(image, cutoff, **options)
+        height, width = image.shape[:2]
+        return {
+            "width": width,
+            "height": height,
+            "detections": [{"class": name, "score": round(score, 4), "box": box}
+                           for score, name, *box in detections.to_list(self.class_name)],
+        }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m service", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", required=True, help="Path to the .tflite model")
+    parser.add_argument("--class-names", required=True, help="Path to the class names JSON file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cutoff", type=float, default=0.5)
+    parser.add_argument("--preset", choices=PRESET_NAMES,
+                        help="Default tiling and IoU options tuned by tools.autotune")
+    parser.add_argument("--presets-file", default="tiling_presets.json")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--num-workers", type=int, default=1, help="Interpreters running batches in parallel")
+    parser.add_argument("--num-threads", type=int, default=0, help="Threads per interpreter (0 = auto)")
+    parser.add_argument("--rgb-input", action="store_true", help="The model takes RGB rather than BGR tiles")
+    parser.add_argument("--max-latency-ms", type=float, default=5.0,
+                        help="How long a tile waits for other requests' tiles to fill a batch")
+    parser.add_argument("--max-pending", type=int, default=64, help="Requests admitted before answering 503")
+    parser.add_argument("--max-queued-tiles", type=int, default=256)
+    parser.add_argument("--request-threads", type=int, default=16)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    presets = load_presets(args.presets_file)
+    if args.preset and args.preset not in presets:
+        parser.error(f"No preset {args.preset!r} in {args.presets_file}, run python -m tools.autotune first")
+    with open(args.class_names, 'r') as file:
+        class_name = {int(k): v for k, v in json.load(file).items()}
+
+    # The registry loads and warms the model up before the first request
+    model = registry.acquire(args.model, args.batch_size, args.num_workers, args.num_threads or None,
+                             args.rgb_input)
+    service = DetectionService(model, class_name, args.cutoff, args.max_latency_ms / 1000,
+                               args.max_pending, args.max_queued_tiles, args.request_threads,
+                               **presets.get(args.preset, {}))
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        registry.release(model)
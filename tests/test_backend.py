@@ -0,0 +1,76 @@
+import sys
+from types import ModuleType, SimpleNamespace
+
+import pytest
+
+from model import backend
+
+
+class RuntimeInterpreter:
+    pass
+
+
+class TensorFlowInterpreter:
+    pass
+
+
+@pytest.fixture
+def modules(monkeypatch):
+    """Fixture that resets the backend and installs fake interpreter packages."""
+    monkeypatch.setattr(backend, "_backend", "auto")
+    monkeypatch.setattr(backend, "_interpreter_class", None)
+
+    runtime = ModuleType("tflite_runtime")
+    runtime_interpreter = ModuleType("tflite_runtime.interpreter")
+    runtime_interpreter.Interpreter = RuntimeInterpreter
+    runtime.interpreter = runtime_interpreter
+    tensorflow = ModuleType("tensorflow")
+    tensorflow.lite = SimpleNamespace(Interpreter=TensorFlowInterpreter)
+
+    def install(tflite_runtime=True, tf=True):
+        # None in sys.modules makes the import raise ImportError
+        monkeypatch.setitem(sys.modules, "tflite_runtime", runtime if tflite_runtime else None)
+        monkeypatch.setitem(sys.modules, "tflite_runtime.interpreter", runtime_interpreter if tflite_runtime else None)
+        monkeypatch.setitem(sys.modules, "tensorflow", tensorflow if tf else None)
+
+    return install
+
+
+def test_prefers_tflite_runtime(modules):
+    """Test that the auto backend takes tflite_runtime when both packages are installed."""
+    modules()
+    assert backend.load_interpreter_class() is RuntimeInterpreter
+
+
+def test_falls_back_to_tensorflow(modules):
+    """Test that the auto backend falls back to tensorflow without tflite_runtime."""
+    modules(tflite_runtime=False)
+    assert backend.load_interpreter_class() is TensorFlowInterpreter
+
+
+def test_selected_backend(modules):
+    """Test that a selected backend is used even if the preferred one is installed."""
+    modules()
+    backend.set_backend("tensorflow")
+    assert backend.load_interpreter_class() is TensorFlowInterpreter
+    with pytest.raises(ValueError):
+        backend.set_backend("onnx")
+
+
+def test_no_backend_installed(modules):
+    """Test that the error names every backend tried when none is installed."""
+    modules(tflite_runtime=False, tf=False)
+    with pytest.raises(ImportError, match="tried: tflite_runtime, tensorflow"):
+        backend.load_interpreter_class()
+
+
+def test_preload_in_background(modules, capsys):
+    """Test that preloading imports the backend in a thread, and only reports a missing one."""
+    modules(tflite_runtime=False)
+    backend.preload_in_background().join(timeout=5)
+    assert backend._interpreter_class is TensorFlowInterpreter, "Preloading did not import the backend."
+
+    backend.set_backend("tflite_runtime")
+    backend.preload_in_background().join(timeout=5)
+    assert backend._interpreter_class is None
+    assert "Error while loading interpreter backend" in capsys.readouterr().out
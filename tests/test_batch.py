@@ -0,0 +1,62 @@
+import json
+import os
+import pytest
+from pathlib import Path
+
+from batch.cli import main
+from batch.pipeline import collect_images, load_processed
+
+
+@pytest.fixture
+def images(tmpdir):
+    """Fixture with a directory of images, a non-image file and a nested image."""
+    tmpdir = Path(tmpdir)
+    for name in ("b.png", "a.JPG", "notes.txt"):
+        (tmpdir / name).write_bytes(b"")
+    (tmpdir / "sub").mkdir()
+    (tmpdir / "sub" / "c.jpeg").write_bytes(b"")
+    return tmpdir
+
+
+def test_collect_directory(images):
+    """Test that a directory expands to its images, sorted, without other files."""
+    actual = collect_images([str(images)])
+    expected = [str(images / "a.JPG"), str(images / "b.png")]
+    assert actual == expected, f"Collecting failed, expected {expected}, got {actual}."
+
+
+def test_collect_glob_and_file_list(images):
+    """Test glob patterns and file lists, with duplicates dropped in first-seen order."""
+    file_list = images / "list.txt"
+    file_list.write_text(f"{images / 'sub' / 'c.jpeg'}\n\n{images / 'b.png'}\n")
+    actual = collect_images([str(images / "**" / "*.jpeg"), str(images / "b.png")], str(file_list))
+    expected = [str(images / "sub" / "c.jpeg"), str(images / "b.png")]
+    assert actual == expected, f"Collecting failed, expected {expected}, got {actual}."
+
+
+def test_collect_relative_paths_are_absolute(images, monkeypatch):
+    """Test that plain paths are made absolute, so resuming matches them."""
+    monkeypatch.chdir(images)
+    assert collect_images(["b.png"]) == [os.path.abspath("b.png")]
+
+
+def test_load_processed(tmpdir):
+    """Test that only successful records count, and a truncated last line is ignored."""
+    output = Path(tmpdir) / "out.jsonl"
+    output.write_text(json.dumps({"image": "/a.png", "detections": []}) + "\n" +
+                      json.dumps({"image": "/b.png", "error": "Could not read image"}) + "\n" +
+                      '{"image": "/c.png", "detec')
+    actual = load_processed(str(output))
+    assert actual == {"/a.png"}, f"Processed images failed, expected {{'/a.png'}}, got {actual}."
+    assert load_processed(str(Path(tmpdir) / "missing.jsonl")) == set()
+
+
+def test_resume_skips_processed_images(images, capsys):
+    """Test that a rerun skips the images that already have results, without loading the model."""
+    output = images / "out.jsonl"
+    output.write_text("".join(json.dumps({"image": str(images / name), "detections": []}) + "\n"
+                              for name in ("a.JPG", "b.png")))
+    main([str(images), "--model", "missing.tflite", "--class-names", "missing.json", "--output", str(output)])
+    printed = capsys.readouterr().out
+    assert "Skipping 2 already processed images" in printed, f"Resuming failed, got {printed!r}."
+    assert "Nothing to do." in printed
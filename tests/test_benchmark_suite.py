@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from pathlib import Path
+
+tf = pytest.importorskip("tensorflow")
+
+from benchmarks.suite import compare, main
+from benchmarks.synthetic import build_detection_model, make_shelf_image
+from model.model_tflite import TFLiteModel
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    """Fixture with a small synthetic detection model."""
+    path = tmp_path_factory.mktemp("model") / "synthetic.tflite"
+    return build_detection_model(str(path), input_size=96)
+
+
+def test_synthetic_model_matches_engine_signature(model_path):
+    """Test that the engine finds detections with the synthetic model."""
+    model = TFLiteModel(model_path, batch_size=4)
+    try:
+        detections = model.detect(make_shelf_image(600, 400), 0.5)
+    finally:
+        model.close()
+    assert len(detections) > 0, "The synthetic model produced no detections."
+
+
+def test_compare_flags_regressions():
+    """Test that only changes beyond the tolerance are reported."""
+    baseline = {"results": {"2000x1500": {"latency_ms": 100, "tiles_per_sec": 1000}}}
+    current = {"results": {"2000x1500": {"latency_ms": 110, "tiles_per_sec": 700}}}
+    regressions = compare(current, baseline, tolerance=0.15)
+    assert len(regressions) == 1 and "tiles_per_sec" in regressions[0], (
+        f"Regression check failed, got {regressions}."
+    )
+
+
+def test_suite_writes_baseline(tmpdir):
+    """Test a small end-to-end run of the suite."""
+    output = Path(tmpdir) / "baseline.json"
+    main(["--sizes", "400x300", "--repeat", "1", "--input-size", "96", "--output", str(output)])
+    assert output.exists(), "The suite did not write its results."
+
+
+def test_quantized_model_runs_without_float_input(tmpdir):
+    """Test that the engine feeds a uint8 model and dequantizes its outputs."""
+    path = build_detection_model(str(Path(tmpdir) / "synthetic_uint8.tflite"), input_size=96, quantize=True)
+    model = TFLiteModel(path, batch_size=4)
+    try:
+        assert model.input_dtype == np.uint8
+        detections = model.detect(make_shelf_image(600, 400), 0.5)
+    finally:
+        model.close()
+    assert len(detections) > 0 and detections.scores.max() <= 1.0
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from pathlib import Path
+
+from model.detections import Detections
+from model.detection_cache import DetectionCache
+
+
+@pytest.fixture
+def cache(tmpdir):
+    """Fixture with an empty cache and two small input files."""
+    tmpdir = Path(tmpdir)
+    (tmpdir / "image.png").write_bytes(b"image")
+    (tmpdir / "model.tflite").write_bytes(b"model")
+    cache = DetectionCache(str(tmpdir / "cache.sqlite"))
+    yield cache, str(tmpdir / "image.png"), str(tmpdir / "model.tflite")
+    cache.close()
+
+
+@pytest.fixture
+def candidates():
+    """Fixture with raw candidates of different scores."""
+    return Detections([[0, 0, 10, 10], [5, 5, 20, 20]], [0.15, 0.8], [1, 2])
+
+
+def test_round_trip(cache, candidates):
+    """Test that stored candidates come back unchanged."""
+    cache, image, model = cache
+    key = cache.key(image, model, max_tiles=0)
+    cache.put(key, candidates, 0.1, 640, 480)
+    hit, size = cache.get(key, 0.5)
+    assert size == (640, 480), f"Image size failed, got {size}."
+    assert np.array_equal(hit.boxes, candidates.boxes)
+    assert np.array_equal(hit.class_ids, candidates.class_ids)
+
+
+def test_floor_above_cutoff_is_a_miss(cache, candidates):
+    """Test that an entry can't serve a cutoff below its score floor."""
+    cache, image, model = cache
+    key = cache.key(image, model)
+    cache.put(key, candidates, 0.3, 640, 480)
+    assert cache.get(key, 0.5) is not None
+    assert cache.get(key, 0.2) is None
+
+
+def test_key_depends_on_content_and_params(cache, tmpdir):
+    """Test that changing the image content or a parameter changes the key."""
+    cache, image, model = cache
+    key = cache.key(image, model, max_tiles=0)
+    assert key != cache.key(image, model, max_tiles=10)
+    other = Path(tmpdir) / "other.png"
+    other.write_bytes(b"other image")
+    assert key != cache.key(str(other), model, max_tiles=0)
+
+
+def test_eviction_by_size(cache, candidates):
+    """Test that the least recently used entries are dropped over the size cap."""
+    cache, image, model = cache
+    cache.max_bytes = 60
+    cache.put("old", candidates, 0.1, 1, 1)
+    cache.put("new", candidates, 0.1, 1, 1)
+    assert cache.get("old", 0.5) is None
+    assert cache.get("new", 0.5) is not None
+
+
+def test_lower_cutoff_misses_window_entries(cache, candidates):
+    """Test that a window run at a lower cutoff doesn't reuse windows sized at the old cutoff."""
+    cache, image, model = cache
+    key, hit = cache.lookup(image, model, 0.5, candidate_cutoff=0.1, tiling_mode="window")
+    assert hit is None
+    cache.put(key, candidates, 0.1, 640, 480)
+    assert cache.lookup(image, model, 0.5, candidate_cutoff=0.1, tiling_mode="window")[1] is not None
+    lower_key, hit = cache.lookup(image, model, 0.3, candidate_cutoff=0.1, tiling_mode="window")
+    assert lower_key != key and hit is None, "A lower cutoff reused the windows of the old cutoff."
+
+    # Pyramid tiles don't depend on the cutoff, only on the score floor
+    key, _ = cache.lookup(image, model, 0.5, candidate_cutoff=0.1, tiling_mode="pyramid")
+    cache.put(key, candidates, 0.1, 640, 480)
+    assert cache.lookup(image, model, 0.3, candidate_cutoff=0.1, tiling_mode="pyramid")[1] is not None
+
+
+def test_rgb_input_changes_key(cache, candidates):
+    """Test that a model fed RGB tiles doesn't reuse candidates of the same model fed BGR."""
+    cache, image, model = cache
+    key, _ = cache.lookup(image, model, 0.5, tiling_mode="pyramid")
+    cache.put(key, candidates, 0.5, 640, 480)
+    assert cache.lookup(image, model, 0.5, rgb_input=False, tiling_mode="pyramid")[0] == key
+    rgb_key, hit = cache.lookup(image, model, 0.5, rgb_input=True, tiling_mode="pyramid")
+    assert rgb_key != key and hit is None, "RGB input reused the candidates computed from BGR tiles."
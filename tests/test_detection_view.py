@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PyQt5")
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QApplication, QGraphicsPixmapItem
+
+from app.detection_view import DetectionOverlay, DetectionView
+from model.detections import Detections
+
+
+@pytest.fixture(scope="module")
+def app():
+    """Fixture with the QApplication, on the offscreen platform."""
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def view(app):
+    """Fixture with a shown view of a 400x200 image, previewed at half size."""
+    view = DetectionView()
+    view.resize(300, 200)
+    view.show()
+    preview = QPixmap(200, 100)
+    preview.fill(Qt.white)
+    view.setImage(preview, 2.0)
+    yield view
+    view.close()
+
+
+@pytest.fixture
+def detections():
+    """Fixture with two boxes of class 1 and one of class 2, in full-resolution coordinates."""
+    return Detections([[10, 10, 60, 80], [100, 20, 150, 90], [300, 100, 380, 190]], [0.9, 0.8, 0.7], [1, 1, 2])
+
+
+def items(view, kind):
+    return [item for item in view.scene().items() if isinstance(item, kind)]
+
+
+def test_preview_scaled_to_full_resolution(view):
+    """Test that a reduced preview puts the scene in full-resolution coordinates."""
+    rect = view.sceneRect()
+    assert (rect.width(), rect.height()) == (400, 200), \
+        f"Scene size failed, expected (400, 200), got {(rect.width(), rect.height())}."
+
+
+def test_set_detections(view, detections):
+    """Test that detections become one overlay per class, and replace the previous ones."""
+    view.setDetections(detections, {1: "pack", 2: "box"})
+    assert view.classes() == [(1, "pack", True), (2, "box", True)], f"Classes failed, got {view.classes()}."
+    overlays = sorted(items(view, DetectionOverlay), key=lambda overlay: len(overlay.boxes))
+    assert [len(overlay.boxes) for overlay in overlays] == [1, 2]
+    assert overlays[1].labels == ["pack: 90.00%", "pack: 80.00%"], f"Labels failed, got {overlays[1].labels}."
+
+    view.setDetections(Detections([[0, 0, 5, 5]], [0.5], [2]), {1: "pack", 2: "box"})
+    assert len(items(view, DetectionOverlay)) == 1, "Old overlays were not removed."
+    view.clearDetections()
+    assert not items(view, DetectionOverlay) and view.classes() == []
+
+
+def test_toggle_overlays(view, detections):
+    """Test that hiding a class hides its overlay, and stays hidden for new detections."""
+    view.setDetections(detections, {1: "pack", 2: "box"})
+    view.setClassVisible(1, False)
+    assert view.classes() == [(1, "pack", False), (2, "box", True)]
+    visible = {len(overlay.boxes): overlay.isVisible() for overlay in items(view, DetectionOverlay)}
+    assert visible == {2: False, 1: True}, f"Overlay visibility failed, got {visible}."
+
+    view.setDetections(detections, {1: "pack", 2: "box"})
+    assert view.classes()[0] == (1, "pack", False), "A hidden class was shown again by new detections."
+    view.setClassVisible(1, True)
+    assert all(overlay.isVisible() for overlay in items(view, DetectionOverlay))
+
+
+def test_cached_preview_pixmap(view, detections):
+    """Test that drawing detections reuses the preview pixmap, and paints without errors."""
+    pixmap_items = items(view, QGraphicsPixmapItem)
+    key = pixmap_items[0].pixmap().cacheKey()
+    view.setDetections(detections, {1: "pack", 2: "box"})
+    view.setClassVisible(2, False)
+    view.grab()
+    assert items(view, QGraphicsPixmapItem) == pixmap_items, "The preview item was replaced."
+    assert pixmap_items[0].pixmap().cacheKey() == key, "The preview pixmap was redrawn for detections."
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from model.detections import Detections, BandNMS
+from model.model_tflite import TFLiteModel
+
+
+@pytest.fixture
+def detections():
+    """Fixture with two overlapping Kent packs and one Camel pack."""
+    return Detections(boxes=[[0, 0, 10, 10], [1, 1, 11, 11], [1, 1, 11, 11]],
+                      scores=[0.6, 0.9, 0.8],
+                      class_ids=[1, 1, 2])
+
+
+def test_dtypes(detections):
+    """Test that columns are stored with compact dtypes."""
+    expected = (np.float32, np.float32, np.int16)
+    actual = (detections.boxes.dtype, detections.scores.dtype, detections.class_ids.dtype)
+    assert actual == expected, f"Column dtypes failed, expected {expected}, got {actual}."
+
+
+def test_empty():
+    """Test that an empty container has zero length and a (0, 4) box array."""
+    empty = Detections()
+    assert len(empty) == 0 and not empty
+    assert empty.boxes.shape == (0, 4), f"Empty boxes shape is {empty.boxes.shape}."
+
+
+def test_filter(detections):
+    """Test thresholding by score."""
+    expected = [0.9, 0.8]
+    actual = detections.filter(0.7).scores.tolist()
+    assert np.allclose(actual, expected), f"Filter failed, expected {expected}, got {actual}."
+
+
+def test_offset_and_concatenate(detections):
+    """Test shifting by a tile origin and joining containers."""
+    joined = Detections.concatenate([detections, detections.offset(100, 50)])
+    assert len(joined) == 6, f"Concatenate failed, got {len(joined)} detections."
+    expected = [100, 50, 110, 60]
+    actual = joined.boxes[3].tolist()
+    assert actual == expected, f"Offset failed, expected {expected}, got {actual}."
+
+
+def test_nms_keeps_other_classes(detections):
+    """Test that NMS suppresses only within a class."""
+    expected = [[0.9, "Kent", 1, 1, 11, 11], [0.8, "Camel", 1, 1, 11, 11]]
+    actual = detections.nms(0.5).to_list({1: "Kent", 2: "Camel"})
+    assert np.allclose([d[0] for d in actual], [d[0] for d in expected])
+    assert [d[1:] for d in actual] == [d[1:] for d in expected], (
+        f"NMS failed, expected {expected}, got {actual}."
+    )
+
+
+def test_soft_nms_respects_cutoff():
+    """Test that soft-NMS doesn't return boxes whose decayed score fell below the cutoff."""
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(0, 50, (200, 2))
+    candidates = Detections(np.hstack([corners, corners + 30]), rng.uniform(0.5, 1.0, 200), [1] * 200)
+    cutoff = 0.5
+    found = TFLiteModel.postprocess(candidates, cutoff, 0.5, soft_nms=True)
+    assert len(found) < len(candidates), "Soft-NMS kept every overlapping box."
+    assert found.scores.min() >= cutoff, f"Soft-NMS kept a score of {found.scores.min()} below {cutoff}."
+
+
+def test_class_counts(detections):
+    """Test counting detections per class name."""
+    expected = {"Kent": 2, "Unknown": 1}
+    actual = dict(detections.class_counts({1: "Kent"}))
+    assert actual == expected, f"Class counts failed, expected {expected}, got {actual}."
+
+
+def test_scale(detections):
+    """Test that scaling maps boxes from a downscaled image to full resolution."""
+    scaled = detections.scale(2, 4)
+    expected = [0, 0, 20, 40]
+    actual = scaled.boxes[0].tolist()
+    assert actual == expected, f"Scale failed, expected {expected}, got {actual}."
+    assert np.array_equal(scaled.scores, detections.scores)
+
+
+def test_inside_keeps_centred_boxes(detections):
+    """Test that only detections centred in a region are kept."""
+    # Centres are (5, 5), (6, 6) and (6, 6)
+    inside = detections.inside([[0, 0, 5.5, 5.5]])
+    expected = [0.6]
+    actual = inside.scores.tolist()
+    assert np.allclose(actual, expected), f"Inside failed, expected {expected}, got {actual}."
+    assert len(detections.inside([[20, 20, 30, 30], [0, 0, 20, 20]])) == 3, "Any region should match."
+
+
+def test_band_nms_matches_global_nms():
+    """Test that NMS band by band keeps the same boxes as NMS over everything."""
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(0, 400, size=(500, 2))
+    boxes = np.hstack([xy, xy + rng.uniform(20, 40, size=(500, 2))])
+    detections = Detections(boxes, np.round(rng.random(500), 2), rng.integers(0, 3, 500))
+    # Tile rows 50 pixels apart, each row's boxes starting at or below the row top
+    bands = [detections[(boxes[:, 1] >= top) & (boxes[:, 1] < top + 50)] for top in range(0, 400, 50)]
+    expected = Detections.concatenate(bands).nms(0.5)
+
+    reducer = BandNMS(0.5)
+    for i, band in enumerate(bands):
+        reducer.add(band, boundary=50 * (i + 1))
+        assert reducer.pending < len(detections) / 2, f"Band NMS holds {reducer.pending} detections."
+    actual = reducer.finish()
+    key = lambda d: sorted(map(tuple, np.hstack([d.boxes, d.scores[:, None]]).tolist()))
+    assert key(actual) == key(expected), (
+        f"Band NMS failed, expected {len(expected)} detections, got {len(actual)}."
+    )
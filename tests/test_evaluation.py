@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+
+from model.detections import Detections
+from model.evaluation import average_precision, evaluate, load_labels, match_detections
+
+
+def boxes(*items, scores=None, class_id=1):
+    return Detections(items, scores if scores is not None else [0.9] * len(items), [class_id] * len(items))
+
+
+def test_match_claims_each_truth_once():
+    """Test that a duplicate detection of a matched box is a false positive."""
+    truth = boxes([0, 0, 10, 10])
+    found = boxes([0, 0, 10, 10], [1, 1, 11, 11], scores=[0.6, 0.9])
+    actual = match_detections(found, truth).tolist()
+    expected = [False, True]
+    assert actual == expected, f"Matching failed, expected {expected}, got {actual}."
+
+
+def test_match_respects_classes_and_iou():
+    """Test that boxes of another class or too little overlap don't match."""
+    truth = boxes([0, 0, 10, 10])
+    assert not match_detections(boxes([0, 0, 10, 10], class_id=2), truth).any()
+    assert not match_detections(boxes([6, 0, 16, 10]), truth).any()
+
+
+def test_average_precision():
+    """Test AP against a hand-computed precision-recall curve."""
+    # Ranked hits: TP, FP, TP with 3 true boxes -> recall 1/3 at precision 1, 2/3 at 2/3
+    actual = average_precision([0.9, 0.8, 0.7], [True, False, True], 3)
+    expected = 1 / 3 * 1 + 1 / 3 * 2 / 3
+    assert np.isclose(actual, expected), f"AP failed, expected {expected}, got {actual}."
+    assert average_precision([0.9], [False], 0) == 0.0
+
+
+def test_evaluate_perfect_and_missed():
+    """Test recall, precision and mAP over two images."""
+    truth = [boxes([0, 0, 10, 10]), boxes([20, 20, 30, 30], [40, 40, 50, 50])]
+    found = [boxes([0, 0, 10, 10]), boxes([20, 20, 30, 30], [70, 70, 80, 80], scores=[0.9, 0.95])]
+    metrics = evaluate(zip(found, truth))
+    assert np.isclose(metrics["recall"], 2 / 3), f"Recall failed, got {metrics['recall']}."
+    assert np.isclose(metrics["precision"], 2 / 3), f"Precision failed, got {metrics['precision']}."
+    # Ranked: FP, TP, TP of 3 true boxes; interpolated precision is 2/3 up to recall 2/3
+    expected = 2 / 3 * 2 / 3
+    assert np.isclose(metrics["map"], expected), f"mAP failed, expected {expected}, got {metrics['map']}."
+
+
+def test_load_labels_reads_batch_records(tmp_path):
+    """Test that batch output records load as ground truth."""
+    path = tmp_path / "labels.jsonl"
+    record = {"image": "a.jpg", "detections": [{"class_id": 3, "name": "x", "score": 0.7, "box": [1, 2, 3, 4]}]}
+    path.write_text(json.dumps(record) + "\n\n" + json.dumps({"image": "b.jpg", "detections": []}) + "\n")
+    labels = load_labels(str(path))
+    assert [name for name, _ in labels] == ["a.jpg", "b.jpg"]
+    assert labels[0][1].boxes.tolist() == [[1, 2, 3, 4]] and labels[0][1].class_ids.tolist() == [3]
+    assert len(labels[1][1]) == 0
@@ -0,0 +1,88 @@
+import csv
+import json
+import time
+
+import pytest
+
+from model.detections import Detections
+from model.exporter import ResultExporter, detection_record
+
+CLASS_NAME = {1: "pack", 2: "block"}
+
+
+def record(name, *boxes):
+    detections = Detections(boxes, [0.9] * len(boxes), [1 + i % 2 for i in range(len(boxes))])
+    return detection_record(name, (640, 480), detections, CLASS_NAME, 0.25)
+
+
+def test_formats_are_written_on_flush(tmp_path):
+    """Test that queued records reach every format once flushed."""
+    output = str(tmp_path / "out" / "results.jsonl")
+    exporter = ResultExporter(output, ("jsonl", "csv", "coco"), CLASS_NAME, flush_records=1000)
+    exporter.submit(record("a.jpg", [0, 0, 10, 10], [5, 5, 20, 20]))
+    exporter.submit(record("b.jpg"))
+    exporter.submit({"image": "c.jpg", "error": "Could not read image"})
+    exporter.flush()
+
+    lines = [json.loads(line) for line in open(output)]
+    assert [line["image"] for line in lines] == ["a.jpg", "b.jpg", "c.jpg"]
+
+    with open(tmp_path / "out" / "results.csv", newline='') as file:
+        rows = list(csv.DictReader(file))
+    actual = [(row["image"], row["name"]) for row in rows]
+    expected = [("a.jpg", "pack"), ("a.jpg", "block"), ("b.jpg", "")]
+    assert actual == expected, f"CSV rows failed, expected {expected}, got {actual}."
+
+    coco = json.load(open(tmp_path / "out" / "results.coco.json"))
+    assert [image["file_name"] for image in coco["images"]] == ["a.jpg", "b.jpg"]
+    assert coco["annotations"][1]["bbox"] == [5, 5, 15, 15], f"COCO box failed, got {coco['annotations'][1]}."
+    assert [c["name"] for c in coco["categories"]] == ["pack", "block"]
+    exporter.close()
+
+
+def test_runs_are_continued(tmp_path):
+    """Test that a second exporter appends to the files of the first."""
+    output = str(tmp_path / "results.jsonl")
+    for name in ("a.jpg", "b.jpg"):
+        exporter = ResultExporter(output, ("jsonl", "coco"), CLASS_NAME)
+        exporter.submit(record(name, [0, 0, 10, 10]))
+        exporter.close()
+
+    assert len(open(output).readlines()) == 2
+    coco = json.load(open(tmp_path / "results.coco.json"))
+    ids = [annotation["id"] for annotation in coco["annotations"]]
+    assert ids == [1, 2], f"Annotation ids failed, expected [1, 2], got {ids}."
+    assert not (tmp_path / "results.coco.json.tmp").exists()
+
+
+def test_records_are_written_in_batches(tmp_path):
+    """Test that a full batch is written without waiting for the flush interval."""
+    output = tmp_path / "results.jsonl"
+    exporter = ResultExporter(str(output), flush_records=2, flush_seconds=60)
+    exporter.submit(record("a.jpg"))
+    exporter.submit(record("b.jpg"))
+    exporter.submit(record("c.jpg"))
+    # Only the first batch is due; the third record waits for the interval or close()
+    for _ in range(200):
+        if output.exists() and len(output.read_text().splitlines()) == 2:
+            break
+        time.sleep(0.01)
+    assert len(output.read_text().splitlines()) == 2
+    exporter.close()
+    assert len(output.read_text().splitlines()) == 3
+
+
+def test_unknown_format():
+    """Test that an unknown format is refused up front."""
+    with pytest.raises(ValueError):
+        ResultExporter("results.jsonl", ("xml",))
+
+
+def test_parquet(tmp_path):
+    """Test that Parquet rows match the CSV columns."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    exporter = ResultExporter(str(tmp_path / "results.jsonl"), ("parquet",), CLASS_NAME)
+    exporter.submit(record("a.jpg", [0, 0, 10, 10]))
+    exporter.close()
+    rows = pq.read_table(str(tmp_path / "results.parquet")).to_pylist()
+    assert rows[0]["image"] == "a.jpg" and rows[0]["xmax"] == 10
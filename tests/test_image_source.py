@@ -0,0 +1,65 @@
+import cv2
+import numpy as np
+import pytest
+from pathlib import Path
+
+from model.image_source import ImageSource, image_size
+
+
+@pytest.fixture
+def image_path(tmpdir):
+    """Fixture with a 1600x1200 JPEG file."""
+    path = str(Path(tmpdir) / "shelf.jpg")
+    rng = np.random.default_rng(0)
+    cv2.imwrite(path, rng.integers(0, 256, (1200, 1600, 3), dtype=np.uint8))
+    return path
+
+
+def test_reduced_picks_smallest_sufficient_decode(image_path):
+    """Test that the most reduced decode with a large enough side is chosen."""
+    source = ImageSource(image_path)
+    image, factor = source.reduced(250)
+    assert factor == 4, f"Reduction factor failed, expected 4, got {factor}."
+    assert image.shape == (300, 400, 3), f"Reduced shape failed, got {image.shape}."
+    assert not source.decoded, "The full image was decoded for a reduced request."
+
+
+def test_reduced_falls_back_to_full(image_path):
+    """Test that a side larger than every reduced decode gives the full image."""
+    source = ImageSource(image_path)
+    image, factor = source.reduced(1000)
+    assert factor == 1 and image.shape == (1200, 1600, 3)
+    assert source.decoded
+
+
+def test_full_is_decoded_once(image_path):
+    """Test that the full image is shared between callers."""
+    source = ImageSource(image_path)
+    assert source.full() is source.full()
+
+
+def test_size(image_path):
+    """Test the estimated and the exact image size."""
+    source = ImageSource(image_path)
+    source.reduced(100)
+    assert source.size == (1600, 1200), f"Estimated size failed, got {source.size}."
+    source.full()
+    assert image_size(source) == (1600, 1200)
+    assert image_size(np.zeros((5, 7, 3))) == (7, 5)
+
+
+def test_unreadable_file(tmpdir):
+    """Test that a missing file raises ValueError."""
+    with pytest.raises(ValueError):
+        ImageSource(str(Path(tmpdir) / "missing.jpg")).full()
+
+
+def test_within_respects_memory_budget(image_path):
+    """Test that a budget below the full image size gives a reduced decode."""
+    source = ImageSource(image_path)
+    image, factor = source.within(1600 * 1200 * 3 // 3)
+    assert factor == 2, f"Budget factor failed, expected 2, got {factor}."
+    assert image.nbytes <= 1600 * 1200, f"Decode exceeds the budget: {image.nbytes} bytes."
+    assert not source.decoded, "The full image was decoded despite the budget."
+    image, factor = source.within(0)
+    assert factor == 1 and source.decoded, "No budget should decode the full image."
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from model import backend
+from model.interpreter_pool import InterpreterPool, InterpreterWorker
+
+
+class FakeInterpreter:
+    """
+    A TFLite-like interpreter whose score for a tile is the tile's mean.
+
+    Negative tiles fail to invoke, and the thread of every invoke is recorded.
+    """
+
+    # Whether the input can be resized to more than one tile
+    resizable = True
+    delay = 0.0
+    threads = []
+
+    def __init__(self, model_path=None, num_threads=None) -> None:
+        self.shape = [1, 4, 4, 3]
+        self.outputs = {}
+
+    def allocate_tensors(self):
+        self.input = np.zeros(self.shape, dtype=np.float32)
+
+    def get_input_details(self):
+        return [{'index': 0, 'shape': np.array(self.shape), 'dtype': np.float32, 'quantization': (0.0, 0)}]
+
+    def get_output_details(self):
+        batch = self.shape[0]
+        return [{'index': index, 'shape': np.array(shape), 'dtype': np.float32, 'quantization': (0.0, 0)}
+                for index, shape in ((1, [batch, 2]), (2, [batch, 2, 4]), (3, [batch]), (4, [batch, 2]))]
+
+    def resize_tensor_input(self, index, shape):
+        if shape[0] != 1 and not self.resizable:
+            raise RuntimeError("Cannot resize a fixed-batch model")
+        self.shape = list(shape)
+
+    def set_tensor(self, index, value):
+        self.input[...] = value
+
+    def invoke(self):
+        FakeInterpreter.threads.append(threading.get_ident())
+        time.sleep(self.delay)
+        if (self.input < 0).any():
+            raise RuntimeError("Invoke failed")
+        batch = self.shape[0]
+        scores = np.repeat(self.input.reshape(batch, -1).mean(axis=1)[:, None], 2, axis=1)
+        self.outputs = {1: scores, 2: np.zeros((batch, 2, 4), dtype=np.float32),
+                        3: np.full(batch, 2, dtype=np.float32), 4: np.ones((batch, 2), dtype=np.float32)}
+
+    def get_tensor(self, index):
+        return self.outputs[index].copy()
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """Fixture that makes new interpreters FakeInterpreters."""
+    monkeypatch.setitem(backend.BACKENDS, "fake", lambda: FakeInterpreter)
+    monkeypatch.setattr(FakeInterpreter, "threads", [])
+    backend.set_backend("fake")
+    yield FakeInterpreter
+    backend.set_backend("auto")
+
+
+def tiles(*values):
+    return np.stack([np.full((4, 4, 3), value, dtype=np.float32) for value in values])
+
+
+def test_inline_with_one_worker(fake_backend):
+    """Test that a single worker runs batches in the calling thread, done on submit."""
+    pool = InterpreterPool("model.tflite", num_workers=1, batch_size=4)
+    future = pool.submit(tiles(0.1, 0.2, 0.3), n=2)
+    assert future.done(), "An inline batch was not done on submit."
+    scores, boxes, classes = future.result()
+    assert scores.shape == (2, 2), f"Scores shape failed, expected (2, 2), got {scores.shape}."
+    assert np.allclose(scores[:, 0], [0.1, 0.2])
+    assert fake_backend.threads == [threading.get_ident()]
+
+
+def test_threaded_with_several_workers(fake_backend):
+    """Test that several workers run batches in their own threads, results in submission order."""
+    pool = InterpreterPool("model.tflite", num_workers=2, batch_size=2)
+    futures = [pool.submit(tiles(value, value)) for value in (0.1, 0.2, 0.3, 0.4)]
+    actual = [float(future.result(timeout=5)[0][0, 0]) for future in futures]
+    pool.close()
+    assert np.allclose(actual, [0.1, 0.2, 0.3, 0.4]), f"Results failed, got {actual}."
+    assert threading.get_ident() not in fake_backend.threads, "A threaded batch ran in the caller."
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_errors_reach_the_future(fake_backend, num_workers):
+    """Test that a failed invoke is raised by the future's result, and the pool keeps working."""
+    pool = InterpreterPool("model.tflite", num_workers=num_workers, batch_size=2)
+    failed = pool.submit(tiles(-1, 0.5))
+    with pytest.raises(RuntimeError, match="Invoke failed"):
+        failed.result(timeout=5)
+    assert np.allclose(pool.submit(tiles(0.5, 0.5)).result(timeout=5)[0][:, 0], 0.5)
+    pool.close()
+
+
+def test_close_finishes_pending_batches(fake_backend, monkeypatch):
+    """Test that close() waits for the queued batches, and a closed pool runs inline."""
+    monkeypatch.setattr(FakeInterpreter, "delay", 0.02)
+    pool = InterpreterPool("model.tflite", num_workers=2, batch_size=1)
+    futures = [pool.submit(tiles(0.1 * i)) for i in range(8)]
+    pool.close()
+    assert all(future.done() for future in futures), "close() returned with batches still pending."
+    assert np.allclose([future.result()[0][0, 0] for future in futures], [0.1 * i for i in range(8)])
+
+    future = pool.submit(tiles(0.7))
+    assert future.done() and np.isclose(future.result()[0][0, 0], 0.7)
+
+
+def test_fixed_batch_model_falls_back_to_one(fake_backend, monkeypatch):
+    """Test that a model that can't be resized runs tiles one by one."""
+    monkeypatch.setattr(FakeInterpreter, "resizable", False)
+    worker = InterpreterWorker("model.tflite", batch_size=8)
+    assert worker.batch_size == 1, f"Batch size failed, expected 1, got {worker.batch_size}."
+    scores, _, _ = worker.run(tiles(0.1, 0.2, 0.3))
+    assert np.allclose(scores[:, 0], [0.1, 0.2, 0.3])
+    assert len(fake_backend.threads) == 3, f"Invokes failed, expected 3, got {len(fake_backend.threads)}."
@@ -0,0 +1,107 @@
+import os
+import pytest
+from pathlib import Path
+
+from model import model_registry
+from model.model_registry import ModelRegistry
+
+
+class FakeModel:
+    """Stands in for TFLiteModel, recording warm-ups and closes."""
+
+    def __init__(self, model_path, batch_size=8, num_workers=1, num_threads=None, rgb_input=False) -> None:
+        self.model_path = model_path
+        self.warmed = False
+        self.closed = False
+
+    def warm_up(self):
+        self.warmed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def models(tmpdir, monkeypatch):
+    """Fixture with a registry of fake models and two 1 KB model files."""
+    monkeypatch.setattr(model_registry, "TFLiteModel", FakeModel)
+    tmpdir = Path(tmpdir)
+    paths = []
+    for name in ("a.tflite", "b.tflite"):
+        (tmpdir / name).write_bytes(b"m" * 1024)
+        paths.append(str(tmpdir / name))
+    return ModelRegistry(max_models=4, max_bytes=1024 * 1024), paths
+
+
+def test_cached_by_path_and_parameters(models):
+    """Test that the same path and parameters return the same warmed-up model."""
+    registry, (a, b) = models
+    model = registry.get(a)
+    assert model.warmed, "The model was not warmed up."
+    assert registry.get(os.path.relpath(a)) is model, "The same file loaded a second model."
+    assert registry.get(a, batch_size=4) is not model, "Different parameters shared a model."
+    assert registry.get(a, rgb_input=True) is not model, "RGB input shared a model with BGR input."
+    assert registry.get(b) is not model
+
+
+def test_reloaded_after_file_change(models):
+    """Test that a model file replaced on disk is loaded again and the stale model closed."""
+    registry, (a, _) = models
+    old = registry.get(a)
+    Path(a).write_bytes(b"n" * 2048)
+    new = registry.get(a)
+    assert new is not old, "The changed file returned the stale model."
+    assert old.closed, "The stale model was not closed."
+
+
+def test_eviction_by_max_bytes(models):
+    """Test that the least recently used model is closed over the memory cap."""
+    registry, (a, b) = models
+    registry.max_bytes = 1500
+    first = registry.get(a)
+    second = registry.get(b)
+    assert first.closed, "The least recently used model was not evicted."
+    assert not second.closed
+    assert registry.get(b) is second
+
+
+def test_eviction_by_max_models(models):
+    """Test that only max_models models are kept."""
+    registry, (a, _) = models
+    registry.max_models = 2
+    loaded = [registry.get(a, batch_size=size) for size in (1, 2, 4)]
+    assert [model.closed for model in loaded] == [True, False, False], \
+        f"Eviction failed, expected only the oldest closed, got {[model.closed for model in loaded]}."
+
+
+def test_checked_out_model_closed_on_last_release(models):
+    """Test that an evicted model stays open until every checkout is released."""
+    registry, (a, b) = models
+    registry.max_bytes = 1500
+    model = registry.acquire(a)
+    assert registry.acquire(a) is model
+    registry.get(b)
+    assert not model.closed, "A checked-out model was closed on eviction."
+    registry.release(model)
+    assert not model.closed, "The model was closed while still checked out."
+    registry.release(model)
+    assert model.closed, "The evicted model was not closed on the last release."
+
+
+def test_released_model_stays_cached(models):
+    """Test that releasing a model that wasn't evicted keeps it open and cached."""
+    registry, (a, _) = models
+    model = registry.acquire(a)
+    registry.release(model)
+    assert not model.closed
+    assert registry.get(a) is model
+
+
+def test_set_limits_evicts(models):
+    """Test that lowering the limits evicts models right away."""
+    registry, (a, b) = models
+    first = registry.get(a)
+    registry.get(b)
+    registry.set_limits(max_bytes=1500)
+    assert registry.max_bytes == 1500
+    assert first.closed, "Lowering the memory cap did not evict the oldest model."
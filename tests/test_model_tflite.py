@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from model import backend
+from model.model_tflite import TFLiteModel
+
+
+class QuantizedInterpreter:
+    """
+    A TFLite-like detector with configurable input and class output quantization.
+
+    Every tile with bright pixels gets one box around them, scored 0.9. The
+    class id is returned as the quantized value class_value with class_scale,
+    and the last input batch is kept for inspection.
+    """
+
+    input_dtype = np.float32
+    input_quantization = (0.0, 0)
+    class_value = 3
+    class_scale = 0.0
+
+    def __init__(self, model_path=None, num_threads=None) -> None:
+        self.shape = [1, 8, 8, 3]
+        self.outputs = {}
+
+    def allocate_tensors(self):
+        self.input = np.zeros(self.shape, dtype=self.input_dtype)
+
+    def get_input_details(self):
+        return [{'index': 0, 'shape': np.array(self.shape), 'dtype': self.input_dtype,
+                 'quantization': self.input_quantization}]
+
+    def get_output_details(self):
+        batch = self.shape[0]
+        class_dtype = np.uint8 if self.class_scale else np.float32
+        return [{'index': index, 'shape': np.array(shape), 'dtype': dtype, 'quantization': quantization}
+                for index, shape, dtype, quantization in (
+                    (1, [batch, 1], np.float32, (0.0, 0)), (2, [batch, 1, 4], np.float32, (0.0, 0)),
+                    (3, [batch], np.float32, (0.0, 0)), (4, [batch, 1], class_dtype, (self.class_scale, 0)))]
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = list(shape)
+
+    def set_tensor(self, index, value):
+        self.input[...] = value
+
+    def invoke(self):
+        batch, height, width, _ = self.shape
+        scores = np.zeros((batch, 1), dtype=np.float32)
+        boxes = np.zeros((batch, 1, 4), dtype=np.float32)
+        for n in range(batch):
+            ys, xs = np.nonzero(self.input[n].astype(np.float32).mean(axis=2) > 0)
+            if len(ys):
+                scores[n, 0] = 0.9
+                boxes[n, 0] = (ys.min() / height, xs.min() / width, (ys.max() + 1) / height, (xs.max() + 1) / width)
+        class_dtype = np.uint8 if self.class_scale else np.float32
+        self.outputs = {1: scores, 2: boxes, 3: np.ones(batch, dtype=np.float32),
+                        4: np.full((batch, 1), self.class_value, dtype=class_dtype)}
+
+    def get_tensor(self, index):
+        return self.outputs[index].copy()
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """Fixture that makes new interpreters QuantizedInterpreters."""
+    monkeypatch.setitem(backend.BACKENDS, "quantized", lambda: QuantizedInterpreter)
+    backend.set_backend("quantized")
+    yield QuantizedInterpreter
+    backend.set_backend("auto")
+
+
+def test_unquantized_integer_input_takes_raw_pixels(fake_backend, monkeypatch):
+    """Test that a uint8 input with scale 0 gets the pixels unchanged, not a saturated table."""
+    monkeypatch.setattr(QuantizedInterpreter, "input_dtype", np.uint8)
+    model = TFLiteModel("model.tflite", batch_size=1)
+    out = np.zeros((8, 8, 3), dtype=np.uint8)
+    model.fill_tile(np.full((16, 16, 3), 100, dtype=np.uint8), out)
+    assert (out == 100).all(), f"Pixels failed, expected 100, got {np.unique(out)}."
+
+
+def test_quantized_class_ids_are_rounded(fake_backend, monkeypatch):
+    """Test that a dequantized class id just below an integer keeps its class."""
+    monkeypatch.setattr(QuantizedInterpreter, "class_scale", 0.99999)
+    model = TFLiteModel("model.tflite", batch_size=2)
+    image = np.full((16, 32, 3), 255, dtype=np.uint8)
+    detections = model.run_tiles(image, 0.5, [(0, 0, 16, 16), (16, 0, 32, 16)])
+    assert detections.class_ids.tolist() == [3, 3], f"Class ids failed, expected [3, 3], got {detections.class_ids}."
+
+
+@pytest.mark.parametrize("batch_size, num_workers", [(4, 1), (3, 2)])
+def test_batched_tiles_match_single_tiles(fake_backend, batch_size, num_workers):
+    """Test that tiles run in batches, also on several workers, give the same detections as one at a time."""
+    rng = np.random.default_rng(0)
+    image = np.zeros((64, 80, 3), dtype=np.uint8)
+    for _ in range(12):
+        x, y = rng.integers(0, 76), rng.integers(0, 60)
+        image[y:y + 4, x:x + 4] = 255
+    # Overlapping windows, some cut short at the right and bottom borders
+    regions = [(x, y, x + 16, y + 16) for y in range(0, 64, 12) for x in range(0, 80, 12)]
+
+    single = TFLiteModel("model.tflite", batch_size=1)
+    batched = TFLiteModel("model.tflite", batch_size=batch_size, num_workers=num_workers)
+    try:
+        expected = single.run_tiles(image, 0.5, regions)
+        actual = batched.run_tiles(image, 0.5, regions)
+    finally:
+        single.close()
+        batched.close()
+    assert len(expected) > 0, "The fake model found nothing."
+    assert np.array_equal(actual.boxes, expected.boxes), "Batched boxes differ from single-tile boxes."
+    assert np.array_equal(actual.scores, expected.scores)
+    assert np.array_equal(actual.class_ids, expected.class_ids)
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from model.nms import box_iou, nms, soft_nms, grid_nms, neighbour_pairs, weighted_box_fusion
+
+
+def reference_nms(boxes, scores, iou_threshold):
+    """Plain greedy NMS used as the ground truth."""
+    order = list(np.argsort(-scores, kind="stable"))
+    keep = []
+    while order:
+        i = order.pop(0)
+        keep.append(i)
+        order = [j for j in order if box_iou(boxes[i:i + 1], boxes[j:j + 1])[0, 0] <= iou_threshold]
+    return np.array(keep)
+
+
+@pytest.fixture
+def random_boxes():
+    """Fixture with clustered random boxes, so many of them overlap."""
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 500, size=(40, 2))
+    xy = centers[rng.integers(0, 40, size=600)] + rng.normal(0, 8, size=(600, 2))
+    wh = rng.uniform(20, 60, size=(600, 2))
+    boxes = np.hstack([xy, xy + wh]).astype(np.float32)
+    scores = rng.random(600).astype(np.float32)
+    return boxes, scores
+
+
+def test_box_iou_identical_and_disjoint():
+    """Test IoU of identical and non-overlapping boxes."""
+    boxes = np.array([[0, 0, 9, 9], [20, 20, 29, 29]])
+    iou = box_iou(boxes, boxes)
+    expected = np.eye(2)
+    assert np.allclose(iou, expected), f"IoU matrix failed, expected {expected}, got {iou}."
+
+
+def test_nms_matches_reference(random_boxes):
+    """Test that blocked NMS keeps the same boxes as plain greedy NMS."""
+    boxes, scores = random_boxes
+    expected = reference_nms(boxes, scores, 0.5)
+    actual = nms(boxes, scores, 0.5, block_size=64)
+    assert np.array_equal(actual, expected), (
+        f"NMS failed, expected {len(expected)} boxes, got {len(actual)}."
+    )
+
+
+def test_nms_is_class_aware():
+    """Test that overlapping boxes of different classes are both kept."""
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11]])
+    scores = np.array([0.9, 0.8])
+    assert len(nms(boxes, scores, 0.5)) == 1
+    actual = nms(boxes, scores, 0.5, class_ids=np.array([0, 1]))
+    assert list(actual) == [0, 1], f"Class-aware NMS failed, got {actual}."
+
+
+def test_soft_nms_decays_overlapping_scores():
+    """Test that soft-NMS keeps overlapping boxes with decayed scores."""
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60]])
+    scores = np.array([0.9, 0.8, 0.7])
+    keep, new_scores = soft_nms(boxes, scores, score_threshold=0.01)
+    assert list(keep) == [0, 2, 1], f"Soft-NMS order failed, got {keep}."
+    assert new_scores[2] < 0.8, f"Soft-NMS did not decay the overlapping score: {new_scores}."
+
+
+
+def test_neighbour_pairs_finds_every_overlap(random_boxes):
+    """Test that the grid pairs every two intersecting boxes."""
+    boxes, _ = random_boxes
+    first, second = neighbour_pairs(boxes)
+    found = set(zip(first.tolist(), second.tolist())) | set(zip(second.tolist(), first.tolist()))
+    iou = box_iou(boxes, boxes)
+    expected = {(i, j) for i, j in zip(*np.nonzero(np.triu(iou > 0, k=1)))}
+    missing = expected - found
+    assert not missing, f"Grid pairs failed, {len(missing)} of {len(expected)} overlaps missing."
+
+
+def test_grid_nms_matches_reference(random_boxes):
+    """Test that grid NMS keeps the same boxes as plain greedy NMS."""
+    boxes, scores = random_boxes
+    expected = reference_nms(boxes, scores, 0.5)
+    actual = grid_nms(boxes, scores, 0.5)
+    assert np.array_equal(actual, expected), (
+        f"Grid NMS failed, expected {len(expected)} boxes, got {len(actual)}."
+    )
+    class_ids = np.arange(len(scores)) % 3
+    expected = nms(boxes, scores, 0.5, class_ids=class_ids)
+    actual = grid_nms(boxes, scores, 0.5, class_ids=class_ids)
+    assert np.array_equal(actual, expected), "Class-aware grid NMS differs from NMS."
+
+
+def test_weighted_box_fusion_averages_cluster():
+    """Test that overlapping boxes are fused into their score-weighted mean."""
+    boxes = np.array([[0, 0, 10, 10], [2, 0, 12, 10], [50, 50, 60, 60]])
+    scores = np.array([0.75, 0.25, 0.5])
+    fused, fused_scores, heads = weighted_box_fusion(boxes, scores, 0.5)
+    expected = [[0.5, 0, 10.5, 10], [50, 50, 60, 60]]
+    assert np.allclose(fused, expected), f"WBF boxes failed, expected {expected}, got {fused.tolist()}."
+    assert np.allclose(fused_scores, [0.5, 0.5]), f"WBF scores failed, got {fused_scores}."
+    assert list(heads) == [0, 2], f"WBF heads failed, got {heads}."
+
+
+def test_weighted_box_fusion_joins_fragments():
+    """Test that a box cut by a tile border is joined to the whole object."""
+    # The whole pack and its left part, seen by a tile ending at x = 40
+    boxes = np.array([[20, 0, 40, 60], [20, 0, 80, 60]])
+    scores = np.array([0.9, 0.8])
+    fused, _, _ = weighted_box_fusion(boxes, scores, 0.5)
+    expected = [[20, 0, 80, 60]]
+    assert np.allclose(fused, expected), f"Fragment join failed, expected {expected}, got {fused.tolist()}."
+    fused, _, _ = weighted_box_fusion(boxes, scores, 0.5, fragment_threshold=None)
+    assert len(fused) == 2, f"Fragments should be kept apart without a threshold, got {len(fused)} boxes."
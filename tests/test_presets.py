@@ -0,0 +1,39 @@
+import pytest
+
+from model.presets import apply_preset, choose_presets, load_presets, pareto_front, save_presets
+
+
+def profile(ms, score, name=""):
+    return {"options": {"name": name}, "ms": ms, "map": score}
+
+
+def test_pareto_front_drops_dominated_profiles():
+    """Test that only profiles no other is both faster and more accurate than are kept."""
+    profiles = [profile(10, 0.5, "a"), profile(20, 0.4, "b"), profile(30, 0.8, "c"),
+                profile(30, 0.7, "d"), profile(5, 0.5, "e")]
+    actual = [p["options"]["name"] for p in pareto_front(profiles)]
+    expected = ["e", "c"]
+    assert actual == expected, f"Pareto front failed, expected {expected}, got {actual}."
+
+
+def test_choose_presets_by_tolerance():
+    """Test that fast and balanced are the fastest profiles within their share of the best mAP."""
+    front = [profile(5, 0.6, "a"), profile(10, 0.73, "b"), profile(20, 0.79, "c"), profile(40, 0.8, "d")]
+    chosen = {name: p["options"]["name"] for name, p in choose_presets(front).items()}
+    expected = {"fast": "b", "balanced": "c", "accurate": "d"}
+    assert chosen == expected, f"Preset choice failed, expected {expected}, got {chosen}."
+
+
+def test_save_load_and_apply(tmp_path):
+    """Test that saved presets override only their own options."""
+    path = str(tmp_path / "presets.json")
+    assert load_presets(path) == {}
+    save_presets(path, {"fast": {"options": {"window_scale": 3.0, "iou_threshold": 0.4}, "ms": 1.0}},
+                 model="m.tflite")
+    presets = load_presets(path)
+    options = apply_preset({"iou_threshold": 0.5, "soft_nms": True}, presets, "fast")
+    expected = {"iou_threshold": 0.4, "soft_nms": True, "window_scale": 3.0}
+    assert options == expected, f"Applying failed, expected {expected}, got {options}."
+    assert apply_preset({"a": 1}, presets, "") == {"a": 1}
+    with pytest.raises(ValueError):
+        apply_preset({}, presets, "accurate")
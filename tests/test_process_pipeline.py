@@ -0,0 +1,131 @@
+import json
+import pytest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from batch import process_pool
+from batch.pipeline import BatchPipeline
+from batch.process_pool import ProcessPipeline
+from model import backend
+from model.model_tflite import TFLiteModel
+
+
+class BlobInterpreter:
+    """A TFLite-like detector that finds the bounding box of the bright pixels of a tile."""
+
+    def __init__(self, model_path=None, num_threads=None) -> None:
+        self.shape = [1, 32, 32, 3]
+        self.outputs = {}
+
+    def allocate_tensors(self):
+        self.input = np.zeros(self.shape, dtype=np.float32)
+
+    def get_input_details(self):
+        return [{'index': 0, 'shape': np.array(self.shape), 'dtype': np.float32, 'quantization': (0.0, 0)}]
+
+    def get_output_details(self):
+        batch = self.shape[0]
+        return [{'index': index, 'shape': np.array(shape), 'dtype': np.float32, 'quantization': (0.0, 0)}
+                for index, shape in ((1, [batch, 1]), (2, [batch, 1, 4]), (3, [batch]), (4, [batch, 1]))]
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = list(shape)
+
+    def set_tensor(self, index, value):
+        self.input[...] = value
+
+    def invoke(self):
+        batch, height, width, _ = self.shape
+        scores = np.zeros((batch, 1), dtype=np.float32)
+        boxes = np.zeros((batch, 1, 4), dtype=np.float32)
+        for n in range(batch):
+            ys, xs = np.nonzero(self.input[n].mean(axis=2) > 0)
+            if len(ys):
+                scores[n, 0] = 0.9
+                boxes[n, 0] = (ys.min() / height, xs.min() / width, (ys.max() + 1) / height, (xs.max() + 1) / width)
+        self.outputs = {1: scores, 2: boxes, 3: np.ones(batch, dtype=np.float32),
+                        4: np.ones((batch, 1), dtype=np.float32)}
+
+    def get_tensor(self, index):
+        return self.outputs[index].copy()
+
+
+def use_blob_backend():
+    """Registers BlobInterpreter as the interpreter backend; also run in every worker process."""
+    backend.BACKENDS["blob"] = lambda: BlobInterpreter
+    backend.set_backend("blob")
+
+
+@pytest.fixture
+def blob_backend():
+    use_blob_backend()
+    yield
+    del backend.BACKENDS["blob"]
+    backend.set_backend("auto")
+
+
+@pytest.fixture
+def images(tmpdir):
+    """Fixture with a few images of white boxes on black, and an unreadable file."""
+    tmpdir = Path(tmpdir)
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(3):
+        image = np.zeros((120 + 40 * i, 160, 3), dtype=np.uint8)
+        for _ in range(3):
+            x, y = rng.integers(0, 120), rng.integers(0, image.shape[0] - 30)
+            image[y:y + 24, x:x + 30] = 255
+        paths.append(str(tmpdir / f"{i}.png"))
+        cv2.imwrite(paths[-1], image)
+    (tmpdir / "broken.png").write_bytes(b"not an image")
+    (tmpdir / "model.tflite").write_bytes(b"model")
+    paths.append(str(tmpdir / "broken.png"))
+    return tmpdir, paths
+
+
+def read_results(path):
+    with open(path, 'r') as file:
+        records = [json.loads(line) for line in file]
+    for record in records:
+        record.pop("seconds", None)
+    return sorted(records, key=lambda record: record["image"])
+
+
+@pytest.mark.parametrize("tiling_mode", ["window", "pyramid"])
+def test_matches_batch_pipeline(blob_backend, images, monkeypatch, tiling_mode):
+    """Test that worker processes write the same records as the in-process pipeline, leaking no shared memory."""
+    tmpdir, paths = images
+    class_name = {1: "pack"}
+    options = dict(tiling_mode=tiling_mode, pyramid_levels=2, iou_threshold=0.5)
+
+    model = TFLiteModel(str(tmpdir / "model.tflite"), batch_size=4)
+    try:
+        BatchPipeline(model, class_name, 0.5, **options).run(paths, str(tmpdir / "batch.jsonl"))
+    finally:
+        model.close()
+
+    created = []
+
+    class TrackedMemory(process_pool.shared_memory.SharedMemory):
+        def __init__(self, *args, **kwargs) -> None:
+            super().__init__(*args, **kwargs)
+            if kwargs.get("create"):
+                created.append(self.name)
+
+    monkeypatch.setattr(process_pool.shared_memory, "SharedMemory", TrackedMemory)
+    pipeline = ProcessPipeline((str(tmpdir / "model.tflite"), 4, 1, None, False), class_name, 0.5,
+                               num_processes=2, chunk_tiles=2, initializer=use_blob_backend, **options)
+    summary = pipeline.run(paths, str(tmpdir / "processes.jsonl"))
+
+    expected = read_results(tmpdir / "batch.jsonl")
+    actual = read_results(tmpdir / "processes.jsonl")
+    assert any(record.get("detections") for record in expected), "The fake model found nothing."
+    assert actual == expected, "The process pipeline records differ from the batch pipeline records."
+    assert summary["images"] == 3 and summary["failed"] == 1, f"Summary failed, got {summary}."
+
+    assert len(created) == 3, f"Shared memory blocks failed, expected 3, got {len(created)}."
+    for name in created:
+        with pytest.raises(FileNotFoundError):
+            process_pool.shared_memory.SharedMemory(name=name)
@@ -0,0 +1,58 @@
+import json
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from model import profiler
+from model.profiler import Profiler, NULL_PROFILER, profiling
+
+
+def test_stages_and_counters():
+    """Test that stages are timed and counters accumulate."""
+    prof = Profiler()
+    with prof.stage("invoke"):
+        pass
+    with prof.stage("invoke"):
+        pass
+    prof.count("tiles", 3)
+    report = prof.report()
+    assert report["stages"]["invoke"]["calls"] == 2, f"Stage calls failed: {report}."
+    assert report["counters"] == {"tiles": 3}, f"Counters failed: {report}."
+
+
+def test_profiling_context_is_thread_local():
+    """Test that the active profiler is restored after the block."""
+    prof = Profiler()
+    with profiling(prof):
+        assert profiler.current() is prof
+    assert profiler.current() is NULL_PROFILER
+
+
+def test_chrome_trace_export(tmpdir):
+    """Test that the trace file contains one complete event per stage call."""
+    prof = Profiler()
+    with prof.stage("nms"):
+        pass
+    trace_file = Path(tmpdir) / "trace.json"
+    prof.to_chrome_trace(trace_file)
+    with open(trace_file, 'r') as file:
+        events = json.load(file)["traceEvents"]
+    assert [(e["name"], e["ph"]) for e in events] == [("nms", "X")], f"Trace failed: {events}."
+
+
+def test_trace_memory_records_stage_allocations():
+    """Test that a traced stage reports the memory it allocated."""
+    prof = Profiler(trace_memory=True)
+    tracemalloc.start()
+    try:
+        with prof.stage("preprocess"):
+            buffer = np.ones(256 * 1024, dtype=np.uint8)
+        with prof.stage("postprocess"):
+            pass
+    finally:
+        tracemalloc.stop()
+    stages = prof.report()["stages"]
+    assert stages["preprocess"]["alloc_kb"] >= 256, f"Allocation tracing failed: {stages}."
+    assert stages["postprocess"]["alloc_kb"] < 1, f"Allocation tracing failed: {stages}."
+    del buffer
@@ -0,0 +1,37 @@
+import numpy as np
+
+from model.quantization import input_lut, dequantize
+
+
+def detail(dtype, scale, zero_point):
+    return {"dtype": dtype, "quantization": (scale, zero_point)}
+
+
+def test_input_lut_identity_for_unit_scale():
+    """Test that uint8 inputs with scale 1/255 take pixels unchanged."""
+    assert input_lut(detail(np.uint8, 1 / 255, 0)) is None
+
+
+def test_input_lut_int8():
+    """Test the pixel table of an int8 input with zero point -128."""
+    lut = input_lut(detail(np.int8, 1 / 255, -128))
+    assert lut.dtype == np.int8
+    assert (lut[0], lut[255]) == (-128, 127), f"Int8 table failed, got {lut[0]}, {lut[255]}."
+
+
+def test_input_lut_matches_float_normalization():
+    """Test that dequantized table values approximate pixel / 255."""
+    scale, zero_point = 1 / 128, 0
+    lut = input_lut(detail(np.uint8, scale, zero_point))
+    real = (lut.astype(np.float32) - zero_point) * scale
+    expected = np.clip(np.arange(256) / 255, 0, 255 * scale)
+    assert np.allclose(real, expected, atol=scale), "Table values drift from pixel / 255."
+
+
+def test_dequantize():
+    """Test that integer outputs are dequantized and float outputs pass through."""
+    values = np.array([0, 128, 255], dtype=np.uint8)
+    actual = dequantize(values, detail(np.uint8, 1 / 255, 0))
+    assert np.allclose(actual, [0, 128 / 255, 1]), f"Dequantize failed, got {actual}."
+    floats = np.array([0.5], dtype=np.float32)
+    assert dequantize(floats, detail(np.float32, 0.0, 0)) is floats
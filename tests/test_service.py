@@ -0,0 +1,118 @@
+import asyncio
+import json
+import socket
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+from model.detections import Detections
+from service.batcher import TileBatcher
+from service.server import DetectionService, ServiceMetrics
+
+
+class RecordingPool:
+    """An interpreter pool that records batch sizes and returns one box per tile."""
+
+    num_workers = 1
+
+    def __init__(self):
+        self.sizes = []
+
+    def submit(self, batch, n):
+        self.sizes.append(n)
+        future = Future()
+        future.set_result((np.full((n, 1), 0.9, dtype=np.float32),
+                           np.tile(np.array([[[0, 0, 1, 1]]], dtype=np.float32), (n, 1, 1)),
+                           np.zeros((n, 1), dtype=np.float32)))
+        return future
+
+
+class StubModel:
+    """The parts of TFLiteModel a TileBatcher uses."""
+
+    batch_size = 4
+    input_dtype = np.uint8
+    input_details = [{'shape': np.array([1, 8, 8, 3])}]
+
+    def __init__(self):
+        self.pool = RecordingPool()
+        self.tile_runner = None
+
+    def fill_tile(self, tile, out):
+        out[...] = 0
+
+    def decode_batch(self, scores, boxes, classes, regions, cutoff):
+        return Detections([regions[0]], scores[:, 0], classes[:, 0])
+
+
+def test_batcher_coalesces_concurrent_requests():
+    """Test that tiles of concurrent requests share batches."""
+    model = StubModel()
+    batcher = TileBatcher(model, max_latency=0.2)
+    assert model.tile_runner is batcher
+    image = np.zeros((32, 32, 3), dtype=np.uint8)
+    results = [None, None]
+
+    def request(i):
+        results[i] = batcher(image, 0.5, [(0, 0, 8, 8), (8, 0, 16, 8)])
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert model.pool.sizes == [4], f"Batching failed, expected one batch of 4, got {model.pool.sizes}."
+    assert all(len(result) == 2 for result in results), "Every request should get its own tiles back."
+    assert batcher.fill_ratio == 1.0 and model.tile_runner is None
+
+
+def test_batcher_flushes_partial_batch_after_latency():
+    """Test that a lone tile is run once the latency window passes."""
+    model = StubModel()
+    batcher = TileBatcher(model, max_latency=0.001)
+    detections = batcher(np.zeros((8, 8, 3), dtype=np.uint8), 0.5, [(0, 0, 8, 8)])
+    batcher.close()
+    assert len(detections) == 1 and model.pool.sizes == [1]
+
+
+def test_metrics_percentiles():
+    """Test latency percentiles in milliseconds."""
+    metrics = ServiceMetrics()
+    for ms in range(1, 101):
+        metrics.record(ms / 1000)
+    assert round(metrics.percentile(50)) == 50, f"p50 failed, got {metrics.percentile(50)}."
+    assert round(metrics.percentile(99)) == 99, f"p99 failed, got {metrics.percentile(99)}."
+
+
+def test_invalid_rois_are_a_bad_request():
+    """Test that malformed or out-of-range regions of interest get a 400 with a message."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    service = DetectionService(StubModel(), {0: "pack"})
+
+    async def post(query):
+        server = asyncio.ensure_future(service.serve("127.0.0.1", port))
+        for _ in range(100):
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                break
+            except OSError:
+                await asyncio.sleep(0.01)
+        writer.write(f"POST /detect?{query} HTTP/1.1\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        server.cancel()
+        head, _, body = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(body)
+
+    try:
+        for query in ("rois=0,0,1", "rois=0,0,0.5,0.5;0,0,1.5,1", "rois=0.5,0,0.2,1"):
+            status, payload = asyncio.run(post(query))
+            assert status == 400, f"{query} failed, expected 400, got {status}."
+            assert "x0" in payload["error"], f"{query} failed, got the message {payload['error']!r}."
+    finally:
+        service.close()
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from model.tile_planner import (grid_tiles, covering_tiles, tile_priority, select_tiles, plan_adaptive_tiles,
+                                restrict_to_rois, roi_bounds, parse_roi)
+
+
+def test_grid_tiles_matches_sliding_loop():
+    """Test that the grid covers the same windows as the original while loops."""
+    width, height, window, step_x, step_y = 103, 61, 40, 20, 15
+    expected = []
+    y0 = 0
+    while y0 < height - 1:
+        x0 = 0
+        while x0 < width - 1:
+            expected.append([x0, y0, x0 + window, y0 + window])
+            x0 += step_x
+        y0 += step_y
+    actual = grid_tiles(width, height, window, step_x, step_y).tolist()
+    assert actual == expected, f"Grid failed, expected {len(expected)} tiles, got {len(actual)}."
+
+
+
+def test_covering_tiles_stay_inside_and_cover():
+    """Test that windows end flush with the border and cover every pixel."""
+    width, height, window = 250, 130, 64
+    tiles = covering_tiles(width, height, window, window // 2)
+    assert tiles[:, 2].max() == width and tiles[:, 3].max() == height, "Tiles do not end at the border."
+    assert tiles[:, :2].min() >= 0, "Tiles start outside the image."
+    covered = np.zeros((height, width), dtype=bool)
+    for x0, y0, x1, y1 in tiles:
+        covered[y0:y1, x0:x1] = True
+    assert covered.all(), "Tiles leave pixels uncovered."
+
+
+def test_covering_tiles_small_image():
+    """Test that an image smaller than the window gets a single window."""
+    actual = covering_tiles(40, 30, 64, 32).tolist()
+    assert actual == [[0, 0, 64, 64]], f"Small image tiling failed, got {actual}."
+
+def test_tile_priority_uses_neighbourhood():
+    """Test that tiles next to a box are scheduled only with a margin."""
+    tiles = np.array([[0, 0, 10, 10], [12, 0, 22, 10], [40, 40, 50, 50]])
+    boxes = np.array([[2, 2, 8, 8]])
+    scores = np.array([0.7])
+    expected = [0.7, 0.0, 0.0]
+    actual = tile_priority(tiles, boxes, scores).tolist()
+    assert np.allclose(actual, expected), f"Priority failed, expected {expected}, got {actual}."
+    actual = tile_priority(tiles, boxes, scores, margin_x=5, margin_y=5).tolist()
+    expected = [0.7, 0.7, 0.0]
+    assert np.allclose(actual, expected), f"Margin failed, expected {expected}, got {actual}."
+
+
+def test_select_tiles_budget_keeps_best_in_order():
+    """Test that the budget keeps the best tiles in their original order."""
+    tiles = np.arange(20).reshape(5, 4)
+    priority = np.array([0.1, 0.0, 0.9, 0.5, 0.7])
+    expected = tiles[[2, 4]].tolist()
+    actual = select_tiles(tiles, priority, max_tiles=2).tolist()
+    assert actual == expected, f"Budget failed, expected {expected}, got {actual}."
+
+
+def test_plan_adaptive_tiles_skips_background():
+    """Test that a single object schedules only a fraction of the grid."""
+    tiles = grid_tiles(1000, 1000, 100, 50, 50)
+    planned = plan_adaptive_tiles(tiles, [[480, 480, 520, 520]], [0.9])
+    assert 0 < len(planned) < len(tiles) / 10, (
+        f"Adaptive plan kept {len(planned)} of {len(tiles)} tiles."
+    )
+
+
+def test_restrict_to_rois_keeps_intersecting_tiles():
+    """Test that only tiles touching a region of interest are kept."""
+    tiles = grid_tiles(1000, 500, 100, 100, 100)
+    kept = restrict_to_rois(tiles, [(0.0, 0.0, 0.3, 0.4)], 1000, 500)
+    # x in [0, 300) and y in [0, 200): 3 columns and 2 rows
+    assert len(kept) == 6, f"ROI restriction failed, expected 6 tiles, got {len(kept)}."
+    assert restrict_to_rois(tiles, None, 1000, 500) is tiles, "No ROIs should keep every tile."
+
+
+def test_roi_bounds():
+    """Test the bounding box of several regions of interest."""
+    expected = (0.1, 0.2, 0.9, 0.6)
+    actual = roi_bounds([(0.1, 0.3, 0.4, 0.6), (0.5, 0.2, 0.9, 0.5)])
+    assert np.allclose(actual, expected), f"ROI bounds failed, expected {expected}, got {actual}."
+
+
+def test_parse_roi():
+    """Test that a region is parsed from fractions and rejected when malformed or empty."""
+    assert parse_roi("0,0.25,0.5,1") == (0.0, 0.25, 0.5, 1.0)
+    for value in ("0,0,1", "a,0,1,1", "0.5,0,0.5,1", "0,0,1.5,1"):
+        with pytest.raises(ValueError):
+            parse_roi(value)
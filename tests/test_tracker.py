@@ -0,0 +1,84 @@
+import numpy as np
+
+from model.detections import Detections
+from model.tracker import BoxTracker
+
+
+def frame(*boxes, class_id=1):
+    return Detections(boxes, [0.9] * len(boxes), [class_id] * len(boxes))
+
+
+def test_tracks_keep_ids_across_frames():
+    """Test that a slowly moving box keeps its track id."""
+    tracker = BoxTracker()
+    tracker.update(frame([0, 0, 10, 10], [50, 50, 60, 60]))
+    ids = tracker.track_ids.tolist()
+    tracker.update(frame([52, 51, 62, 61], [1, 1, 11, 11]))
+    expected = [[1, 1, 11, 11], [52, 51, 62, 61]]
+    actual = tracker.boxes.tolist()
+    assert tracker.track_ids.tolist() == ids, f"Track ids changed from {ids} to {tracker.track_ids}."
+    assert actual == expected, f"Track boxes failed, expected {expected}, got {actual}."
+
+
+def test_predict_extrapolates_velocity():
+    """Test that boxes move by their per-frame velocity between detection frames."""
+    tracker = BoxTracker()
+    tracker.update(frame([0, 0, 10, 10]))
+    tracker.predict()
+    tracker.update(frame([4, 0, 14, 10]))
+    actual = tracker.predict().boxes[0].tolist()
+    expected = [6, 0, 16, 10]
+    assert actual == expected, f"Prediction failed, expected {expected}, got {actual}."
+
+
+def test_centroid_fallback_matches_fast_objects():
+    """Test that a box that no longer overlaps is matched by centroid distance."""
+    tracker = BoxTracker(max_distance=1.5)
+    tracker.update(frame([0, 0, 10, 10]))
+    tracker.update(frame([12, 0, 22, 10]))
+    assert tracker.track_ids.tolist() == [0], f"Centroid match failed, got {tracker.track_ids}."
+
+
+def test_classes_are_not_mixed():
+    """Test that a detection of another class starts a new track."""
+    tracker = BoxTracker()
+    tracker.update(frame([0, 0, 10, 10], class_id=1))
+    tracker.update(frame([0, 0, 10, 10], class_id=2))
+    assert sorted(tracker.class_ids.tolist()) == [1, 2]
+
+
+def test_lost_tracks_are_dropped():
+    """Test that unmatched tracks survive max_misses detection frames."""
+    tracker = BoxTracker(max_misses=1)
+    tracker.update(frame([0, 0, 10, 10]))
+    tracker.update(Detections())
+    assert len(tracker) == 1
+    tracker.update(Detections())
+    assert len(tracker) == 0 and np.shape(tracker.boxes) == (0, 4)
+
+
+def test_many_boxes_match_their_tracks():
+    """Test that every box of a large, slightly shifted frame keeps its track."""
+    rng = np.random.default_rng(0)
+    corners = np.stack(np.meshgrid(np.arange(40) * 30, np.arange(40) * 30), axis=-1).reshape(-1, 2)
+    boxes = np.concatenate([corners, corners + 20], axis=1).astype(np.float32)
+    tracker = BoxTracker()
+    tracker.update(Detections(boxes, [0.9] * len(boxes), [1] * len(boxes)))
+    ids = tracker.track_ids.copy()
+    order = rng.permutation(len(boxes))
+    tracker.update(Detections(boxes[order] + 2, [0.9] * len(boxes), [1] * len(boxes)))
+    matched = dict(zip(tracker.track_ids.tolist(), tracker.boxes[:, :2].tolist()))
+    assert len(tracker) == len(boxes), f"Track count failed, expected {len(boxes)}, got {len(tracker)}."
+    assert all(matched[i] == (boxes[k, :2] + 2).tolist() for k, i in enumerate(ids.tolist())), \
+        "Some boxes continued the wrong track."
+
+
+def test_update_leaves_earlier_results_unchanged():
+    """Test that an update doesn't rewrite the boxes and scores returned for earlier frames."""
+    tracker = BoxTracker()
+    first = tracker.update(frame([0, 0, 10, 10]))
+    boxes, scores = first.boxes.tolist(), first.scores.tolist()
+    tracker.update(Detections([[2, 0, 12, 10]], [0.5], [1]))
+    tracker.predict()
+    assert first.boxes.tolist() == boxes, f"Earlier boxes changed from {boxes} to {first.boxes.tolist()}."
+    assert first.scores.tolist() == scores, f"Earlier scores changed from {scores} to {first.scores.tolist()}."
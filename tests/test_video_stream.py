@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+import pytest
+from pathlib import Path
+
+from model.detections import Detections
+from model.video_stream import FrameQueue, VideoStream, StreamDetector, StreamStats
+
+
+@pytest.fixture
+def video_path(tmpdir):
+    """Fixture with a 20-frame MJPG video of a moving square."""
+    path = str(Path(tmpdir) / "walk.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, (160, 120))
+    if not writer.isOpened():
+        pytest.skip("No MJPG video writer available.")
+    for i in range(20):
+        image = np.zeros((120, 160, 3), dtype=np.uint8)
+        image[40:80, 4 * i:4 * i + 40] = 255
+        writer.write(image)
+    writer.release()
+    return path
+
+
+class CountingModel:
+    """A model that returns one fixed box and counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, image, cutoff, **options):
+        self.calls += 1
+        return Detections([[0, 0, 10, 10]], [0.9], [1])
+
+
+def test_frame_queue_drops_oldest():
+    """Test that a full queue keeps the newest frames."""
+    queue = FrameQueue(2)
+    for i in range(5):
+        queue.put(i)
+    queue.close()
+    actual = [queue.get(), queue.get(), queue.get()]
+    assert actual == [3, 4, None], f"Queue failed, expected [3, 4, None], got {actual}."
+    assert queue.dropped == 3
+
+
+def test_stream_reads_every_frame(video_path):
+    """Test that a large enough queue receives all frames in order."""
+    stream = VideoStream(video_path, queue_size=32, realtime=False).start()
+    indices = []
+    while (item := stream.queue.get(timeout=5)) is not None:
+        indices.append(item[0])
+    stream.stop()
+    assert indices == list(range(20)), f"Stream failed, got frames {indices}."
+    assert StreamStats().report(stream)["drop_rate"] == 0.0
+
+
+def test_missing_source():
+    """Test that an unopenable source raises ValueError."""
+    with pytest.raises(ValueError):
+        VideoStream("missing.avi")
+
+
+def test_detector_runs_every_nth_frame():
+    """Test that the model only runs on detection frames."""
+    model = CountingModel()
+    detector = StreamDetector(model, 0.5, detect_every=3)
+    ran = [detector.process(None)[1] for _ in range(7)]
+    assert ran == [True, False, False, True, False, False, True], f"Schedule failed, got {ran}."
+    assert model.calls == 3
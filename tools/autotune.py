@@ -0,0 +1,167 @@
+"""
+Tunes the tiling parameters for speed against accuracy on a labelled image set.
+
+Sweeps the sliding window size and stride, the pyramid levels and overlap,
+and the NMS IoU threshold. Every configuration is timed on the images and
+scored against the labels (recall and precision at the cutoff, mAP@0.5
+over the candidates), and the Pareto-optimal configurations are saved as
+the "fast", "balanced" and "accurate" presets the settings window and
+`python -m batch --preset` apply.
+
+Labels are a JSONL file in the batch output format, one
+{"image": ..., "detections": [{"class_id": ..., "box": [...]}]} per line,
+e.g. a batch run corrected by hand. A few dozen images are enough.
+
+Usage:
+    python -m tools.autotune labels.jsonl --model resources/detect_mobilenet_pack/model.tflite \\
+        --output tiling_presets.json
+"""
+import argparse
+import itertools
+import os
+import time
+
+import cv2
+
+from model.evaluation import evaluate, load_labels
+from model.model_tflite import TFLiteModel
+from model.presets import PRESET_NAMES, choose_presets, pareto_front, save_presets
+
+
+def float_list(value):
+    return [float(v) for v in value.split(",")]
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",")]
+
+
+def tiling_configs(args):
+    """The tiling options to sweep: window sizes and strides, then pyramid levels and overlaps."""
+    configs = [{"tiling_mode": "window", "window_scale": window, "stride_scale": stride}
+               for window, stride in itertools.product(args.window_scales, args.stride_scales)]
+    configs += [{"tiling_mode": "pyramid", "pyramid_levels": levels, "pyramid_overlap": overlap}
+                for levels, overlap in itertools.product(args.pyramid_levels, args.pyramid_overlaps)]
+    return configs
+
+
+def read_images(labels, labels_path):
+    """Decodes the labelled images; relative paths may also be relative to the labels file."""
+    images = []
+    for path, truth in labels:
+        if not os.path.exists(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(labels_path)), path)
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError(f"Could not read image: {path}")
+        images.append((image, truth))
+    return images
+
+
+def measure(model, images, cutoff, candidate_cutoff, tiling, iou_thresholds, repeats):
+    """
+    Times and scores one tiling configuration at every IoU threshold.
+
+    The candidates don't depend on the IoU threshold, so the images are run
+    once per repeat and only NMS is repeated for each threshold. Latency is
+    the fastest repeat, per image.
+
+    Returns:
+        List[dict]: One profile per IoU threshold with its options, ms,
+            recall, precision and map.
+    """
+    runs = []
+    for _ in range(max(1, repeats)):
+        start = time.perf_counter()
+        candidates = [model.detect_candidates(image, cutoff, candidate_cutoff=candidate_cutoff, **tiling)
+                      for image, _ in images]
+        runs.append((time.perf_counter() - start, candidates))
+    seconds, candidates = min(runs, key=lambda run: run[0])
+
+    profiles = []
+    for iou in iou_thresholds:
+        start = time.perf_counter()
+        # mAP needs the whole precision-recall curve, so NMS runs down to the candidate floor
+        merged = [TFLiteModel.postprocess(found, candidate_cutoff, iou) for found in candidates]
+        nms_seconds = time.perf_counter() - start
+
+        truth = [truth for _, truth in images]
+        metrics = evaluate(zip(merged, truth))
+        at_cutoff = evaluate(zip((found.filter(cutoff) for found in merged), truth))
+        profiles.append({
+            "options": dict(tiling, iou_threshold=iou),
+            "ms": round((seconds + nms_seconds) / len(images) * 1000, 2),
+            "recall": round(at_cutoff["recall"], 4),
+            "precision": round(at_cutoff["precision"], 4),
+            "map": round(metrics["map"], 4),
+        })
+    return profiles
+
+
+def describe(profile):
+    options = ", ".join(f"{k}={v}" for k, v in profile["options"].items())
+    return (f"{profile['ms']:>9.1f} ms  mAP {profile['map']:.3f}  recall {profile['recall']:.3f}  "
+            f"precision {profile['precision']:.3f}  {options}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tools.autotune", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("labels", help="JSONL file of labelled images")
+    parser.add_argument("--model", required=True, help="Path to the .tflite model")
+    parser.add_argument("--output", default="tiling_presets.json", help="The presets file to write")
+    parser.add_argument("--cutoff", type=float, default=0.5)
+    parser.add_argument("--candidate-cutoff", type=float, default=0.1,
+                        help="The lowest score kept for the precision-recall curve")
+    parser.add_argument("--window-scales", type=float_list, default=[3.0, 4.0, 5.0],
+                        help="Window sides in mean box heights, comma-separated")
+    parser.add_argument("--stride-scales", type=float_list, default=[0.75, 1.0, 1.5],
+                        help="Window steps in mean box sizes, comma-separated")
+    parser.add_argument("--pyramid-levels", type=int_list, default=[1, 2, 3])
+    parser.add_argument("--pyramid-overlaps", type=float_list, default=[0.25, 0.5])
+    parser.add_argument("--iou-thresholds", type=float_list, default=[0.4, 0.5, 0.6])
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes per configuration")
+    parser.add_argument("--fast-tolerance", type=float, default=0.10,
+                        help="The share of the best mAP the fast preset may give up")
+    parser.add_argument("--balanced-tolerance", type=float, default=0.02,
+                        help="The share of the best mAP the balanced preset may give up")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--num-workers", type=int, default=1)
+    parser.add_argument("--num-threads", type=int, default=0, help="Threads per interpreter (0 = auto)")
+    parser.add_argument("--rgb-input", action="store_true", help="The model takes RGB rather than BGR tiles")
+    args = parser.parse_args(argv)
+
+    labels = load_labels(args.labels)
+    if not labels:
+        parser.error(f"No labelled images in {args.labels}")
+    images = read_images(labels, args.labels)
+
+    model = TFLiteModel(args.model, args.batch_size, args.num_workers, args.num_threads or None,
+                        args.rgb_input)
+    try:
+        model.warm_up()
+        profiles = []
+        for tiling in tiling_configs(args):
+            for profile in measure(model, images, args.cutoff, args.candidate_cutoff, tiling,
+                                   args.iou_thresholds, args.repeats):
+                print(describe(profile))
+                profiles.append(profile)
+    finally:
+        model.close()
+
+    front = pareto_front(profiles)
+    presets = choose_presets(front, fast_tolerance=args.fast_tolerance,
+                             balanced_tolerance=args.balanced_tolerance)
+    save_presets(args.output, presets, front, model=args.model, labels=args.labels, cutoff=args.cutoff)
+
+    print(f"\nPareto front ({len(front)} of {len(profiles)} configurations):")
+    for profile in front:
+        print(describe(profile))
+    print()
+    for name in PRESET_NAMES:
+        print(f"{name:<9}{describe(presets[name])}")
+    print(f"Presets saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Converts the detection model to a full-integer quantized TFLite model.
+
+Weights and activations are quantized to 8 bits with a representative set
+of shelf photos, and the input tensor takes uint8 (or int8) pixels, so the
+engine feeds tiles without a float conversion. The SSD post-processing op
+stays in float, so scores and boxes come out as before.
+
+Usage:
+    python -m tools.quantize_model exported/saved_model --images photos/ \\
+        --output resources/detect_mobilenet_pack_uint8/model.tflite
+"""
+import argparse
+import glob
+import os
+
+import cv2
+import numpy as np
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.JPG", "*.png")
+
+
+def representative_tiles(image_dir, input_size, num_samples, seed=0):
+    """Yields random crops resized to the model input and normalized like the engine does."""
+    paths = sorted(p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(image_dir, pattern)))
+    if not paths:
+        raise ValueError(f"No images found in {image_dir}")
+
+    rng = np.random.default_rng(seed)
+    for _ in range(num_samples):
+        image = cv2.imread(paths[rng.integers(len(paths))])
+        h, w, _ = image.shape
+        side = int(rng.uniform(0.2, 1.0) * min(h, w))
+        y0, x0 = rng.integers(0, h - side + 1), rng.integers(0, w - side + 1)
+        tile = cv2.resize(image[y0:y0 + side, x0:x0 + side], (input_size, input_size))
+        yield [np.float32(tile[None] / 255)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("saved_model", help="SavedModel directory exported for TFLite")
+    parser.add_argument("--images", required=True, help="Directory of representative photos")
+    parser.add_argument("--output", required=True, help="Path of the quantized .tflite file")
+    parser.add_argument("--input-size", type=int, default=320)
+    parser.add_argument("--samples", type=int, default=300)
+    parser.add_argument("--int8", action="store_true", help="Use an int8 instead of a uint8 input")
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(args.saved_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: representative_tiles(args.images, args.input_size, args.samples)
+    # The detection post-processing op has no integer kernel and stays in float
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+    converter.inference_input_type = tf.int8 if args.int8 else tf.uint8
+    converter.allow_custom_ops = True
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'wb') as file:
+        file.write(converter.convert())
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()